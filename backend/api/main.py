@@ -2,35 +2,60 @@
 FastAPI バックエンド - Spotify プレイリスト分析API
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List, Optional, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import os
+import math
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 
 from services.spotify_client import SpotifyService
+from services.spotify_http import SpotifyRateLimitError, close_http_client
+from services.rate_limiter import get_scheduler
+from services.singleflight import get_singleflight
 from services.data_analyzer import DataAnalyzer
 from services.db_service import save_analysis, get_latest_analysis, get_user_analysis_history
+from services.feature_store import get_feature_store
+from services.artist_cache import get_artist_cache
+from services.similarity_index import get_similarity_index
+from services.analytics_cache import get_analytics_cache
+from services.user_cache import get_user_id_cache
+from services.quantile_sketch import FeatureSketches
+from core.config import USER_ID_VERIFY_INTERVAL
 from core.database import get_db, init_db
 from models.schemas import (
     PlaylistResponse,
     TrackResponse,
     AudioFeaturesResponse,
     PlaylistAnalysisResponse,
+    BatchPlaylistAnalysisRequest,
+    BatchPlaylistAnalysisResponse,
     GenreDistributionItem,
     MoodMapItem,
     TempoTrendsResponse,
+    FeaturePercentilesResponse,
+    SimilarTrackItem,
     AnalysisHistoryResponse,
 )
 
 load_dotenv()
 
-# データベース初期化（起動時）
-init_db()
 
-app = FastAPI(title="Spotify Analytics API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリの起動・終了処理"""
+    # データベース初期化（importではなく起動時に行い、テストやワーカーのimportを軽くする）
+    init_db()
+    yield
+    # 共有コネクションプールを閉じる
+    await close_http_client()
+
+
+app = FastAPI(title="Spotify Analytics API", version="1.0.0", lifespan=lifespan)
 
 # CORS設定（Streamlitからのアクセスを許可）
 app.add_middleware(
@@ -44,21 +69,111 @@ app.add_middleware(
 security = HTTPBearer()
 
 
-def get_spotify_service(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """認証トークンからSpotifyServiceを取得"""
+def to_http_exception(e: Exception) -> HTTPException:
+    """例外をHTTPExceptionに変換（Spotifyのレート制限は429として返す）"""
+    if isinstance(e, SpotifyRateLimitError):
+        headers = (
+            {"Retry-After": str(math.ceil(e.retry_after))}
+            if e.retry_after is not None
+            else None
+        )
+        return HTTPException(status_code=429, detail=str(e), headers=headers)
+    return HTTPException(status_code=500, detail=str(e))
+
+
+def get_spotify_service(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    x_spotify_token_expires_at: Optional[float] = Header(None),
+):
+    """
+    認証トークンからSpotifyServiceを取得（HTTP接続はプロセス共通のプールを使用）
+
+    X-Spotify-Token-Expires-Atヘッダー（認可時のexpires_inから求めたUNIX時刻）がある場合は、
+    ユーザーIDのキャッシュがトークンの有効期限を過ぎないようにする。
+    """
     token = credentials.credentials
-    return SpotifyService(token)
+    return SpotifyService(token, token_expires_at=x_spotify_token_expires_at)
 
 
-async def get_current_user_id(service: SpotifyService = Depends(get_spotify_service)) -> str:
-    """現在のユーザーIDを取得"""
-    try:
-        me = service.get_current_user()
+def set_cache_header(response: Response, cached: bool):
+    """分析結果をキャッシュから返したかどうかをX-Cacheヘッダーで示す"""
+    response.headers["X-Cache"] = "HIT" if cached else "MISS"
+
+
+async def get_current_user_id(service: SpotifyService, verify: bool = False) -> str:
+    """
+    現在のユーザーIDを取得（トークンごとにキャッシュし、/meはトークンごとに1回だけ呼ぶ）
+
+    Args:
+        service: SpotifyService
+        verify: DBやキャッシュだけから返すリクエスト用。/meでの確認から
+            USER_ID_VERIFY_INTERVAL秒を過ぎていれば確認し直す（失効したトークンは"unknown"になる）
+    """
+
+    async def fetch_user_id() -> str:
+        me = await service.get_current_user()
         return me["id"]
+
+    try:
+        return await get_user_id_cache().get_or_fetch(
+            service.client.token_key,
+            fetch_user_id,
+            expires_at=service.client.token_expires_at,
+            max_age=USER_ID_VERIFY_INTERVAL if verify else None,
+        )
     except Exception:
         return "unknown"
 
 
+async def analyze_with_cache(
+    service: SpotifyService,
+    endpoint: str,
+    limit: int,
+    time_range: str,
+    analyze: Callable[[], Awaitable[Any]],
+    refresh: bool = False,
+) -> Tuple[str, Any, bool]:
+    """
+    ユーザーIDを求め、分析結果をキャッシュから返すか分析する
+
+    ユーザーIDがキャッシュにない場合は、/meの往復を待たずに分析を並行して始め、
+    分析結果がキャッシュにあった場合は取り消す。
+
+    Args:
+        service: SpotifyService
+        endpoint: 分析結果のキャッシュに使うエンドポイントの名前
+        limit: 分析に使用する上位トラック数
+        time_range: 期間
+        analyze: 分析結果を返すコルーチン関数
+        refresh: キャッシュを使わずに分析し直すかどうか
+
+    Returns:
+        (ユーザーID, 分析結果, キャッシュから返したかどうか)
+    """
+    cache = get_analytics_cache()
+    if await get_user_id_cache().get(service.client.token_key) is not None:
+        # キャッシュから返す場合はSpotifyにアクセスしないため、トークンを確認済みのユーザーIDを使う
+        user_id = await get_current_user_id(service, verify=True)
+        result, cached = await cache.get_or_compute(
+            user_id, endpoint, limit, time_range, analyze, refresh=refresh
+        )
+        return user_id, result, cached
+
+    analysis = asyncio.ensure_future(analyze())
+    try:
+        user_id = await get_current_user_id(service)
+        result, cached = await cache.get_or_compute(
+            user_id, endpoint, limit, time_range, lambda: analysis, refresh=refresh
+        )
+        return user_id, result, cached
+    finally:
+        if not analysis.done():
+            analysis.cancel()
+        elif not analysis.cancelled():
+            # 使わなかった分析の例外が「未取得の例外」として警告されないようにする
+            analysis.exception()
+
+
 @app.get("/")
 async def root():
     return {"message": "Spotify Analytics API", "version": "1.0.0"}
@@ -73,7 +188,7 @@ async def get_playlists(service: SpotifyService = Depends(get_spotify_service)):
         playlists = await service.get_user_playlists()
         return playlists
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
 
 
 @app.get("/api/playlist/{playlist_id}", response_model=PlaylistResponse)
@@ -84,10 +199,10 @@ async def get_playlist(
     プレイリストの詳細を取得
     """
     try:
-        playlist = await service.get_playlist(playlist_id)
+        playlist = await service.get_playlist_details(playlist_id)
         return playlist
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
 
 
 @app.get("/api/playlist/{playlist_id}/analysis", response_model=PlaylistAnalysisResponse)
@@ -101,16 +216,62 @@ async def analyze_playlist(
         analysis = await service.analyze_playlist(playlist_id)
         return analysis
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+
+@app.post("/api/playlists/analysis", response_model=BatchPlaylistAnalysisResponse)
+async def analyze_playlists(
+    request: BatchPlaylistAnalysisRequest,
+    service: SpotifyService = Depends(get_spotify_service),
+):
+    """
+    複数のプレイリストを一括で分析（複数のプレイリストに入っている曲の特徴量は1回だけ取得）
+    """
+    try:
+        return await service.analyze_playlists(request.playlist_ids)
+    except Exception as e:
+        raise to_http_exception(e)
+
+
+@app.get("/api/tracks/{track_id}/similar", response_model=List[SimilarTrackItem])
+async def get_similar_tracks(
+    track_id: str,
+    service: SpotifyService = Depends(get_spotify_service),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    オーディオ特徴量が似た曲を返す（特徴量をキャッシュ済みの全曲から検索）
+
+    Args:
+        limit: 返す曲数
+    """
+    try:
+        # インデックスの読み込み・同期はDBアクセスとKD木の作成を伴うためスレッドで行う
+        index = await asyncio.to_thread(get_similarity_index)
+        if track_id in index:
+            neighbours = index.query(track_id, limit)
+        else:
+            features = await service.get_audio_features(track_id)
+            neighbours = index.query_features(features.model_dump(), limit)
+        return [
+            SimilarTrackItem(id=neighbour_id, distance=distance)
+            for neighbour_id, distance in neighbours
+        ]
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise to_http_exception(e)
 
 
 @app.get("/analytics/genre-distribution", response_model=List[GenreDistributionItem])
 async def get_genre_distribution(
+    response: Response,
     service: SpotifyService = Depends(get_spotify_service),
     db: Session = Depends(get_db),
     limit: int = 50,
     time_range: str = "medium_term",
     save: bool = True,
+    refresh: bool = False,
 ):
     """
     ジャンルの出現分布を返す
@@ -118,18 +279,23 @@ async def get_genre_distribution(
     Args:
         limit: 分析に使用する上位トラック数
         time_range: 期間 ("short_term", "medium_term", "long_term")
-        save: DBに保存するかどうか（デフォルト: True）
+        save: DBに保存するかどうか（デフォルト: True、キャッシュから返した場合は保存しない）
+        refresh: キャッシュを使わずに分析し直すかどうか（結果でキャッシュを置き換える）
     """
     try:
-        user_id = await get_current_user_id(service)
-        
-        tracks_data = service.get_top_tracks_with_genres(
-            limit=limit, time_range=time_range
+        async def analyze():
+            tracks_data = await service.get_top_tracks_with_genres(
+                limit=limit, time_range=time_range
+            )
+            return DataAnalyzer.genre_distribution(tracks_data)
+
+        user_id, distribution, cached = await analyze_with_cache(
+            service, "genre", limit, time_range, analyze, refresh=refresh
         )
-        distribution = DataAnalyzer.genre_distribution(tracks_data)
-        
+        set_cache_header(response, cached)
+
         # データベースに保存
-        if save:
+        if save and not cached:
             save_analysis(
                 db,
                 user_id,
@@ -140,16 +306,18 @@ async def get_genre_distribution(
         
         return distribution
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
 
 
 @app.get("/analytics/mood-map", response_model=List[MoodMapItem])
 async def get_mood_map(
+    response: Response,
     service: SpotifyService = Depends(get_spotify_service),
     db: Session = Depends(get_db),
     limit: int = 50,
     time_range: str = "medium_term",
     save: bool = True,
+    refresh: bool = False,
 ):
     """
     valence × energy の散布図データを返す
@@ -157,18 +325,23 @@ async def get_mood_map(
     Args:
         limit: 分析に使用する上位トラック数
         time_range: 期間 ("short_term", "medium_term", "long_term")
-        save: DBに保存するかどうか（デフォルト: True）
+        save: DBに保存するかどうか（デフォルト: True、キャッシュから返した場合は保存しない）
+        refresh: キャッシュを使わずに分析し直すかどうか（結果でキャッシュを置き換える）
     """
     try:
-        user_id = await get_current_user_id(service)
-        
-        tracks_data = service.get_user_top_tracks_with_features(
-            limit=limit, time_range=time_range
+        async def analyze():
+            tracks_data = await service.get_user_top_tracks_with_features(
+                limit=limit, time_range=time_range
+            )
+            return DataAnalyzer.mood_map(tracks_data)
+
+        user_id, mood_map, cached = await analyze_with_cache(
+            service, "mood", limit, time_range, analyze, refresh=refresh
         )
-        mood_map = DataAnalyzer.mood_map(tracks_data)
-        
+        set_cache_header(response, cached)
+
         # データベースに保存
-        if save:
+        if save and not cached:
             save_analysis(
                 db,
                 user_id,
@@ -179,16 +352,18 @@ async def get_mood_map(
         
         return mood_map
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
 
 
 @app.get("/analytics/tempo-trends", response_model=TempoTrendsResponse)
 async def get_tempo_trends(
+    response: Response,
     service: SpotifyService = Depends(get_spotify_service),
     db: Session = Depends(get_db),
     limit: int = 50,
     time_range: str = "medium_term",
     save: bool = True,
+    refresh: bool = False,
 ):
     """
     テンポ（BPM）の平均・分布を返す
@@ -196,18 +371,23 @@ async def get_tempo_trends(
     Args:
         limit: 分析に使用する上位トラック数
         time_range: 期間 ("short_term", "medium_term", "long_term")
-        save: DBに保存するかどうか（デフォルト: True）
+        save: DBに保存するかどうか（デフォルト: True、キャッシュから返した場合は保存しない）
+        refresh: キャッシュを使わずに分析し直すかどうか（結果でキャッシュを置き換える）
     """
     try:
-        user_id = await get_current_user_id(service)
-        
-        tracks_data = service.get_user_top_tracks_with_features(
-            limit=limit, time_range=time_range
+        async def analyze():
+            tracks_data = await service.get_user_top_tracks_with_features(
+                limit=limit, time_range=time_range
+            )
+            return DataAnalyzer.tempo_trends(tracks_data)
+
+        user_id, tempo_trends, cached = await analyze_with_cache(
+            service, "tempo", limit, time_range, analyze, refresh=refresh
         )
-        tempo_trends = DataAnalyzer.tempo_trends(tracks_data)
-        
+        set_cache_header(response, cached)
+
         # データベースに保存
-        if save:
+        if save and not cached:
             save_analysis(
                 db,
                 user_id,
@@ -218,7 +398,87 @@ async def get_tempo_trends(
         
         return tempo_trends
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+
+@app.get("/analytics/feature-percentiles", response_model=FeaturePercentilesResponse)
+async def get_feature_percentiles(
+    response: Response,
+    service: SpotifyService = Depends(get_spotify_service),
+    db: Session = Depends(get_db),
+    limit: int = 50,
+    time_range: str = "medium_term",
+    save: bool = True,
+    refresh: bool = False,
+):
+    """
+    オーディオ特徴量ごとの分位点（p10/p25/p50/p75/p90）を返す
+
+    分位点のスケッチも保存するため、後から期間をまたいで合成できる。
+
+    Args:
+        limit: 分析に使用する上位トラック数
+        time_range: 期間 ("short_term", "medium_term", "long_term")
+        save: DBに保存するかどうか（デフォルト: True、キャッシュから返した場合は保存しない）
+        refresh: キャッシュを使わずに分析し直すかどうか（結果でキャッシュを置き換える）
+    """
+    try:
+        async def analyze():
+            tracks_data = await service.get_user_top_tracks_with_features(
+                limit=limit, time_range=time_range
+            )
+            return DataAnalyzer.feature_percentiles(tracks_data)
+
+        user_id, percentiles, cached = await analyze_with_cache(
+            service, "percentiles", limit, time_range, analyze, refresh=refresh
+        )
+        set_cache_header(response, cached)
+
+        # データベースに保存（スケッチを含む）
+        if save and not cached:
+            save_analysis(db, user_id, "percentiles", time_range, percentiles)
+
+        return percentiles
+    except Exception as e:
+        raise to_http_exception(e)
+
+
+@app.get("/analytics/feature-percentiles/combined", response_model=FeaturePercentilesResponse)
+async def get_combined_feature_percentiles(
+    service: SpotifyService = Depends(get_spotify_service),
+    db: Session = Depends(get_db),
+    time_ranges: List[str] = Query(["short_term", "medium_term", "long_term"]),
+):
+    """
+    保存済みの分位点のスケッチを期間をまたいで合成した分位点を返す
+
+    Spotifyのトラックは取得し直さず、各期間の最新の保存結果を使う。
+
+    Args:
+        time_ranges: 合成する期間（複数指定可）
+    """
+    try:
+        # DBだけから返すため、トークンを確認済みのユーザーIDを使う
+        user_id = await get_current_user_id(service, verify=True)
+        if user_id == "unknown":
+            raise HTTPException(status_code=401, detail="Could not verify the access token")
+
+        stored = [
+            get_latest_analysis(db, user_id, "percentiles", time_range)
+            for time_range in dict.fromkeys(time_ranges)
+        ]
+        stored = [item for item in stored if item is not None]
+        if not stored:
+            raise HTTPException(status_code=404, detail="No stored feature percentiles")
+
+        sketches = FeatureSketches.combine(
+            FeatureSketches.from_dict(item.result["sketches"]) for item in stored
+        )
+        return {"track_count": sketches.count, "percentiles": sketches.percentiles()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise to_http_exception(e)
 
 
 @app.get("/debug/raw-top-tracks")
@@ -235,7 +495,7 @@ async def get_raw_top_tracks(
         time_range: 期間 ("short_term", "medium_term", "long_term")
     """
     try:
-        tracks_data = service.get_top_tracks_with_genres(
+        tracks_data = await service.get_top_tracks_with_genres(
             limit=limit, time_range=time_range
         )
         return {
@@ -243,7 +503,30 @@ async def get_raw_top_tracks(
             "tracks": tracks_data,
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
+
+
+@app.get("/debug/metrics")
+async def get_metrics():
+    """
+    デバッグ用: キャッシュのヒット数・ミス数などの計測値を返す
+    """
+    # Redisバックエンドの件数はRedisに問い合わせるため、スレッドで取得する
+    artist_stats, analytics_stats, user_id_stats = await asyncio.to_thread(
+        lambda: (
+            get_artist_cache().stats(),
+            get_analytics_cache().stats(),
+            get_user_id_cache().stats(),
+        )
+    )
+    return {
+        "audio_features_cache": get_feature_store().memory.stats(),
+        "artist_genre_cache": artist_stats,
+        "analytics_cache": analytics_stats,
+        "user_id_cache": user_id_stats,
+        "spotify_scheduler": get_scheduler().metrics.snapshot(),
+        "spotify_singleflight": get_singleflight().stats(),
+    }
 
 
 @app.get("/history", response_model=List[AnalysisHistoryResponse])
@@ -261,8 +544,11 @@ async def get_history(
         limit: 取得件数
     """
     try:
-        user_id = await get_current_user_id(service)
-        
+        # DBだけから返すため、トークンを確認済みのユーザーIDを使う
+        user_id = await get_current_user_id(service, verify=True)
+        if user_id == "unknown":
+            raise HTTPException(status_code=401, detail="Could not verify the access token")
+
         history = get_user_analysis_history(
             db, user_id, analysis_type=analysis_type, limit=limit
         )
@@ -281,8 +567,10 @@ async def get_history(
         ]
         
         return result
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise to_http_exception(e)
 
 
 if __name__ == "__main__":
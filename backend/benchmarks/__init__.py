@@ -0,0 +1,3 @@
+"""
+パフォーマンス計測用ベンチマーク
+"""
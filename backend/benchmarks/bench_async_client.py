@@ -0,0 +1,185 @@
+"""
+ベンチマーク: ブロッキングなspotipy方式と非同期トランスポートのスループット比較
+実行: python -m benchmarks.bench_async_client [--analyses 20] [--tracks 200] [--latency-ms 50]
+
+同じイベントループ上で複数のプレイリスト分析を同時に走らせ、
+1ワーカーあたりの分析スループット（analyses/sec）を比較します。
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from services.feature_store import FeatureStore
+from services.playlist_snapshots import PlaylistSnapshotStore
+from services.rate_limiter import RequestScheduler
+from services.spotify_client import SpotifyService
+
+
+def make_session_factory():
+    """計測ごとに空の一時ファイルのSQLiteを用意する（DB操作はスレッドから並行して行われる）"""
+    directory = tempfile.TemporaryDirectory()
+    engine = create_engine(
+        f"sqlite:///{directory.name}/bench.db",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    # ディレクトリはセッションファクトリが破棄されるときに削除する
+    return sessionmaker(bind=engine, info={"directory": directory})
+
+
+def build_payload(request: httpx.Request, total_tracks: int) -> dict:
+    """リクエストに対応するSpotify風のレスポンスを生成"""
+    path = request.url.path
+    params = request.url.params
+
+    if path.endswith("/tracks"):
+        playlist_id = path.split("/")[-2]
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 50))
+        end = min(offset + limit, total_tracks)
+        return {
+            "items": [
+                {
+                    "track": {
+                        "id": f"{playlist_id}-track{i}",
+                        "name": f"Song {i}",
+                        "duration_ms": 200000,
+                        "artists": [{"id": f"artist{i}", "name": f"Artist {i}"}],
+                        "album": {"name": f"Album {i}", "images": []},
+                    }
+                }
+                for i in range(offset, end)
+            ],
+            "total": total_tracks,
+            "offset": offset,
+            "limit": limit,
+            "next": (
+                f"{request.url.copy_with(params={'offset': end, 'limit': limit})}"
+                if end < total_tracks
+                else None
+            ),
+        }
+    if path.endswith("/audio-features"):
+        return {
+            "audio_features": [
+                {
+                    "id": track_id,
+                    "danceability": 0.5,
+                    "energy": 0.6,
+                    "valence": 0.7,
+                    "tempo": 120.0,
+                    "acousticness": 0.1,
+                    "instrumentalness": 0.0,
+                    "liveness": 0.2,
+                    "speechiness": 0.05,
+                    "loudness": -5.0,
+                    "mode": 1,
+                    "key": 5,
+                    "time_signature": 4,
+                }
+                for track_id in params["ids"].split(",")
+            ]
+        }
+    return {
+        "id": path.rsplit("/", 1)[-1],
+        "name": "Benchmark Playlist",
+        "description": None,
+        "images": [],
+        "tracks": {"total": total_tracks},
+    }
+
+
+def blocking_analyze(client: httpx.Client, playlist_id: str) -> int:
+    """変更前（spotipy）と同じ順序・回数で同期的にAPIを呼び出す"""
+    client.get(f"/playlists/{playlist_id}")
+
+    track_ids = []
+    page = client.get(f"/playlists/{playlist_id}/tracks", params={"limit": 50}).json()
+    while page:
+        track_ids.extend(item["track"]["id"] for item in page["items"])
+        page = client.get(page["next"]).json() if page["next"] else None
+
+    for i in range(0, len(track_ids), 100):
+        client.get("/audio-features", params={"ids": ",".join(track_ids[i : i + 100])})
+
+    return len(track_ids)
+
+
+async def run_blocking(analyses: int, total_tracks: int, latency: float) -> float:
+    """ブロッキング方式: async def内で同期I/Oを行うためイベントループが止まる"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency)
+        return httpx.Response(200, json=build_payload(request, total_tracks))
+
+    client = httpx.Client(
+        transport=httpx.MockTransport(handler), base_url="https://api.spotify.com/v1"
+    )
+
+    async def analyze(playlist_id: str):
+        return blocking_analyze(client, playlist_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(analyze(f"pl{i}") for i in range(analyses)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+async def run_async(analyses: int, total_tracks: int, latency: float) -> float:
+    """非同期方式: SpotifyService.analyze_playlistを同時実行"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=build_payload(request, total_tracks))
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    session_factory = make_session_factory()
+    feature_store = FeatureStore(session_factory=session_factory)
+    snapshot_store = PlaylistSnapshotStore(session_factory=session_factory)
+    services = [
+        SpotifyService(
+            "benchmark_token",
+            http_client=http_client,
+            feature_store=feature_store,
+            snapshot_store=snapshot_store,
+            # トランスポートの差だけを測るためレート制限は外す
+            scheduler=RequestScheduler(app_rate=0, user_rate=0),
+        )
+        for _ in range(analyses)
+    ]
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(service.analyze_playlist(f"pl{i}") for i, service in enumerate(services))
+    )
+    elapsed = time.perf_counter() - start
+    await http_client.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--analyses", type=int, default=20, help="同時に実行する分析数")
+    parser.add_argument("--tracks", type=int, default=200, help="プレイリストあたりの曲数")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="1リクエストあたりの応答遅延")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000.0
+    blocking = asyncio.run(run_blocking(args.analyses, args.tracks, latency))
+    non_blocking = asyncio.run(run_async(args.analyses, args.tracks, latency))
+
+    print(f"analyses={args.analyses} tracks={args.tracks} latency={args.latency_ms}ms")
+    print(f"  blocking (spotipy方式): {blocking:8.3f}s  {args.analyses / blocking:8.2f} analyses/sec")
+    print(f"  async (httpx)         : {non_blocking:8.3f}s  {args.analyses / non_blocking:8.2f} analyses/sec")
+    print(f"  speedup               : {blocking / non_blocking:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+ベンチマーク: フェイクSpotifyに接続した/analytics系APIのエンドツーエンドのレイテンシ
+実行: python -m benchmarks.bench_end_to_end [--requests 30] [--latency-ms 50] [--endpoint tempo-trends]
+
+APIアプリとフェイクSpotify（--latency-msの遅延付き）をどちらもASGITransportで同じプロセスに置き、
+HTTPリクエストから応答までの時間を次の条件で比較します。
+
+- sequential: 変更前の方式（/meを毎回呼び、その応答を待ってからデータを取得）
+- cold token: 初めてのトークン（/meとデータ取得を並行して実行）
+- warm token: ユーザーIDがキャッシュ済みのトークン（refresh=trueで毎回分析し直す）
+- cached: 分析結果のキャッシュにヒット
+
+各条件で1リクエストあたりのSpotifyへのリクエスト数も表示します
+（warm tokenでは特徴量がキャッシュ済みのため上位トラックの取得だけになります）。
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+import httpx
+from fastapi import Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.main import app, get_current_user_id, get_spotify_service, security
+from core.database import Base
+from fake_spotify import FakeSpotifyConfig, create_app
+from services.analytics_cache import AnalyticsCache
+from services.artist_cache import ArtistGenreCache
+from services.cache import TTLCache
+from services.feature_store import FeatureStore
+from services.playlist_snapshots import PlaylistSnapshotStore
+from services.rate_limiter import RequestScheduler
+from services.singleflight import SingleFlight
+from services.spotify_client import SpotifyService
+from services.user_cache import UserIdCache
+
+FAKE_BASE_URL = "http://fake-spotify/v1"
+
+
+def make_session_factory():
+    """計測ごとに空の一時ファイルのSQLiteを用意する（DB操作はスレッドから並行して行われる）"""
+    directory = tempfile.TemporaryDirectory()
+    engine = create_engine(
+        f"sqlite:///{directory.name}/bench.db",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    # ディレクトリはセッションファクトリが破棄されるときに削除する
+    return sessionmaker(bind=engine, info={"directory": directory})
+
+
+async def sequential_analyze(service, endpoint, limit, time_range, analyze, refresh=False):
+    """変更前の方式（/meを毎回呼んでからキャッシュを使わずに分析する）"""
+    me = await service.get_current_user()
+    return me["id"], await analyze(), False
+
+
+def credentials_for(token: str) -> HTTPAuthorizationCredentials:
+    """get_spotify_serviceに渡す認証情報"""
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+async def measure(client: httpx.AsyncClient, fake, path: str, tokens) -> tuple:
+    """トークンごとに1リクエストを順に送り、レイテンシ（ミリ秒）とSpotifyへのリクエスト数の平均を返す"""
+    timings = []
+    before = fake.state.stats["requests"]
+    for token in tokens:
+        start = time.perf_counter()
+        response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+        timings.append((time.perf_counter() - start) * 1e3)
+        response.raise_for_status()
+    upstream = (fake.state.stats["requests"] - before) / len(tokens)
+    return timings, upstream
+
+
+async def run(args):
+    fake = create_app(FakeSpotifyConfig(latency_ms=args.latency_ms))
+    fake_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake))
+    session_factory = make_session_factory()
+    shared = {
+        "feature_store": FeatureStore(session_factory=session_factory),
+        "artist_cache": ArtistGenreCache(TTLCache()),
+        "scheduler": RequestScheduler(app_rate=0, user_rate=0),
+        "singleflight": SingleFlight(),
+        "snapshot_store": PlaylistSnapshotStore(session_factory),
+    }
+
+    def service_for(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        return SpotifyService(
+            credentials.credentials,
+            http_client=fake_client,
+            base_url=FAKE_BASE_URL,
+            **shared,
+        )
+
+    path = f"/analytics/{args.endpoint}?save=false&limit={args.limit}"
+    n = args.requests
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://api"
+    ) as client:
+        with patch.dict(app.dependency_overrides, {get_spotify_service: service_for}), \
+             patch("api.main.get_analytics_cache", return_value=AnalyticsCache(TTLCache())), \
+             patch("api.main.get_user_id_cache", return_value=UserIdCache(TTLCache())):
+            # 接続の確立などを除くためのウォームアップ
+            await client.get(path + "&refresh=true", headers={"Authorization": "Bearer warmup"})
+
+            with patch("api.main.analyze_with_cache", side_effect=sequential_analyze):
+                sequential = await measure(client, fake, path, [f"seq{i}" for i in range(n)])
+            cold = await measure(client, fake, path, [f"cold{i}" for i in range(n)])
+            # warmトークンのユーザーIDだけを先にキャッシュしておく
+            await get_current_user_id(service_for(credentials_for("warm")))
+            warm = await measure(client, fake, path + "&refresh=true", ["warm"] * n)
+            cached = await measure(client, fake, path, ["warm"] * n)
+
+    await fake_client.aclose()
+
+    print(f"{'case':>12} {'mean':>9} {'median':>9} {'p95':>9} {'upstream/req':>13}")
+    for name, (timings, upstream) in (
+        ("sequential", sequential),
+        ("cold token", cold),
+        ("warm token", warm),
+        ("cached", cached),
+    ):
+        p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+        print(
+            f"{name:>12} {statistics.mean(timings):7.1f}ms {statistics.median(timings):7.1f}ms "
+            f"{p95:7.1f}ms {upstream:13.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=30, help="条件ごとのリクエスト数")
+    parser.add_argument("--latency-ms", type=float, default=50, help="フェイクSpotifyの遅延（ミリ秒）")
+    parser.add_argument("--limit", type=int, default=50, help="分析に使用する上位トラック数")
+    parser.add_argument(
+        "--endpoint",
+        default="tempo-trends",
+        choices=["genre-distribution", "mood-map", "tempo-trends", "feature-percentiles"],
+        help="計測する分析API",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+ベンチマーク: Pydanticモデルのリスト→DataFrameとFeatureMatrixのメモリ・処理時間
+実行: python -m benchmarks.bench_feature_matrix [--tracks 10000]
+
+SpotifyのJSONから統計量を求めるまでを、変更前の経路
+（1曲ずつAudioFeaturesResponse → model_dump() → DataFrame → DataAnalyzer）と
+FeatureMatrix（JSONから直接float32の行列 → DataAnalyzer）で比較します。
+メモリは中間データを保持したままの時点のtracemallocの値です。
+"""
+
+import argparse
+import time
+import tracemalloc
+import pandas as pd
+
+from fake_spotify.catalog import FakeCatalog
+from models.schemas import AudioFeaturesResponse
+from services.data_analyzer import DataAnalyzer
+from services.feature_matrix import FeatureMatrix
+
+
+def legacy(raw):
+    """変更前の経路"""
+    models = [AudioFeaturesResponse(**features) for features in raw]
+    df = pd.DataFrame([model.model_dump() for model in models])
+    analyzer = DataAnalyzer(df.copy())
+    return analyzer.calculate_statistics(), (models, df, analyzer)
+
+
+def columnar(raw):
+    """FeatureMatrixの経路"""
+    matrix = FeatureMatrix.from_raw(raw)
+    analyzer = DataAnalyzer(matrix)
+    return analyzer.calculate_statistics(), (matrix, analyzer)
+
+
+def measure(func, raw):
+    """処理時間と、結果を保持した状態のメモリ使用量"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    _, keep = func(raw)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return elapsed, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tracks", type=int, default=10000, help="曲数")
+    args = parser.parse_args()
+
+    catalog = FakeCatalog()
+    raw = [catalog.audio_features(n) for n in range(args.tracks)]
+
+    print(f"{'path':>10} {'time':>10} {'memory':>10} {'bytes/track':>12}")
+    for name, func in (("legacy", legacy), ("matrix", columnar)):
+        func(raw[:100])  # ウォームアップ
+        elapsed, memory = measure(func, raw)
+        print(
+            f"{name:>10} {elapsed * 1000:8.1f}ms {memory / 1e6:8.2f}MB "
+            f"{memory / args.tracks:12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+ベンチマーク: fieldsパラメータによるプレイリスト取得の転送量とJSONパース時間の比較
+実行: python -m benchmarks.bench_fields_projection [--tracks 10000] [--repeat 5]
+
+Spotifyが返す完全なトラックオブジェクトを模したページと、
+SpotifyServiceが指定するfieldsで絞り込んだページを生成し、
+全ページ分のバイト数とjson.loads + TrackResponse生成にかかる時間を比較します。
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from fake_spotify.fields import parse_fields, project
+from models.schemas import TrackResponse
+from services.spotify_client import PAGE_SIZE, PLAYLIST_TRACKS_FIELDS
+
+# アルバムのavailable_marketsに入る国コード（実際のAPIでは180前後）
+MARKETS = [f"{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(180)]
+
+
+def full_track(i: int) -> Dict[str, Any]:
+    """fieldsを指定しない場合にSpotifyが返すプレイリストアイテム相当のオブジェクト"""
+
+    def artist(j: int) -> Dict[str, Any]:
+        artist_id = f"artist{j:018d}"
+        return {
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+            "href": f"https://api.spotify.com/v1/artists/{artist_id}",
+            "id": artist_id,
+            "name": f"Artist {j}",
+            "type": "artist",
+            "uri": f"spotify:artist:{artist_id}",
+        }
+
+    album_id = f"album{i:017d}"
+    track_id = f"track{i:017d}"
+    return {
+        "added_at": "2024-01-01T00:00:00Z",
+        "added_by": {
+            "external_urls": {"spotify": "https://open.spotify.com/user/owner"},
+            "href": "https://api.spotify.com/v1/users/owner",
+            "id": "owner",
+            "type": "user",
+            "uri": "spotify:user:owner",
+        },
+        "is_local": False,
+        "primary_color": None,
+        "video_thumbnail": {"url": None},
+        "track": {
+            "album": {
+                "album_type": "album",
+                "artists": [artist(i % 97)],
+                "available_markets": MARKETS,
+                "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+                "href": f"https://api.spotify.com/v1/albums/{album_id}",
+                "id": album_id,
+                "images": [
+                    {"height": size, "width": size, "url": f"https://i.scdn.co/image/{album_id}{size}"}
+                    for size in (640, 300, 64)
+                ],
+                "name": f"Album {i}",
+                "release_date": "2020-01-01",
+                "release_date_precision": "day",
+                "total_tracks": 12,
+                "type": "album",
+                "uri": f"spotify:album:{album_id}",
+            },
+            "artists": [artist(i % 97), artist(i % 89 + 100)],
+            "available_markets": MARKETS,
+            "disc_number": 1,
+            "duration_ms": 200000 + i,
+            "episode": False,
+            "explicit": False,
+            "external_ids": {"isrc": f"JPXX{i:08d}"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+            "href": f"https://api.spotify.com/v1/tracks/{track_id}",
+            "id": track_id,
+            "is_local": False,
+            "name": f"Song {i}",
+            "popularity": i % 100,
+            "preview_url": f"https://p.scdn.co/mp3-preview/{track_id}",
+            "track": True,
+            "track_number": i % 12 + 1,
+            "type": "track",
+            "uri": f"spotify:track:{track_id}",
+        },
+    }
+
+
+def build_pages(total_tracks: int, fields: str = None) -> List[bytes]:
+    """プレイリストの全ページをレスポンスボディとして生成"""
+    tree = parse_fields(fields) if fields else None
+    pages = []
+    for offset in range(0, total_tracks, PAGE_SIZE):
+        end = min(offset + PAGE_SIZE, total_tracks)
+        page = {
+            "href": "https://api.spotify.com/v1/playlists/pl/tracks",
+            "items": [full_track(i) for i in range(offset, end)],
+            "limit": PAGE_SIZE,
+            "next": None,
+            "offset": offset,
+            "previous": None,
+            "total": total_tracks,
+        }
+        if tree is not None:
+            page = project(page, tree)
+        pages.append(json.dumps(page).encode())
+    return pages
+
+
+def parse_pages(pages: List[bytes]) -> List[TrackResponse]:
+    """SpotifyService.get_playlist_tracksと同じ手順でレスポンスを組み立てる"""
+    tracks = []
+    for body in pages:
+        for item in json.loads(body)["items"]:
+            track = item["track"]
+            tracks.append(
+                TrackResponse(
+                    id=track["id"],
+                    name=track["name"],
+                    artists=[artist["name"] for artist in track["artists"]],
+                    album_name=track["album"]["name"],
+                    album_image=(
+                        track["album"]["images"][0]["url"]
+                        if track["album"]["images"]
+                        else None
+                    ),
+                    duration_ms=track["duration_ms"],
+                )
+            )
+    return tracks
+
+
+def measure(pages: List[bytes], repeat: int) -> Tuple[float, float]:
+    """最良のパース時間（json.loadsのみ、TrackResponse生成まで）を返す"""
+    loads_times, build_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in pages:
+            json.loads(body)
+        loads_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        parse_pages(pages)
+        build_times.append(time.perf_counter() - start)
+    return min(loads_times), min(build_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tracks", type=int, default=10000, help="プレイリストの曲数")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数")
+    args = parser.parse_args()
+
+    full = build_pages(args.tracks)
+    projected = build_pages(args.tracks, PLAYLIST_TRACKS_FIELDS)
+    assert parse_pages(full) == parse_pages(projected)
+
+    full_bytes = sum(len(body) for body in full)
+    projected_bytes = sum(len(body) for body in projected)
+    full_loads, full_build = measure(full, args.repeat)
+    projected_loads, projected_build = measure(projected, args.repeat)
+
+    print(f"tracks={args.tracks} pages={len(full)}")
+    print(f"  {'':<10} {'bytes':>12} {'json.loads':>12} {'+ schemas':>12}")
+    print(f"  {'full':<10} {full_bytes:>12,} {full_loads * 1000:>10.1f}ms {full_build * 1000:>10.1f}ms")
+    print(
+        f"  {'fields':<10} {projected_bytes:>12,} {projected_loads * 1000:>10.1f}ms "
+        f"{projected_build * 1000:>10.1f}ms"
+    )
+    print(
+        f"  {'reduction':<10} {full_bytes / projected_bytes:>11.1f}x "
+        f"{full_loads / projected_loads:>11.1f}x {full_build / projected_build:>11.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
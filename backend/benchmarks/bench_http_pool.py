@@ -0,0 +1,112 @@
+"""
+ベンチマーク: リクエストごとのHTTPクライアント生成と共有コネクションプールのレイテンシ比較
+実行: python -m benchmarks.bench_http_pool [--requests 500] [--concurrency 20] [--calls 3]
+
+ローカルに起動したスタンドインサーバーに対して、1 APIリクエストあたり
+--calls 回のSpotify呼び出しを行い、APIリクエスト単位のレイテンシを比較します。
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+from typing import List
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from services.rate_limiter import RequestScheduler
+from services.spotify_http import SpotifyHTTPClient, close_http_client
+
+
+def create_stand_in_app() -> FastAPI:
+    """/me だけを返す最小のSpotifyスタンドイン"""
+    stand_in = FastAPI()
+
+    @stand_in.get("/v1/me")
+    async def me():
+        return {"id": "benchmark_user", "display_name": "Benchmark"}
+
+    return stand_in
+
+
+def start_server() -> str:
+    """スタンドインサーバーをバックグラウンドスレッドで起動してベースURLを返す"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(create_stand_in_app(), host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+async def measure(
+    base_url: str, requests: int, concurrency: int, calls: int, pooled: bool
+) -> List[float]:
+    """APIリクエストを模した処理を並行実行し、それぞれのレイテンシを返す"""
+    scheduler = RequestScheduler(app_rate=0, user_rate=0, max_concurrency=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def handle_request(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            if pooled:
+                client = SpotifyHTTPClient(f"token{i}", base_url=base_url, scheduler=scheduler)
+                for _ in range(calls):
+                    await client.current_user()
+            else:
+                # 変更前: リクエストごとに新しいクライアント（＝新しい接続）を作る
+                async with httpx.AsyncClient() as http_client:
+                    client = SpotifyHTTPClient(
+                        f"token{i}",
+                        base_url=base_url,
+                        http_client=http_client,
+                        scheduler=scheduler,
+                    )
+                    for _ in range(calls):
+                        await client.current_user()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(handle_request(i) for i in range(requests)))
+    if pooled:
+        await close_http_client()
+    return latencies
+
+
+def summarize(label: str, latencies: List[float]):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"  {label:<22}: p50 {p50:7.2f}ms  p95 {p95:7.2f}ms  mean {statistics.mean(latencies) * 1000:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500, help="APIリクエスト数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時実行数")
+    parser.add_argument("--calls", type=int, default=3, help="APIリクエストあたりのSpotify呼び出し回数")
+    args = parser.parse_args()
+
+    base_url = start_server()
+    per_request = asyncio.run(
+        measure(base_url, args.requests, args.concurrency, args.calls, pooled=False)
+    )
+    pooled = asyncio.run(
+        measure(base_url, args.requests, args.concurrency, args.calls, pooled=True)
+    )
+
+    print(f"requests={args.requests} concurrency={args.concurrency} calls={args.calls}")
+    summarize("client per request", per_request)
+    summarize("shared pool", pooled)
+
+
+if __name__ == "__main__":
+    main()
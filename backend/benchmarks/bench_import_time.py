@@ -0,0 +1,77 @@
+"""
+ベンチマーク: APIとCeleryワーカーのモジュールのimport時間
+実行: python -m benchmarks.bench_import_time [--modules api.main,tasks.tasks] [--runs 5] [--max-ms 0]
+
+モジュールごとに新しいPythonプロセスでimportだけを行い、処理時間の中央値・最小値と、
+起動時には読み込まないはずの重い依存（pandas・scikit-learnなど）が読み込まれたかを表示します。
+--max-msを指定した場合、中央値がそれを超えるか重い依存が読み込まれていれば終了コード1で終わります
+（CIでの退行検知用）。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# 最初に使う時点で読み込むモジュール
+HEAVY_MODULES = ["pandas", "sklearn", "scipy", "joblib", "spotipy"]
+
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, env: dict) -> dict:
+    """新しいプロセスでmoduleをimportした時間（秒）と読み込まれた重い依存"""
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", default="api.main,tasks.tasks", help="モジュール（カンマ区切り）")
+    parser.add_argument("--runs", type=int, default=5, help="モジュールごとの計測回数")
+    parser.add_argument("--max-ms", type=float, default=0, help="中央値の上限（0の場合は判定しない）")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        # import時にDBファイルが作られないことも確認できるよう、一時ディレクトリのDBを使う
+        database_path = os.path.join(directory, "import_time.db")
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{database_path}"}
+
+        print(f"{'module':>16} {'median':>9} {'min':>9}  heavy dependencies")
+        for module in args.modules.split(","):
+            results = [measure(module, env) for _ in range(args.runs)]
+            timings = [result["elapsed"] * 1e3 for result in results]
+            heavy = sorted({name for result in results for name in result["heavy"]})
+            median = statistics.median(timings)
+            print(
+                f"{module:>16} {median:7.0f}ms {min(timings):7.0f}ms  "
+                f"{', '.join(heavy) or '-'}"
+            )
+            if args.max_ms and (median > args.max_ms or heavy):
+                failed = True
+
+        if os.path.exists(database_path):
+            print("database file was created at import time")
+            failed = failed or bool(args.max_ms)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+ベンチマーク: KLLスケッチによる分位点の誤差・メモリ・合成時間
+実行: python -m benchmarks.bench_quantile_sketch [--rows 10000,100000,1000000] [--parts 8]
+
+テンポに近い分布の値を各件数だけスケッチに追加し、p10/p50/p90の順位誤差を
+全件ソートした正確な分位点と比較します。保持する値の数（メモリ）が件数によらず
+一定であることと、--partsに分けて作ったスケッチを合成する時間も計測します。
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+
+from services.quantile_sketch import KLLSketch
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="10000,100000,1000000", help="値の件数（カンマ区切り）")
+    parser.add_argument("--parts", type=int, default=8, help="合成するスケッチの数")
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>8} {'update':>9} {'sort':>9} {'retained':>9} {'json':>8} "
+        f"{'max err':>8} {'merge':>9} {'merged err':>11}"
+    )
+    for rows in (int(r) for r in args.rows.split(",")):
+        values = np.random.default_rng(rows).normal(120, 25, rows)
+
+        start = time.perf_counter()
+        sketch = KLLSketch()
+        sketch.update_many(values)
+        update = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ordered = np.sort(values)
+        sort = time.perf_counter() - start
+
+        def max_error(s: KLLSketch) -> float:
+            return max(
+                abs(np.searchsorted(ordered, value) / rows - q)
+                for q, value in zip(QUANTILES, s.quantiles(QUANTILES))
+            )
+
+        parts = []
+        for i, chunk in enumerate(np.array_split(values, args.parts)):
+            part = KLLSketch(seed=i)
+            part.update_many(chunk)
+            parts.append(part)
+        start = time.perf_counter()
+        merged = KLLSketch()
+        for part in parts:
+            merged.merge(part)
+        merge = time.perf_counter() - start
+
+        size = len(json.dumps(sketch.to_dict()))
+        print(
+            f"{rows:>8} {update * 1e3:7.1f}ms {sort * 1e3:7.1f}ms {sketch.retained:>9} "
+            f"{size / 1e3:6.1f}kB {max_error(sketch):8.4f} {merge * 1e3:7.2f}ms "
+            f"{max_error(merged):11.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
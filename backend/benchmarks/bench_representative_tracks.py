@@ -0,0 +1,85 @@
+"""
+ベンチマーク: 代表曲選択（iterrowsのループとベクトル化）の行数に対するスケーリング
+実行: python -m benchmarks.bench_representative_tracks [--rows 1000,10000,100000] [--legacy-max-rows 20000]
+
+各行数でcluster_tracks()を実行したあと、変更前のiterrows + np.linalg.normの実装と
+DataAnalyzer.get_representative_tracks()の処理時間を比較します。
+"""
+
+import argparse
+import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+from services.data_analyzer import DataAnalyzer
+
+FEATURES = ["danceability", "energy", "valence", "acousticness", "instrumentalness"]
+
+
+def make_features_df(rows: int) -> pd.DataFrame:
+    """ランダムなオーディオ特徴量のDataFrame"""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({col: rng.random(rows) for col in FEATURES})
+    df["track_id"] = [f"track{i}" for i in range(rows)]
+    return df
+
+
+def legacy_representative_tracks(
+    clustered_df: pd.DataFrame, n_tracks: int = 3
+) -> Dict[int, List[str]]:
+    """変更前の実装（生の特徴量空間で1行ずつ距離を計算）"""
+    representative_tracks = {}
+    for cluster_id in clustered_df["cluster"].unique():
+        cluster_data = clustered_df[clustered_df["cluster"] == cluster_id]
+        cluster_center = cluster_data[FEATURES].mean().values
+        distances = []
+        for idx, row in cluster_data.iterrows():
+            distance = np.linalg.norm(row[FEATURES].values - cluster_center)
+            distances.append((idx, distance))
+        distances.sort(key=lambda x: x[1])
+        representative_tracks[int(cluster_id)] = [
+            clustered_df.loc[idx, "track_id"] for idx, _ in distances[:n_tracks]
+        ]
+    return representative_tracks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="1000,10000,100000", help="計測する行数（カンマ区切り）")
+    parser.add_argument("--clusters", type=int, default=5, help="クラスタ数")
+    parser.add_argument(
+        "--legacy-max-rows", type=int, default=20000, help="変更前の実装を計測する最大行数"
+    )
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'cluster_tracks':>15} {'legacy':>12} {'vectorized':>12} {'speedup':>9}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        analyzer = DataAnalyzer(make_features_df(rows))
+
+        start = time.perf_counter()
+        clustered = analyzer.cluster_tracks(n_clusters=args.clusters)
+        cluster_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyzer.get_representative_tracks(clustered)
+        vectorized = time.perf_counter() - start
+
+        if rows <= args.legacy_max_rows:
+            start = time.perf_counter()
+            legacy_representative_tracks(clustered)
+            legacy = time.perf_counter() - start
+            legacy_text = f"{legacy * 1000:10.1f}ms"
+            speedup_text = f"{legacy / vectorized:8.1f}x"
+        else:
+            legacy_text = f"{'-':>12}"
+            speedup_text = f"{'-':>9}"
+
+        print(
+            f"{rows:>8} {cluster_time * 1000:13.1f}ms {legacy_text} "
+            f"{vectorized * 1000:10.1f}ms {speedup_text}"
+        )
+
+
+if __name__ == "__main__":
+    main()
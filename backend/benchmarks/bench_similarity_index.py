@@ -0,0 +1,94 @@
+"""
+ベンチマーク: 類似曲検索インデックスの作成時間と検索時間
+実行: python -m benchmarks.bench_similarity_index [--rows 100000,500000] [--queries 1000] [--delta 10000]
+
+各曲数でKD木を作成し、曲IDを指定したk近傍検索の平均・p99を、
+全曲との距離を計算する総当たりと比較します。
+--deltaの件数を差分として追加した状態（KD木の作り直し前）の検索時間と、保存・読み込みの時間も計測します。
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from services.data_analyzer import CLUSTER_FEATURES
+from services.similarity_index import SimilarityIndex
+
+
+def make_chunks(start: int, rows: int, chunk_size: int = 50000):
+    """ランダムなオーディオ特徴量の辞書のチャンク"""
+    rng = np.random.default_rng(start)
+    for offset in range(start, start + rows, chunk_size):
+        size = min(chunk_size, start + rows - offset)
+        values = rng.random((size, len(CLUSTER_FEATURES))).tolist()
+        yield [
+            {"id": f"track{offset + i}", **dict(zip(CLUSTER_FEATURES, row))}
+            for i, row in enumerate(values)
+        ]
+
+
+def time_queries(index: SimilarityIndex, track_ids, k: int):
+    """検索ごとの処理時間（秒）"""
+    timings = []
+    for track_id in track_ids:
+        start = time.perf_counter()
+        index.query(track_id, k)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="100000,500000", help="曲数（カンマ区切り）")
+    parser.add_argument("--queries", type=int, default=1000, help="検索回数")
+    parser.add_argument("--k", type=int, default=10, help="返す曲数")
+    parser.add_argument("--delta", type=int, default=10000, help="差分として追加する曲数")
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>8} {'build':>9} {'save':>8} {'load':>8} {'query avg':>10} "
+        f"{'query p99':>10} {'+delta avg':>11} {'brute avg':>10}"
+    )
+    for rows in (int(r) for r in args.rows.split(",")):
+        chunks = list(make_chunks(0, rows))
+        start = time.perf_counter()
+        index = SimilarityIndex(rebuild_ratio=1.0).build(chunks)
+        build = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.joblib")
+            start = time.perf_counter()
+            index.save(path)
+            save = time.perf_counter() - start
+            start = time.perf_counter()
+            SimilarityIndex.load(path)
+            load = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        track_ids = [f"track{i}" for i in rng.integers(0, rows, args.queries)]
+        timings = time_queries(index, track_ids, args.k)
+
+        # 総当たり（全曲との距離を計算して上位kを選ぶ）
+        scaled = (index._raw - index.mean_) / index.scale_
+        start = time.perf_counter()
+        for track_id in track_ids[:100]:
+            point = scaled[index._index[track_id][1]]
+            distances = np.einsum("ij,ij->i", scaled - point, scaled - point)
+            np.argpartition(distances, args.k)[: args.k + 1]
+        brute = (time.perf_counter() - start) / min(100, len(track_ids))
+
+        for chunk in make_chunks(rows, args.delta):
+            index.add(chunk)
+        delta_timings = time_queries(index, track_ids, args.k)
+
+        print(
+            f"{rows:>8} {build:8.2f}s {save:7.2f}s {load:7.2f}s "
+            f"{timings.mean() * 1e3:8.3f}ms {np.percentile(timings, 99) * 1e3:8.3f}ms "
+            f"{delta_timings.mean() * 1e3:9.3f}ms {brute * 1e3:8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+ベンチマーク: 全件KMeansとMiniBatchKMeans（一括・チャンク逐次）の処理時間とinertia
+実行: python -m benchmarks.bench_streaming_cluster [--rows 10000,100000,500000] [--chunk-size 20000]
+
+各行数で次の3つを比較します。inertiaはいずれも全件で求めた標準化後の空間で計算します。
+- kmeans: DataAnalyzer.cluster_tracks()（KMeans, n_init=10）
+- minibatch: DataAnalyzer.cluster_tracks(method="minibatch")
+- stream: StreamingClustererにchunk-size件ずつpartial_fit（全件をメモリに載せない）
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from services.data_analyzer import CLUSTER_FEATURES, DataAnalyzer
+from services.streaming_cluster import StreamingClusterer
+
+
+def make_features_df(rows: int, clusters: int) -> pd.DataFrame:
+    """いくつかの塊に分かれたランダムなオーディオ特徴量のDataFrame"""
+    rng = np.random.default_rng(0)
+    centers = rng.random((clusters, len(CLUSTER_FEATURES)))
+    X = centers[rng.integers(0, clusters, rows)] + rng.normal(
+        0, 0.1, (rows, len(CLUSTER_FEATURES))
+    )
+    return pd.DataFrame(np.clip(X, 0, 1), columns=CLUSTER_FEATURES)
+
+
+def inertia(X_scaled: np.ndarray, centers: np.ndarray) -> float:
+    """最も近い中心までの二乗距離の合計"""
+    sq = (
+        np.einsum("ij,ij->i", X_scaled, X_scaled)[:, None]
+        - 2 * X_scaled @ centers.T
+        + np.einsum("ij,ij->i", centers, centers)[None, :]
+    )
+    return float(np.maximum(sq.min(axis=1), 0).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", default="10000,100000,500000", help="計測する行数（カンマ区切り）")
+    parser.add_argument("--clusters", type=int, default=5, help="クラスタ数")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="streamで1回に渡す件数")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'method':>10} {'time':>10} {'inertia':>12} {'vs kmeans':>10}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        df = make_features_df(rows, args.clusters)
+        # 3つの方法で標準化がわずかに異なるため、inertiaは全件の標準化で揃えて比較する
+        X_scaled = StandardScaler().fit_transform(df.to_numpy())
+
+        results = []
+        for method in ("kmeans", "minibatch"):
+            analyzer = DataAnalyzer(df)
+            start = time.perf_counter()
+            analyzer.cluster_tracks(n_clusters=args.clusters, method=method)
+            elapsed = time.perf_counter() - start
+            centers = analyzer.scaler_.inverse_transform(analyzer.kmeans_.cluster_centers_)
+            results.append((method, elapsed, centers))
+
+        start = time.perf_counter()
+        clusterer = StreamingClusterer(n_clusters=args.clusters)
+        # 1パス目で標準化を求め、2パス目でk-meansを学習する
+        clusterer.fit_stream(
+            [df.iloc[i : i + args.chunk_size] for i in range(0, rows, args.chunk_size)]
+        )
+        elapsed = time.perf_counter() - start
+        results.append(
+            ("stream", elapsed, clusterer.scaler_.inverse_transform(clusterer.cluster_centers_))
+        )
+
+        # 元の空間の中心を全件の標準化に写してinertiaを求める
+        mean, std = df.to_numpy().mean(axis=0), df.to_numpy().std(axis=0)
+        baseline = None
+        for method, elapsed, centers in results:
+            value = inertia(X_scaled, (centers - mean) / std)
+            baseline = baseline or value
+            print(
+                f"{rows:>8} {method:>10} {elapsed * 1000:8.1f}ms {value:12.1f} "
+                f"{value / baseline:9.3f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
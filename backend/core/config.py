@@ -0,0 +1,99 @@
+"""
+設定管理 - 環境変数から読み込む設定値
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# データベースのURL
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./spotify_analytics.db")
+
+
+def _data_dir() -> str:
+    """データファイルを置くディレクトリ（SQLiteの場合はDBファイルと同じ場所の絶対パス）"""
+    if DATABASE_URL.startswith("sqlite:///") and DATABASE_URL != "sqlite:///:memory:":
+        return os.path.dirname(os.path.abspath(DATABASE_URL[len("sqlite:///"):]))
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+DATA_DIR = _data_dir()
+
+# Spotify Web APIのベースURL（テスト用のスタンドインサーバーに向ける場合に変更）
+SPOTIFY_API_BASE_URL = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+
+# スクリプトがOAuthの代わりに使う固定のアクセストークン（フェイクSpotifyに向ける場合など）
+SPOTIFY_ACCESS_TOKEN = os.getenv("SPOTIFY_ACCESS_TOKEN")
+
+# Spotify APIリクエストのタイムアウト（秒）
+SPOTIFY_HTTP_TIMEOUT = float(os.getenv("SPOTIFY_HTTP_TIMEOUT", "10.0"))
+SPOTIFY_HTTP_CONNECT_TIMEOUT = float(os.getenv("SPOTIFY_HTTP_CONNECT_TIMEOUT", "5.0"))
+
+# プロセス共通のHTTPコネクションプール設定
+SPOTIFY_HTTP_MAX_CONNECTIONS = int(os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", "100"))
+SPOTIFY_HTTP_MAX_KEEPALIVE = int(os.getenv("SPOTIFY_HTTP_MAX_KEEPALIVE", "20"))
+SPOTIFY_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SPOTIFY_HTTP_KEEPALIVE_EXPIRY", "30.0"))
+
+# HTTP/2を使用するかどうか（h2パッケージがインストールされている場合のみ有効）
+SPOTIFY_HTTP2 = os.getenv("SPOTIFY_HTTP2", "true").lower() in ("1", "true", "yes")
+
+# ページング結果を並行取得する際の同時リクエスト数の上限
+SPOTIFY_PAGE_CONCURRENCY = int(os.getenv("SPOTIFY_PAGE_CONCURRENCY", "8"))
+
+# オーディオ特徴量のプロセス内LRUキャッシュの最大件数
+FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "10000"))
+
+# Spotifyが特徴量を返さなかったという記録の有効期限（秒、過ぎたら取得し直す）
+FEATURE_MISS_TTL = float(os.getenv("FEATURE_MISS_TTL", "86400"))
+
+# 共有キャッシュのバックエンド（"memory": プロセス内、"redis": Redisで複数ワーカー共有）
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+
+# RedisのURL（Celeryと共用）
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# アーティストのジャンルキャッシュの有効期限（秒）と最大件数
+ARTIST_CACHE_TTL = float(os.getenv("ARTIST_CACHE_TTL", "86400"))
+ARTIST_CACHE_SIZE = int(os.getenv("ARTIST_CACHE_SIZE", "50000"))
+
+# /analytics系APIのレスポンスキャッシュの有効期限（秒）と最大件数
+# （上位トラックは1日に1回程度しか変わらないため、同じ条件の分析結果を使い回す）
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "10000"))
+
+# アクセストークン（のハッシュ）からユーザーIDへのキャッシュの有効期限（秒）と最大件数
+# （Spotifyのアクセストークンの有効期限は1時間。X-Spotify-Token-Expires-Atで有効期限が
+#  分かる場合は、それを過ぎないよう各エントリの有効期限を短くする）
+USER_ID_CACHE_TTL = float(os.getenv("USER_ID_CACHE_TTL", "3600"))
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", "10000"))
+# DBやキャッシュだけから返すリクエストで、/meでの確認をやり直すまでの秒数
+USER_ID_VERIFY_INTERVAL = float(os.getenv("USER_ID_VERIFY_INTERVAL", "60"))
+
+# Spotify APIのレート制限（1秒あたりのリクエスト数、0以下で無制限）とバースト数
+SPOTIFY_APP_RATE_LIMIT = float(os.getenv("SPOTIFY_APP_RATE_LIMIT", "10"))
+SPOTIFY_APP_RATE_BURST = float(os.getenv("SPOTIFY_APP_RATE_BURST", "20"))
+SPOTIFY_USER_RATE_LIMIT = float(os.getenv("SPOTIFY_USER_RATE_LIMIT", "5"))
+SPOTIFY_USER_RATE_BURST = float(os.getenv("SPOTIFY_USER_RATE_BURST", "10"))
+
+# Spotify APIへの同時リクエスト数の上限
+SPOTIFY_MAX_CONCURRENCY = int(os.getenv("SPOTIFY_MAX_CONCURRENCY", "16"))
+
+# 429・5xx・通信エラー時の再試行回数とバックオフ（秒）
+SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+SPOTIFY_BACKOFF_BASE = float(os.getenv("SPOTIFY_BACKOFF_BASE", "0.5"))
+SPOTIFY_BACKOFF_MAX = float(os.getenv("SPOTIFY_BACKOFF_MAX", "30"))
+
+# クラスタ数の自動選択（並列に評価するプロセス数（0で呼び出し元のプロセスで順に評価）、
+# 評価の制限時間（秒）、結果のプロセス内LRUキャッシュの件数）
+CLUSTER_AUTO_K_WORKERS = int(os.getenv("CLUSTER_AUTO_K_WORKERS", str(min(os.cpu_count() or 1, 8))))
+CLUSTER_AUTO_K_TIME_BUDGET = float(os.getenv("CLUSTER_AUTO_K_TIME_BUDGET", "5.0"))
+CLUSTER_AUTO_K_CACHE_SIZE = int(os.getenv("CLUSTER_AUTO_K_CACHE_SIZE", "128"))
+
+# 類似曲検索インデックスの保存先（デフォルトはDATA_DIR内、空文字列で保存しない）、
+# 新しく保存された特徴量を取り込む間隔（秒）、KD木を作り直す差分の割合
+SIMILARITY_INDEX_PATH = os.getenv(
+    "SIMILARITY_INDEX_PATH", os.path.join(DATA_DIR, "similarity_index.joblib")
+)
+SIMILARITY_INDEX_SYNC_INTERVAL = float(os.getenv("SIMILARITY_INDEX_SYNC_INTERVAL", "60"))
+SIMILARITY_INDEX_REBUILD_RATIO = float(os.getenv("SIMILARITY_INDEX_REBUILD_RATIO", "0.1"))
@@ -6,10 +6,8 @@ from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime,
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
 from typing import Optional
-import os
 
-# SQLiteデータベースのパス
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./spotify_analytics.db")
+from core.config import DATABASE_URL
 
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}  # SQLite用
@@ -35,6 +33,34 @@ class AnalysisHistory(Base):
         return f"<AnalysisHistory(id={self.id}, user_id={self.user_id}, type={self.analysis_type})>"
 
 
+class TrackAudioFeatures(Base):
+    """オーディオ特徴量キャッシュテーブル（トラックIDごとに全ユーザーで共有）"""
+
+    __tablename__ = "track_audio_features"
+
+    track_id = Column(String, primary_key=True)  # Spotify Track ID
+    features = Column(JSON)  # Spotify APIが返したオーディオ特徴量
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TrackAudioFeatures(track_id={self.track_id})>"
+
+
+class PlaylistAnalysisSnapshot(Base):
+    """プレイリスト分析結果テーブル（プレイリストごとに最新のsnapshot_idの結果を保持）"""
+
+    __tablename__ = "playlist_analysis_snapshots"
+
+    playlist_id = Column(String, primary_key=True)  # Spotify Playlist ID
+    snapshot_id = Column(String)  # 分析時点のプレイリストのsnapshot_id
+    result = Column(JSON)  # PlaylistAnalysisResponseをJSON形式で保存
+    accumulator = Column(JSON)  # 統計量の逐次更新に使う件数・平均・偏差平方和
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PlaylistAnalysisSnapshot(playlist_id={self.playlist_id}, snapshot_id={self.snapshot_id})>"
+
+
 def get_db():
     """データベースセッションを取得"""
     db = SessionLocal()
@@ -0,0 +1,7 @@
+"""
+Spotify Web APIのローカルスタンドイン（オフラインの負荷試験用）
+"""
+
+from .app import FakeSpotifyConfig, create_app
+
+__all__ = ["FakeSpotifyConfig", "create_app"]
@@ -0,0 +1,52 @@
+"""
+フェイクSpotify Web APIの起動
+実行: python -m fake_spotify [--port 8900] [--playlist-size 200] [--latency-ms 50] [--rate-limit-ratio 0.01]
+
+SpotifyServiceの接続先は SPOTIFY_API_BASE_URL=http://127.0.0.1:8900/v1 で切り替えます。
+"""
+
+import argparse
+import uvicorn
+
+from fake_spotify.app import MODES, MODE_GENERATE, UPSTREAM_URL, FakeSpotifyConfig, create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるホスト")
+    parser.add_argument("--port", type=int, default=8900, help="待ち受けるポート")
+    parser.add_argument("--playlist-size", type=int, default=200, help="1プレイリストあたりの曲数")
+    parser.add_argument("--playlists-per-user", type=int, default=10, help="1ユーザーあたりのプレイリスト数")
+    parser.add_argument("--top-tracks", type=int, default=50, help="上位トラックの件数")
+    parser.add_argument("--track-pool", type=int, default=100000, help="曲の種類数")
+    parser.add_argument("--artist-pool", type=int, default=5000, help="アーティストの種類数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="各レスポンスの遅延（ミリ秒）")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0, help="遅延の揺らぎの最大値（ミリ秒）")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="429を返すリクエストの割合（0〜1）")
+    parser.add_argument("--retry-after", type=int, default=1, help="429のRetry-After（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--mode", choices=MODES, default=MODE_GENERATE, help="動作モード")
+    parser.add_argument("--fixtures-dir", help="フィクスチャのディレクトリ（replay / record）")
+    parser.add_argument("--upstream-url", default=UPSTREAM_URL, help="recordモードの転送先")
+    args = parser.parse_args()
+
+    config = FakeSpotifyConfig(
+        playlist_size=args.playlist_size,
+        playlists_per_user=args.playlists_per_user,
+        top_tracks=args.top_tracks,
+        track_pool=args.track_pool,
+        artist_pool=args.artist_pool,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        rate_limit_ratio=args.rate_limit_ratio,
+        retry_after=args.retry_after,
+        seed=args.seed,
+        mode=args.mode,
+        fixtures_dir=args.fixtures_dir,
+        upstream_url=args.upstream_url,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+フェイクSpotify Web API - SpotifyServiceとscripts/が使うエンドポイントのスタンドイン
+"""
+
+import asyncio
+import random
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from fake_spotify.catalog import FakeCatalog, parse_id
+from fake_spotify.fields import parse_fields, project
+from fake_spotify.fixtures import FixtureStore, fixture_key
+
+# 記録モードで転送する実際のSpotify APIのベースURL
+UPSTREAM_URL = "https://api.spotify.com/v1"
+
+# 動作モード
+MODE_GENERATE = "generate"  # カタログから生成したデータを返す
+MODE_REPLAY = "replay"  # 記録済みのフィクスチャを優先して返す（なければ生成）
+MODE_RECORD = "record"  # 実際のAPIに転送し、レスポンスをフィクスチャとして記録
+MODES = (MODE_GENERATE, MODE_REPLAY, MODE_RECORD)
+
+
+class FakeSpotifyConfig:
+    """フェイクSpotifyの設定"""
+
+    def __init__(
+        self,
+        playlist_size: int = 200,
+        playlists_per_user: int = 10,
+        top_tracks: int = 50,
+        track_pool: int = 100000,
+        artist_pool: int = 5000,
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        rate_limit_ratio: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+        mode: str = MODE_GENERATE,
+        fixtures_dir: Optional[str] = None,
+        upstream_url: str = UPSTREAM_URL,
+    ):
+        """
+        初期化
+
+        Args:
+            playlist_size: 1プレイリストあたりの曲数
+            playlists_per_user: 1ユーザーあたりのプレイリスト数
+            top_tracks: 上位トラックの件数
+            track_pool: 曲の種類数
+            artist_pool: アーティストの種類数
+            latency_ms: 各レスポンスに加える遅延（ミリ秒）
+            latency_jitter_ms: 遅延に加えるランダムな揺らぎの最大値（ミリ秒）
+            rate_limit_ratio: 429を返すリクエストの割合（0〜1）
+            retry_after: 429のRetry-Afterヘッダーの秒数
+            seed: 生成するデータと429・揺らぎの乱数のシード
+            mode: 動作モード（generate / replay / record）
+            fixtures_dir: フィクスチャのディレクトリ（replay / recordで使用）
+            upstream_url: recordモードで転送する先のベースURL
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}: {mode}")
+        if mode != MODE_GENERATE and not fixtures_dir:
+            raise ValueError(f"fixtures_dir is required in {mode} mode")
+        self.playlist_size = playlist_size
+        self.playlists_per_user = playlists_per_user
+        self.top_tracks = top_tracks
+        self.track_pool = track_pool
+        self.artist_pool = artist_pool
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.seed = seed
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir
+        self.upstream_url = upstream_url.rstrip("/")
+
+
+def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """Spotify APIと同じ形式のエラーレスポンス"""
+    return JSONResponse(
+        {"error": {"status": status, "message": message}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    """Authorizationヘッダーからアクセストークンを取り出す"""
+    authorization = request.headers.get("Authorization", "")
+    if not authorization.startswith("Bearer ") or not authorization[7:].strip():
+        return None
+    return authorization[7:].strip()
+
+
+def _paging(
+    request: Request, items: List[Any], total: int, offset: int, limit: int
+) -> Dict[str, Any]:
+    """ページングオブジェクト（next/previousはこのサーバーのURL）"""
+    end = offset + len(items)
+    return {
+        "href": str(request.url),
+        "items": items,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next": (
+            str(request.url.include_query_params(offset=end, limit=limit))
+            if end < total
+            else None
+        ),
+        "previous": (
+            str(request.url.include_query_params(offset=max(0, offset - limit), limit=limit))
+            if offset > 0
+            else None
+        ),
+    }
+
+
+def _ids(value: Optional[str], maximum: int) -> Optional[List[str]]:
+    """カンマ区切りのidsパラメータを分割（件数が範囲外の場合はNone）"""
+    ids = [i for i in (value or "").split(",") if i]
+    if not ids or len(ids) > maximum:
+        return None
+    return ids
+
+
+def create_app(
+    config: Optional[FakeSpotifyConfig] = None,
+    upstream_client: Optional[httpx.AsyncClient] = None,
+) -> FastAPI:
+    """
+    フェイクSpotify Web APIのFastAPIアプリを生成
+
+    Args:
+        config: 設定（Noneの場合はデフォルト値）
+        upstream_client: recordモードで転送に使うクライアント（Noneの場合は必要になった時点で生成）
+
+    Returns:
+        /v1以下にSpotify Web APIと同じパスを持つFastAPIアプリ
+    """
+    config = config or FakeSpotifyConfig()
+    catalog = FakeCatalog(
+        playlist_size=config.playlist_size,
+        playlists_per_user=config.playlists_per_user,
+        top_tracks=config.top_tracks,
+        track_pool=config.track_pool,
+        artist_pool=config.artist_pool,
+        seed=config.seed,
+    )
+    fixtures = FixtureStore(config.fixtures_dir) if config.fixtures_dir else None
+    rng = random.Random(config.seed)
+    stats: Counter = Counter()
+    upstream: Dict[str, httpx.AsyncClient] = (
+        {"client": upstream_client} if upstream_client is not None else {}
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        # recordモードで生成した転送用クライアントを閉じる
+        if "client" in upstream and upstream_client is None:
+            await upstream.pop("client").aclose()
+
+    app = FastAPI(title="Fake Spotify Web API", lifespan=lifespan)
+    app.state.config = config
+    app.state.stats = stats
+
+    async def forward(request: Request, key: str) -> JSONResponse:
+        """実際のAPIに転送してレスポンスを記録"""
+        if "client" not in upstream:
+            upstream["client"] = httpx.AsyncClient(timeout=30.0)
+        response = await upstream["client"].get(
+            config.upstream_url + request.url.path[len("/v1") :],
+            params=request.query_params,
+            headers={"Authorization": request.headers["Authorization"]},
+        )
+        body = response.json() if response.content else None
+        if response.status_code < 500 and response.status_code != 429:
+            fixtures.save(key, response.status_code, body, config.upstream_url)
+        stats["recorded"] += 1
+        return JSONResponse(body, status_code=response.status_code)
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        """認証・遅延・429の注入と、フィクスチャの記録・再生"""
+        if not request.url.path.startswith("/v1/"):
+            return await call_next(request)
+
+        stats["requests"] += 1
+        if _bearer_token(request) is None:
+            stats["unauthorized"] += 1
+            return _error(401, "No token provided")
+
+        latency = config.latency_ms + rng.uniform(0, config.latency_jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+        if config.rate_limit_ratio > 0 and rng.random() < config.rate_limit_ratio:
+            stats["rate_limited"] += 1
+            return _error(
+                429, "API rate limit exceeded", {"Retry-After": str(config.retry_after)}
+            )
+
+        if fixtures is not None:
+            key = fixture_key(request.url.path[len("/v1") :], dict(request.query_params))
+            if config.mode == MODE_RECORD:
+                return await forward(request, key)
+            loaded = fixtures.load(key, str(request.base_url).rstrip("/") + "/v1")
+            if loaded is not None:
+                stats["replayed"] += 1
+                status, body = loaded
+                return JSONResponse(body, status_code=status)
+
+        return await call_next(request)
+
+    def user_number(request: Request) -> int:
+        return catalog.user_number(_bearer_token(request))
+
+    @app.get("/v1/me")
+    async def me(request: Request):
+        return JSONResponse(catalog.user(user_number(request)))
+
+    @app.get("/v1/me/top/tracks")
+    async def top_tracks(
+        request: Request, limit: int = 20, offset: int = 0, time_range: str = "medium_term"
+    ):
+        if not 1 <= limit <= 50:
+            return _error(400, "Invalid limit")
+        numbers = catalog.top_track_numbers(user_number(request), time_range)
+        items = [catalog.track(n) for n in numbers[offset : offset + limit]]
+        return JSONResponse(_paging(request, items, len(numbers), offset, limit))
+
+    @app.get("/v1/me/playlists")
+    async def my_playlists(request: Request, limit: int = 20, offset: int = 0):
+        if not 1 <= limit <= 50:
+            return _error(400, "Invalid limit")
+        user = user_number(request)
+        end = min(offset + limit, catalog.playlists_per_user)
+        items = [
+            catalog.playlist(catalog.playlist_number(user, index), items=False)
+            for index in range(offset, end)
+        ]
+        return JSONResponse(
+            _paging(request, items, catalog.playlists_per_user, offset, limit)
+        )
+
+    @app.get("/v1/playlists/{playlist_id}")
+    async def playlist(request: Request, playlist_id: str, fields: Optional[str] = None):
+        number = parse_id("playlist", playlist_id)
+        if number is None:
+            return _error(404, "Not found.")
+        body = catalog.playlist(number)
+        body["tracks"]["next"] = (
+            f"{request.base_url}v1/playlists/{playlist_id}/tracks?offset=100&limit=100"
+            if catalog.playlist_size > 100
+            else None
+        )
+        return JSONResponse(project(body, parse_fields(fields)) if fields else body)
+
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    @app.get("/v1/playlists/{playlist_id}/items")
+    async def playlist_tracks(
+        request: Request,
+        playlist_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        fields: Optional[str] = None,
+    ):
+        number = parse_id("playlist", playlist_id)
+        if number is None:
+            return _error(404, "Not found.")
+        if not 1 <= limit <= 100:
+            return _error(400, "Invalid limit")
+        page = catalog.playlist_items(number, offset, limit)
+        body = _paging(request, page["items"], page["total"], offset, limit)
+        stats["tracks_served"] += len(page["items"])
+        return JSONResponse(project(body, parse_fields(fields)) if fields else body)
+
+    @app.get("/v1/artists")
+    async def artists(ids: Optional[str] = None):
+        artist_ids = _ids(ids, 50)
+        if artist_ids is None:
+            return _error(400, "Invalid ids")
+        numbers = [parse_id("artist", i) for i in artist_ids]
+        return JSONResponse(
+            {"artists": [catalog.artist(n) if n is not None else None for n in numbers]}
+        )
+
+    @app.get("/v1/artists/{artist_id}")
+    async def artist(artist_id: str):
+        number = parse_id("artist", artist_id)
+        if number is None:
+            return _error(404, "Not found.")
+        return JSONResponse(catalog.artist(number))
+
+    @app.get("/v1/audio-features")
+    @app.get("/v1/audio-features/")
+    async def audio_features(ids: Optional[str] = None):
+        track_ids = _ids(ids, 100)
+        if track_ids is None:
+            return _error(400, "Invalid ids")
+        numbers = [parse_id("track", i) for i in track_ids]
+        stats["features_served"] += len(numbers)
+        return JSONResponse(
+            {
+                "audio_features": [
+                    catalog.audio_features(n) if n is not None else None for n in numbers
+                ]
+            }
+        )
+
+    @app.get("/v1/audio-features/{track_id}")
+    async def track_audio_features(track_id: str):
+        number = parse_id("track", track_id)
+        if number is None:
+            return _error(404, "Not found.")
+        return JSONResponse(catalog.audio_features(number))
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        """受け付けたリクエスト数などの集計"""
+        return dict(stats)
+
+    return app
@@ -0,0 +1,289 @@
+"""
+フェイクSpotifyのカタログ - ユーザー・プレイリスト・曲・アーティストを決定的に生成
+"""
+
+import hashlib
+import random
+from typing import Any, Dict, List, Optional
+
+# アーティストに割り当てるジャンル
+GENRES = [
+    "j-pop",
+    "j-rock",
+    "anime",
+    "city pop",
+    "k-pop",
+    "pop",
+    "rock",
+    "indie",
+    "hip hop",
+    "r&b",
+    "edm",
+    "house",
+    "techno",
+    "jazz",
+    "classical",
+    "lo-fi",
+    "metal",
+    "folk",
+    "soul",
+    "ambient",
+]
+
+# アルバム・曲のavailable_markets（実際のAPIより短いが、fieldsの効果が分かる程度の長さ）
+MARKETS = ["JP", "US", "GB", "DE", "FR", "KR", "TW", "BR", "CA", "AU", "MX", "ES", "IT", "SE", "NL"]
+
+# SpotifyのIDと同じ22文字の英数字にする
+ID_LENGTH = 22
+
+
+def make_id(kind: str, number: int) -> str:
+    """種類と番号からIDを生成（例: track00000000000000042）"""
+    return f"{kind}{number:0{ID_LENGTH - len(kind)}d}"
+
+
+def parse_id(kind: str, value: str) -> Optional[int]:
+    """make_id()で生成したIDから番号を取り出す（形式が違う場合はNone）"""
+    if len(value) != ID_LENGTH or not value.startswith(kind):
+        return None
+    digits = value[len(kind) :]
+    return int(digits) if digits.isdigit() else None
+
+
+def _mix(*values: int) -> int:
+    """複数の整数から決定的なハッシュ値を求める"""
+    digest = hashlib.blake2b(
+        ",".join(str(v) for v in values).encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+class FakeCatalog:
+    """
+    決定的に生成されるフェイクのカタログ
+
+    状態を持たず、IDの番号から毎回同じオブジェクトを生成するため、
+    大きなプレイリストでもメモリを使わない。
+    """
+
+    def __init__(
+        self,
+        playlist_size: int = 200,
+        playlists_per_user: int = 10,
+        top_tracks: int = 50,
+        track_pool: int = 100000,
+        artist_pool: int = 5000,
+        seed: int = 0,
+    ):
+        """
+        初期化
+
+        Args:
+            playlist_size: 1プレイリストあたりの曲数
+            playlists_per_user: 1ユーザーあたりのプレイリスト数
+            top_tracks: 上位トラックの件数
+            track_pool: 曲の種類数（プレイリストはこの中から選ばれる）
+            artist_pool: アーティストの種類数
+            seed: 生成するデータを変えるためのシード
+        """
+        self.playlist_size = playlist_size
+        self.playlists_per_user = playlists_per_user
+        self.top_tracks = top_tracks
+        self.track_pool = track_pool
+        self.artist_pool = artist_pool
+        self.seed = seed
+
+    # ユーザー
+
+    def user_number(self, token_key: str) -> int:
+        """トークンからユーザー番号を求める（トークンごとに別のユーザーになる）"""
+        return _mix(self.seed, token_key) % 10**8
+
+    def user(self, user_number: int) -> Dict[str, Any]:
+        """ユーザーオブジェクト"""
+        user_id = make_id("user", user_number)
+        return {
+            "id": user_id,
+            "display_name": f"Fake User {user_number}",
+            "type": "user",
+            "uri": f"spotify:user:{user_id}",
+            "href": f"https://api.spotify.com/v1/users/{user_id}",
+            "external_urls": {"spotify": f"https://open.spotify.com/user/{user_id}"},
+            "followers": {"href": None, "total": 0},
+            "images": [],
+            "country": "JP",
+            "product": "premium",
+        }
+
+    def top_track_numbers(self, user_number: int, time_range: str) -> List[int]:
+        """ユーザーの上位トラックの曲番号"""
+        return [
+            _mix(self.seed, user_number, time_range, i) % self.track_pool
+            for i in range(self.top_tracks)
+        ]
+
+    # プレイリスト
+
+    def playlist_number(self, user_number: int, index: int) -> int:
+        """ユーザーのindex番目のプレイリストの番号"""
+        return user_number * 1000 + index
+
+    def playlist(self, playlist_number: int, items: bool = True) -> Dict[str, Any]:
+        """
+        プレイリストオブジェクト
+
+        Args:
+            playlist_number: プレイリスト番号
+            items: 曲一覧の1ページ目を含めるかどうか（一覧APIでは含めない）
+        """
+        playlist_id = make_id("playlist", playlist_number)
+        owner = self.user(playlist_number // 1000)
+        tracks: Dict[str, Any] = {
+            "href": f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
+            "total": self.playlist_size,
+        }
+        if items:
+            tracks.update(self.playlist_items(playlist_number, 0, 100))
+        return {
+            "id": playlist_id,
+            "name": f"Fake Playlist {playlist_number}",
+            "description": f"{self.playlist_size} generated tracks",
+            "collaborative": False,
+            "public": True,
+            "snapshot_id": f"snapshot{_mix(self.seed, playlist_number, self.playlist_size):x}",
+            "owner": {key: owner[key] for key in ("id", "display_name", "type", "uri", "href")},
+            "images": [
+                {"url": f"https://i.scdn.co/image/{playlist_id}{size}", "height": size, "width": size}
+                for size in (640, 300, 60)
+            ],
+            "type": "playlist",
+            "uri": f"spotify:playlist:{playlist_id}",
+            "href": f"https://api.spotify.com/v1/playlists/{playlist_id}",
+            "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"},
+            "tracks": tracks,
+        }
+
+    def playlist_items(
+        self, playlist_number: int, offset: int, limit: int
+    ) -> Dict[str, Any]:
+        """プレイリストの曲一覧の1ページ分（items/total/offset/limitのみ、nextは呼び出し側で付与）"""
+        end = min(offset + limit, self.playlist_size)
+        return {
+            "items": [
+                {
+                    "added_at": "2024-01-01T00:00:00Z",
+                    "added_by": {"id": make_id("user", playlist_number // 1000), "type": "user"},
+                    "is_local": False,
+                    "primary_color": None,
+                    "video_thumbnail": {"url": None},
+                    "track": self.track(_mix(self.seed, playlist_number, position) % self.track_pool),
+                }
+                for position in range(offset, end)
+            ],
+            "total": self.playlist_size,
+            "offset": offset,
+            "limit": limit,
+        }
+
+    # 曲・アーティスト
+
+    def track_artist_numbers(self, track_number: int) -> List[int]:
+        """曲のアーティスト番号（1〜2人）"""
+        count = 1 + track_number % 2
+        return [_mix(self.seed, "artist", track_number, i) % self.artist_pool for i in range(count)]
+
+    def track_duration(self, track_number: int) -> int:
+        """曲の長さ（ミリ秒）"""
+        return 120000 + _mix(self.seed, "duration", track_number) % 240000
+
+    def track(self, track_number: int) -> Dict[str, Any]:
+        """曲オブジェクト"""
+        track_id = make_id("track", track_number)
+        album_number = track_number // 10
+        album_id = make_id("album", album_number)
+        artists = [self.simple_artist(n) for n in self.track_artist_numbers(track_number)]
+        return {
+            "id": track_id,
+            "name": f"Fake Song {track_number}",
+            "duration_ms": self.track_duration(track_number),
+            "explicit": False,
+            "popularity": track_number % 100,
+            "track_number": track_number % 10 + 1,
+            "disc_number": 1,
+            "is_local": False,
+            "preview_url": None,
+            "type": "track",
+            "uri": f"spotify:track:{track_id}",
+            "href": f"https://api.spotify.com/v1/tracks/{track_id}",
+            "external_ids": {"isrc": f"JPFK{track_number:08d}"},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+            "available_markets": MARKETS,
+            "artists": artists,
+            "album": {
+                "id": album_id,
+                "name": f"Fake Album {album_number}",
+                "album_type": "album",
+                "total_tracks": 10,
+                "release_date": f"{2000 + album_number % 25}-01-01",
+                "release_date_precision": "day",
+                "type": "album",
+                "uri": f"spotify:album:{album_id}",
+                "href": f"https://api.spotify.com/v1/albums/{album_id}",
+                "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+                "available_markets": MARKETS,
+                "artists": artists[:1],
+                "images": [
+                    {"url": f"https://i.scdn.co/image/{album_id}{size}", "height": size, "width": size}
+                    for size in (640, 300, 64)
+                ],
+            },
+        }
+
+    def simple_artist(self, artist_number: int) -> Dict[str, Any]:
+        """曲・アルバムに含まれる簡易アーティストオブジェクト"""
+        artist_id = make_id("artist", artist_number)
+        return {
+            "id": artist_id,
+            "name": f"Fake Artist {artist_number}",
+            "type": "artist",
+            "uri": f"spotify:artist:{artist_id}",
+            "href": f"https://api.spotify.com/v1/artists/{artist_id}",
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+        }
+
+    def artist(self, artist_number: int) -> Dict[str, Any]:
+        """アーティストオブジェクト（ジャンルを含む）"""
+        count = 1 + artist_number % 3
+        genres = [GENRES[_mix(self.seed, "genre", artist_number, i) % len(GENRES)] for i in range(count)]
+        return {
+            **self.simple_artist(artist_number),
+            "genres": list(dict.fromkeys(genres)),
+            "popularity": artist_number % 100,
+            "followers": {"href": None, "total": artist_number * 37 % 1000000},
+            "images": [],
+        }
+
+    def audio_features(self, track_number: int) -> Dict[str, Any]:
+        """オーディオ特徴オブジェクト"""
+        rng = random.Random(_mix(self.seed, "features", track_number))
+        track_id = make_id("track", track_number)
+        return {
+            "id": track_id,
+            "danceability": round(rng.random(), 3),
+            "energy": round(rng.random(), 3),
+            "valence": round(rng.random(), 3),
+            "tempo": round(rng.uniform(60, 200), 3),
+            "acousticness": round(rng.random(), 3),
+            "instrumentalness": round(rng.random() ** 3, 3),
+            "liveness": round(rng.random() ** 2, 3),
+            "speechiness": round(rng.random() ** 3, 3),
+            "loudness": round(rng.uniform(-20, 0), 3),
+            "mode": rng.randint(0, 1),
+            "key": rng.randint(0, 11),
+            "time_signature": rng.choice([3, 4, 4, 4, 5]),
+            "duration_ms": self.track_duration(track_number),
+            "type": "audio_features",
+            "uri": f"spotify:track:{track_id}",
+            "track_href": f"https://api.spotify.com/v1/tracks/{track_id}",
+            "analysis_url": f"https://api.spotify.com/v1/audio-analysis/{track_id}",
+        }
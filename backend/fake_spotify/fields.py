@@ -0,0 +1,62 @@
+"""
+Spotify APIのfieldsパラメータ（例: "items(track(id,name)),total"）の解釈と適用
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+
+def parse_fields(fields: str) -> Dict[str, Optional[dict]]:
+    """
+    fields式を入れ子の辞書に変換
+
+    Args:
+        fields: fields式
+
+    Returns:
+        フィールド名をキーとした辞書（子フィールドの指定がない場合はNone）
+    """
+
+    def parse(pos: int) -> Tuple[Dict[str, Any], int]:
+        tree: Dict[str, Any] = {}
+        name = ""
+        while pos < len(fields):
+            char = fields[pos]
+            if char == "(":
+                tree[name.strip()], pos = parse(pos + 1)
+                name = ""
+            elif char == ")":
+                break
+            elif char == ",":
+                if name.strip():
+                    tree[name.strip()] = None
+                name = ""
+            else:
+                name += char
+            pos += 1
+        if name.strip():
+            tree[name.strip()] = None
+        return tree, pos
+
+    return parse(0)[0]
+
+
+def project(value: Any, tree: Dict[str, Optional[dict]]) -> Any:
+    """
+    Spotify APIと同じようにfieldsで指定された項目だけを残す
+
+    Args:
+        value: レスポンスのJSON
+        tree: parse_fields()の結果
+
+    Returns:
+        指定された項目だけを含むJSON（リストは要素ごとに適用）
+    """
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        name: value[name] if subtree is None else project(value[name], subtree)
+        for name, subtree in tree.items()
+        if name in value
+    }
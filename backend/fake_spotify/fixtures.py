@@ -0,0 +1,84 @@
+"""
+フェイクSpotifyのフィクスチャ - 実際のAPIのレスポンスを記録して再生
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# 記録したレスポンス中の絶対URL（nextなど）を再生時に置き換えるためのプレースホルダ
+BASE_URL_PLACEHOLDER = "{{base_url}}"
+
+
+def fixture_key(path: str, query: Dict[str, str]) -> str:
+    """
+    リクエストを識別するキー
+
+    Args:
+        path: /v1以降のパス（例: "/me/top/tracks"）
+        query: クエリパラメータ
+
+    Returns:
+        パスと並べ替えたクエリパラメータからなる文字列
+    """
+    params = "&".join(f"{key}={value}" for key, value in sorted(query.items()))
+    return f"GET {path}?{params}"
+
+
+class FixtureStore:
+    """
+    レスポンスをリクエストごとのJSONファイルとして保存するストア
+
+    ファイル名はキーのハッシュで、中身にキー・ステータス・ボディを持つ。
+    """
+
+    def __init__(self, directory: str):
+        """
+        初期化
+
+        Args:
+            directory: フィクスチャを保存するディレクトリ
+        """
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()[:24]
+        return self.directory / f"{digest}.json"
+
+    def load(self, key: str, base_url: str) -> Optional[Tuple[int, Any]]:
+        """
+        記録済みのレスポンスを取得
+
+        Args:
+            key: fixture_key()で求めたキー
+            base_url: 再生するサーバーのベースURL（nextなどの絶対URLに使う）
+
+        Returns:
+            (ステータスコード, ボディ)、記録がない場合はNone
+        """
+        path = self._path(key)
+        if not path.exists():
+            return None
+        fixture = json.loads(path.read_text(encoding="utf-8"))
+        body = json.dumps(fixture["body"]).replace(BASE_URL_PLACEHOLDER, base_url)
+        return fixture["status"], json.loads(body)
+
+    def save(self, key: str, status: int, body: Any, upstream_url: str):
+        """
+        レスポンスを記録
+
+        Args:
+            key: fixture_key()で求めたキー
+            status: ステータスコード
+            body: レスポンスのJSON
+            upstream_url: 記録元APIのベースURL（プレースホルダに置き換える）
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        body = json.loads(
+            json.dumps(body).replace(upstream_url.rstrip("/"), BASE_URL_PLACEHOLDER)
+        )
+        self._path(key).write_text(
+            json.dumps({"key": key, "status": status, "body": body}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
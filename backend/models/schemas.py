@@ -2,8 +2,8 @@
 Pydanticモデル - APIリクエスト/レスポンスの型定義
 """
 
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional, Dict
 
 
 class TrackResponse(BaseModel):
@@ -55,6 +55,34 @@ class PlaylistAnalysisResponse(BaseModel):
     stats: PlaylistStats
 
 
+class BatchPlaylistAnalysisRequest(BaseModel):
+    """複数プレイリストの一括分析のリクエスト"""
+    playlist_ids: List[str] = Field(min_length=1, max_length=100)
+
+
+class PlaylistStatsItem(BaseModel):
+    """一括分析のプレイリストごとの結果"""
+    playlist: PlaylistResponse
+    stats: PlaylistStats
+
+
+class DeduplicationReport(BaseModel):
+    """一括分析で重複した曲をまとめた効果"""
+    track_refs: int  # 各プレイリストの曲数の合計
+    unique_tracks: int  # 重複を除いた曲数
+    fetched_tracks: int  # キャッシュになくSpotifyから特徴量を取得した曲数
+    audio_features_requests: int  # 実際に送ったaudio-featuresのリクエスト数
+    requests_without_dedup: int  # プレイリストごとに取得した場合のリクエスト数
+    requests_saved: int
+
+
+class BatchPlaylistAnalysisResponse(BaseModel):
+    """複数プレイリストの一括分析結果"""
+    playlists: List[PlaylistStatsItem]
+    combined: PlaylistStats  # 重複を除いた全曲の統計情報
+    deduplication: DeduplicationReport
+
+
 class GenreDistributionItem(BaseModel):
     """ジャンル分布のアイテム"""
     genre: str
@@ -81,6 +109,18 @@ class TempoTrendsResponse(BaseModel):
     distribution: List[TempoDistributionItem]
 
 
+class FeaturePercentilesResponse(BaseModel):
+    """オーディオ特徴量の分位点のレスポンス"""
+    track_count: int
+    percentiles: Dict[str, Dict[str, float]]
+
+
+class SimilarTrackItem(BaseModel):
+    """類似曲検索の結果のアイテム"""
+    id: str
+    distance: float
+
+
 class AnalysisHistoryResponse(BaseModel):
     """分析履歴のレスポンス"""
     id: int
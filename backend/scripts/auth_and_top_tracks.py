@@ -3,25 +3,15 @@
 実行: python -m scripts.auth_and_top_tracks
 """
 
-import os
 from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+
+from scripts.spotify_session import create_spotify
 
 load_dotenv()
 
 SCOPE = "user-top-read"
 
-sp = spotipy.Spotify(
-    auth_manager=SpotifyOAuth(
-        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-        scope=SCOPE,
-        cache_path=".cache-spotify",  # トークンをローカルキャッシュ
-        open_browser=True,  # 自動でブラウザ起動
-    ),
-)
+sp = create_spotify(SCOPE, open_browser=True)
 
 me = sp.current_user()
 print("✅ Authenticated as:", me["display_name"])
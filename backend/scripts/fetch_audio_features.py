@@ -4,26 +4,18 @@
 事前に tracks_basic.csv が必要です
 """
 
-import os
+import asyncio
 from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 import pandas as pd
-from math import ceil
+
+from scripts.spotify_session import create_spotify
+from services.feature_store import get_feature_store
 
 load_dotenv()
 
 SCOPE = "user-top-read playlist-read-private playlist-read-collaborative user-library-read"
 
-sp = spotipy.Spotify(
-    auth_manager=SpotifyOAuth(
-        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-        scope=SCOPE,
-        cache_path=".cache-spotify",
-    ),
-)
+sp = create_spotify(SCOPE)
 
 # すでに作成済みのtracks_basic.csvを読み込み
 tracks_df = pd.read_csv("tracks_basic.csv")
@@ -33,13 +25,24 @@ print(f"📊 Processing {len(track_ids)} tracks...")
 
 # Spotify APIは一度に最大100曲まで取得可能
 batch_size = 100
-features_list = []
 
-for i in range(0, len(track_ids), batch_size):
-    batch = track_ids[i : i + batch_size]
-    features = sp.audio_features(batch)
-    features_list.extend([f for f in features if f is not None])
-    print(f"  Processed {min(i + batch_size, len(track_ids))}/{len(track_ids)}")
+
+async def fetch(missing_ids):
+    """未キャッシュの曲の特徴量をAPIで取得（スクリプトなので同期のまま順に呼び出す）"""
+    cached = len(track_ids) - len(missing_ids)
+    print(f"  {cached} tracks found in cache, fetching {len(missing_ids)} tracks")
+    fetched = []
+    for i in range(0, len(missing_ids), batch_size):
+        batch = missing_ids[i : i + batch_size]
+        fetched.extend(sp.audio_features(batch))
+        print(f"  Processed {min(i + batch_size, len(missing_ids))}/{len(missing_ids)}")
+    return fetched
+
+
+# 取得済みの特徴量は共有キャッシュから読み込み、未取得の曲だけをAPIで取得
+# （特徴量がない曲の記録もAPIと同じく、有効期限まで問い合わせない）
+features_by_id = asyncio.run(get_feature_store().get_or_fetch(track_ids, fetch))
+features_list = list(features_by_id.values())
 
 # 特徴量をDataFrameに変換
 features_df = pd.DataFrame(features_list)
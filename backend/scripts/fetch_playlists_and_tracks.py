@@ -3,38 +3,45 @@
 実行: python -m scripts.fetch_playlists_and_tracks
 """
 
-import os
 from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 
+from scripts.spotify_session import create_spotify
+
 load_dotenv()
 
 SCOPE = "playlist-read-private playlist-read-collaborative"
 
-sp = spotipy.Spotify(
-    auth_manager=SpotifyOAuth(
-        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-        scope=SCOPE,
-        cache_path=".cache-spotify",
-    ),
-)
+sp = create_spotify(SCOPE)
+
+
+def _page(result: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """レスポンスからページングオブジェクトを取り出す（keyで包まれていない場合はそのまま）"""
+    page = result.get(key)
+    return page if isinstance(page, dict) else result
+
+
+def paginate(func, key: str, limit: int = 50, max_workers: int = 8, **kwargs):
+    """
+    Spotifyのページングユーティリティ
+
+    1ページ目のtotalから残りのoffsetを計算し、最大max_workers件を並行して取得する。
+    結果は元の順序のまま返す。
+    """
+
+    def fetch(offset: int) -> Dict[str, Any]:
+        return _page(func(limit=limit, offset=offset, **kwargs), key)
 
+    first = fetch(0)
+    offsets = range(limit, first["total"], limit)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = [first, *executor.map(fetch, offsets)]
 
-def paginate(func, key: str, limit: int = 50, **kwargs):
-    """Spotifyのページングユーティリティ"""
-    offset = 0
     items = []
-    while True:
-        result = func(limit=limit, offset=offset, **kwargs)
-        items.extend(result[key]["items"])
-        if result[key]["next"] is None:
-            break
-        offset += limit
+    for page in pages:
+        items.extend(page["items"])
     return items
 
 
@@ -0,0 +1,40 @@
+"""
+スクリプト共通のspotipyクライアント生成
+"""
+
+import os
+import spotipy
+from spotipy.oauth2 import SpotifyOAuth
+
+from core.config import SPOTIFY_API_BASE_URL, SPOTIFY_ACCESS_TOKEN
+
+
+def create_spotify(scope: str, **oauth_options) -> spotipy.Spotify:
+    """
+    spotipyクライアントを生成
+
+    SPOTIFY_ACCESS_TOKENが設定されている場合はOAuthを行わずにそのトークンを使い、
+    接続先はSPOTIFY_API_BASE_URLに従う（フェイクSpotifyでのオフライン実行用）。
+
+    Args:
+        scope: OAuthのスコープ
+        **oauth_options: SpotifyOAuthに渡す追加の引数
+
+    Returns:
+        spotipy.Spotify
+    """
+    if SPOTIFY_ACCESS_TOKEN:
+        sp = spotipy.Spotify(auth=SPOTIFY_ACCESS_TOKEN)
+    else:
+        sp = spotipy.Spotify(
+            auth_manager=SpotifyOAuth(
+                client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+                client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+                redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+                scope=scope,
+                cache_path=".cache-spotify",  # トークンをローカルキャッシュ
+                **oauth_options,
+            ),
+        )
+    sp.prefix = SPOTIFY_API_BASE_URL.rstrip("/") + "/"
+    return sp
@@ -0,0 +1,94 @@
+"""
+分析結果のレスポンスキャッシュ - ユーザー・エンドポイント・条件ごとに/analytics系APIの結果を共有
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.config import ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL
+from services.cache import create_cache
+from services.singleflight import SingleFlight
+
+
+class AnalyticsCache:
+    """
+    (ユーザーID, エンドポイント, limit, time_range)をキーとした分析結果のキャッシュ
+
+    ユーザーの上位トラックは頻繁には変わらないため、Spotifyからの取得と分析を
+    有効期限（TTL）の間は省略する。バックエンドはプロセス内（TTLCache）または
+    Redis（RedisCache、複数のuvicornワーカーで共有）で、どちらも件数上限を超えると
+    最も古く使われた結果から削除する。値はJSONにできる形で保存する。
+    """
+
+    def __init__(self, backend: Optional[Any] = None):
+        """
+        初期化
+
+        Args:
+            backend: キャッシュのバックエンド（Noneの場合は設定に応じて生成）
+        """
+        self.backend = backend or create_cache(
+            "analytics", max_size=ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL
+        )
+        # 同じキーで同時にミスした場合は1回だけ分析する
+        self.singleflight = SingleFlight()
+
+    @staticmethod
+    def key(user_id: str, endpoint: str, limit: int, time_range: str) -> str:
+        """キャッシュのキー（Redisのキーにも使うため文字列）"""
+        return f"{user_id}:{endpoint}:{limit}:{time_range}"
+
+    async def get_or_compute(
+        self,
+        user_id: str,
+        endpoint: str,
+        limit: int,
+        time_range: str,
+        compute: Callable[[], Awaitable[Any]],
+        refresh: bool = False,
+    ) -> Tuple[Any, bool]:
+        """
+        リードスルーで分析結果を取得（キャッシュにない場合はcomputeで分析して保存）
+
+        Args:
+            user_id: Spotify User ID（"unknown"の場合は他のユーザーと混ざらないようキャッシュしない）
+            endpoint: エンドポイントの名前（"genre", "mood"など）
+            limit: 分析に使用する上位トラック数
+            time_range: 期間
+            compute: 分析結果を返すコルーチン関数
+            refresh: Trueの場合はキャッシュを読まずに分析し直し、結果で置き換える
+
+        Returns:
+            (分析結果, キャッシュから返したかどうか)
+        """
+        if user_id == "unknown":
+            return await compute(), False
+
+        key = self.key(user_id, endpoint, limit, time_range)
+        if not refresh:
+            found = await self.backend.aget_many([key])
+            if key in found:
+                return found[key], True
+
+        async def compute_and_store():
+            result = await compute()
+            await self.backend.aset_many({key: result})
+            return result
+
+        if refresh:
+            return await compute_and_store(), False
+        return await self.singleflight.do(key, compute_and_store), False
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・保持件数を返す"""
+        return self.backend.stats()
+
+
+_analytics_cache: Optional[AnalyticsCache] = None
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    """プロセス共通のAnalyticsCacheを取得"""
+    global _analytics_cache
+    if _analytics_cache is None:
+        _analytics_cache = AnalyticsCache()
+    return _analytics_cache
@@ -0,0 +1,67 @@
+"""
+アーティストのジャンルキャッシュ - リクエスト・ワーカー間で共有
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.config import ARTIST_CACHE_SIZE, ARTIST_CACHE_TTL
+from services.cache import create_cache
+
+
+class ArtistGenreCache:
+    """
+    アーティストIDをキーとしたジャンルのキャッシュ
+
+    ジャンルはめったに変わらないため、有効期限（TTL）付きで保持する。
+    バックエンドはプロセス内（TTLCache）またはRedis（RedisCache）。
+    """
+
+    def __init__(self, backend: Optional[Any] = None):
+        """
+        初期化
+
+        Args:
+            backend: キャッシュのバックエンド（Noneの場合は設定に応じて生成）
+        """
+        self.backend = backend or create_cache(
+            "artist_genres", max_size=ARTIST_CACHE_SIZE, ttl=ARTIST_CACHE_TTL
+        )
+
+    async def get_or_fetch(
+        self,
+        artist_ids: List[str],
+        fetcher: Callable[[List[str]], Awaitable[Dict[str, List[str]]]],
+    ) -> Dict[str, List[str]]:
+        """
+        リードスルーでジャンルを取得（キャッシュにないものだけをfetcherで取得して保存）
+
+        Args:
+            artist_ids: アーティストIDのリスト
+            fetcher: 未キャッシュのIDリストを受け取り、IDをキーとしたジャンルの辞書を返すコルーチン関数
+
+        Returns:
+            アーティストIDをキーとしたジャンルリストの辞書
+        """
+        artist_ids = list(dict.fromkeys(artist_ids))
+        found = await self.backend.aget_many(artist_ids)
+        missing = [artist_id for artist_id in artist_ids if artist_id not in found]
+        if missing:
+            fetched = await fetcher(missing)
+            await self.backend.aset_many(fetched)
+            found.update(fetched)
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・保持件数を返す"""
+        return self.backend.stats()
+
+
+_artist_cache: Optional[ArtistGenreCache] = None
+
+
+def get_artist_cache() -> ArtistGenreCache:
+    """プロセス共通のArtistGenreCacheを取得"""
+    global _artist_cache
+    if _artist_cache is None:
+        _artist_cache = ArtistGenreCache()
+    return _artist_cache
@@ -0,0 +1,344 @@
+"""
+キャッシュ - プロセス内のLRU/TTLキャッシュとRedisバックエンド
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from core.config import CACHE_BACKEND, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """件数上限付きのLRUキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_size: int = 1024):
+        """
+        初期化
+
+        Args:
+            max_size: 保持する最大件数（超えた場合は最も古く使われたものから削除）
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """値を取得（見つかった場合は最近使われたものとして扱う）"""
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """複数の値を取得（見つからなかったキーは結果に含まれない）"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def set(self, key: Hashable, value: Any):
+        """値を保存"""
+        with self._lock:
+            self._set(key, value)
+
+    def set_many(self, mapping: Dict[Hashable, Any]):
+        """複数の値を保存"""
+        with self._lock:
+            for key, value in mapping.items():
+                self._set(key, value)
+
+    def delete(self, key: Hashable):
+        """値を削除"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """すべての値を削除"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・保持件数を返す"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def _set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+
+class TTLCache(LRUCache):
+    """有効期限付きのLRUキャッシュ（プロセス内バックエンド）"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        """
+        初期化
+
+        Args:
+            max_size: 保持する最大件数
+            ttl: 値の有効期限（秒）
+        """
+        super().__init__(max_size)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """値を取得（期限切れの場合は削除して見つからなかったものとして扱う）"""
+        found = self.get_many([key])
+        return found.get(key, default)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """複数の値を取得（期限切れ・見つからなかったキーは結果に含まれない）"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] > now:
+                    self._data.move_to_end(key)
+                    found[key] = entry[1]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._data[key]
+                    self.misses += 1
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """値を保存"""
+        self.set_many({key: value}, ttl=ttl)
+
+    def set_many(self, mapping: Dict[Hashable, Any], ttl: Optional[float] = None):
+        """複数の値を保存"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in mapping.items():
+                self._set(key, (expires_at, value))
+
+    async def aget_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """get_many()のコルーチン版（プロセス内のためそのまま実行する）"""
+        return self.get_many(keys)
+
+    async def aset_many(self, mapping: Dict[Hashable, Any], ttl: Optional[float] = None):
+        """set_many()のコルーチン版（プロセス内のためそのまま実行する）"""
+        self.set_many(mapping, ttl=ttl)
+
+
+# 有効期限（ARGV[2]の現在時刻）を過ぎたキーと、件数上限（ARGV[1]）を超えた分を削除する。
+# KEYS[1]はアクセス時刻、KEYS[2]は有効期限をスコアとしたソート済みセットで、
+# RedisのEXで消えたキーもここで両方のセットから取り除く（unpackの引数の上限を超えないよう1000件ずつ）
+REDIS_EVICT_SCRIPT = """
+local removed = 0
+local function remove(members)
+    for i = 1, #members, 1000 do
+        local chunk = {unpack(members, i, math.min(i + 999, #members))}
+        redis.call('DEL', unpack(chunk))
+        redis.call('ZREM', KEYS[1], unpack(chunk))
+        redis.call('ZREM', KEYS[2], unpack(chunk))
+    end
+    removed = removed + #members
+end
+remove(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[2]))
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[1])
+if excess > 0 then
+    remove(redis.call('ZRANGE', KEYS[1], 0, excess - 1))
+end
+return removed
+"""
+
+
+class RedisCache:
+    """
+    Redisを使う有効期限付きキャッシュ（複数ワーカーで共有）
+
+    値はJSONで保存し、SETのEXで有効期限を設定する。
+    件数上限はアクセス時刻をスコアとしたソート済みセットで管理し、
+    上限を超えた場合は最も古く使われたキーから削除する（保存と同じパイプラインでLuaスクリプトを実行）。
+    有効期限をスコアとしたソート済みセットも持ち、期限切れで消えたキーは同じスクリプトで索引から除く。
+    クライアントは同期版のため、イベントループからはaget_many()/aset_many()でスレッドに移して呼ぶ。
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        namespace: str,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+    ):
+        """
+        初期化
+
+        Args:
+            client: redis.Redis互換のクライアント
+            namespace: キーの接頭辞
+            max_size: 保持する最大件数
+            ttl: 値の有効期限（秒）
+        """
+        self.client = client
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._index_key = f"{namespace}:__lru__"
+        self._expiry_key = f"{namespace}:__expiry__"
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _evict(self, pipe: Any):
+        """期限切れ・件数上限を超えたキーを削除するスクリプトをパイプラインに追加"""
+        pipe.eval(
+            REDIS_EVICT_SCRIPT, 2, self._index_key, self._expiry_key, self.max_size, time.time()
+        )
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """値を取得"""
+        found = self.get_many([key])
+        return found.get(key, default)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """複数の値を取得（期限切れ・見つからなかったキーは結果に含まれない）"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = self.client.mget([self._key(key) for key in keys])
+        except Exception as e:
+            logger.warning("Redis cache read failed (%s): %s", self.namespace, e)
+            self.misses += len(keys)
+            return {}
+
+        found = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                self.misses += 1
+                continue
+            found[key] = json.loads(value)
+            self.hits += 1
+
+        if found:
+            now = time.time()
+            try:
+                self.client.zadd(
+                    self._index_key, {self._key(key): now for key in found}
+                )
+            except Exception as e:
+                logger.warning("Redis cache touch failed (%s): %s", self.namespace, e)
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """値を保存"""
+        self.set_many({key: value}, ttl=ttl)
+
+    def set_many(self, mapping: Dict[Hashable, Any], ttl: Optional[float] = None):
+        """複数の値を保存"""
+        if not mapping:
+            return
+        expire = max(1, int(self.ttl if ttl is None else ttl))
+        now = time.time()
+        try:
+            pipe = self.client.pipeline()
+            for key, value in mapping.items():
+                pipe.set(self._key(key), json.dumps(value), ex=expire)
+            pipe.zadd(self._index_key, {self._key(key): now for key in mapping})
+            pipe.zadd(self._expiry_key, {self._key(key): now + expire for key in mapping})
+            # 期限切れ・件数上限を超えた分の削除も同じ往復で行う
+            self._evict(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Redis cache write failed (%s): %s", self.namespace, e)
+
+    async def aget_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """get_many()のコルーチン版（Redisとの通信をスレッドで行う）"""
+        return await asyncio.to_thread(self.get_many, list(keys))
+
+    async def aset_many(self, mapping: Dict[Hashable, Any], ttl: Optional[float] = None):
+        """set_many()のコルーチン版（Redisとの通信をスレッドで行う）"""
+        await asyncio.to_thread(self.set_many, mapping, ttl)
+
+    def delete(self, key: Hashable):
+        """値を削除"""
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(self._key(key))
+            pipe.zrem(self._index_key, self._key(key))
+            pipe.zrem(self._expiry_key, self._key(key))
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Redis cache delete failed (%s): %s", self.namespace, e)
+
+    def clear(self):
+        """この名前空間の値をすべて削除"""
+        try:
+            keys = self.client.zrange(self._index_key, 0, -1)
+            if keys:
+                self.client.delete(*keys)
+            self.client.delete(self._index_key, self._expiry_key)
+        except Exception as e:
+            logger.warning("Redis cache clear failed (%s): %s", self.namespace, e)
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・保持件数を返す（期限切れのキーを索引から除いてから数える）"""
+        try:
+            pipe = self.client.pipeline()
+            self._evict(pipe)
+            pipe.zcard(self._index_key)
+            size = int(pipe.execute()[-1])
+        except Exception:
+            size = -1
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+_redis_client: Optional[Any] = None
+
+
+def get_redis_client() -> Any:
+    """プロセス共通のRedisクライアントを取得"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def create_cache(namespace: str, max_size: int, ttl: float):
+    """
+    設定（CACHE_BACKEND）に応じたキャッシュを生成
+
+    Args:
+        namespace: キャッシュの名前（Redisではキーの接頭辞）
+        max_size: 保持する最大件数
+        ttl: 値の有効期限（秒）
+
+    Returns:
+        TTLCache（"memory"）またはRedisCache（"redis"）
+    """
+    if CACHE_BACKEND == "redis":
+        return RedisCache(get_redis_client(), namespace, max_size=max_size, ttl=ttl)
+    return TTLCache(max_size=max_size, ttl=ttl)
@@ -0,0 +1,222 @@
+"""
+クラスタ数の自動選択 - 複数のkをプロセスプールで並列に評価して最良のモデルを選ぶ
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+from core.config import (
+    CLUSTER_AUTO_K_CACHE_SIZE,
+    CLUSTER_AUTO_K_TIME_BUDGET,
+    CLUSTER_AUTO_K_WORKERS,
+)
+from services.cache import LRUCache
+
+# 評価するクラスタ数の範囲（曲数が少ない場合は曲数-1まで）
+AUTO_K_MIN = 2
+AUTO_K_MAX = 10
+
+# シルエット係数を計算するサンプル数（全件ではO(n^2)になるため）
+SILHOUETTE_SAMPLE_SIZE = 2000
+
+# 特徴量行列のハッシュをキーにした選択結果のキャッシュ
+_selection_cache = LRUCache(max_size=CLUSTER_AUTO_K_CACHE_SIZE)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    """
+    プロセス共通のプロセスプールを取得（起動コストが大きいため使い回す）
+
+    イベントループやCeleryのスレッドを持つプロセスからforkしないよう、spawnで起動する。
+    spawnしたワーカーはscikit-learnの読み込みに時間がかかるため、起動を待ってから返す
+    （起動時間を評価の制限時間に含めない）。
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            for future in [executor.submit(_warm_up) for _ in range(max_workers)]:
+                future.result()
+            _executor = executor
+        return _executor
+
+
+def _warm_up() -> int:
+    """ワーカーの起動確認（このモジュールの読み込みが終わった時点で返る）"""
+    return os.getpid()
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """
+    打ち切った評価が実行中のプロセスプールを終了して破棄（次回は新しいプールを起動する）
+
+    実行中のFutureはcancel()では止まらず、残したままでは以降の呼び出しのワーカーを
+    占有するため、ワーカープロセスごと終了する。同じプールで評価中の他の呼び出しの
+    Futureは BrokenProcessPool で終わる。
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    # ProcessPoolExecutorにはワーカーを止める公開APIがないため、プロセスを直接終了する
+    for process in list(getattr(executor, "_processes", {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _evaluate_k(
+    X_scaled: np.ndarray,
+    n_clusters: int,
+    sample_size: int,
+    random_state: int,
+    method: str = "kmeans",
+) -> Dict[str, Any]:
+    """
+    1つのkでk-meansを学習して評価（プロセスプールで実行）
+
+    Returns:
+        n_clusters・inertia・silhouette・学習済みモデルの辞書
+    """
+    if method == "minibatch":
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters, batch_size=1024, n_init=3, random_state=random_state
+        )
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=random_state, n_init=10)
+    labels = kmeans.fit_predict(X_scaled)
+    if len(np.unique(labels)) < 2:
+        # 重複した曲ばかりでクラスタが潰れた場合は評価できない
+        silhouette = -1.0
+    else:
+        silhouette = float(
+            silhouette_score(
+                X_scaled,
+                labels,
+                sample_size=min(sample_size, len(X_scaled)),
+                random_state=random_state,
+            )
+        )
+    return {
+        "n_clusters": n_clusters,
+        "inertia": float(kmeans.inertia_),
+        "silhouette": silhouette,
+        "model": kmeans,
+    }
+
+
+def matrix_key(X: np.ndarray, *params: Any) -> str:
+    """特徴量行列と評価条件から求めたキャッシュのキー"""
+    X = np.ascontiguousarray(X, dtype=float)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((X.shape, params)).encode())
+    digest.update(X.tobytes())
+    return digest.hexdigest()
+
+
+def select_n_clusters(
+    X_scaled: np.ndarray,
+    k_min: int = AUTO_K_MIN,
+    k_max: int = AUTO_K_MAX,
+    time_budget: Optional[float] = None,
+    max_workers: Optional[int] = None,
+    sample_size: int = SILHOUETTE_SAMPLE_SIZE,
+    random_state: int = 42,
+    use_cache: bool = True,
+    method: str = "kmeans",
+) -> Dict[str, Any]:
+    """
+    k_min〜k_maxのクラスタ数を評価し、シルエット係数が最も高いモデルを選ぶ
+
+    各kは並列に評価し、制限時間を過ぎた時点で終わっていないkは打ち切る
+    （1つも終わっていない場合は最初の1つを待つ。打ち切った場合はプロセスプールを終了する）。
+    シルエット係数が同じ場合はinertiaが小さい方を選ぶ。
+    全てのkを評価できた結果だけをキャッシュする。
+
+    Args:
+        X_scaled: 標準化済みの特徴量行列
+        k_min: 評価する最小のクラスタ数
+        k_max: 評価する最大のクラスタ数
+        time_budget: 制限時間（秒、Noneの場合はCLUSTER_AUTO_K_TIME_BUDGET）
+        max_workers: 並列に評価するプロセス数（Noneの場合はCLUSTER_AUTO_K_WORKERS、0で順に評価）
+        sample_size: シルエット係数を計算するサンプル数
+        random_state: 乱数のシード
+        use_cache: 同じ行列・条件の結果をキャッシュから返すかどうか
+        method: 各kの学習方法（"kmeans"または"minibatch"）
+
+    Returns:
+        n_clusters（選ばれたk）・model（学習済みKMeansまたはMiniBatchKMeans）・
+        scores（kごとのinertiaとsilhouette）・complete（全てのkを評価できたか）の辞書
+    """
+    if method not in ("kmeans", "minibatch"):
+        raise ValueError(f"未対応のクラスタリング方法です: {method}")
+    if time_budget is None:
+        time_budget = CLUSTER_AUTO_K_TIME_BUDGET
+    if max_workers is None:
+        max_workers = CLUSTER_AUTO_K_WORKERS
+
+    # シルエット係数は2 <= k <= 曲数-1でのみ定義される
+    candidates = list(range(max(k_min, 2), min(k_max, len(X_scaled) - 1) + 1))
+    if not candidates:
+        raise ValueError("クラスタ数を自動選択するには3曲以上が必要です")
+
+    key = matrix_key(X_scaled, candidates, sample_size, random_state, method)
+    if use_cache:
+        cached = _selection_cache.get(key)
+        if cached is not None:
+            return cached
+
+    deadline = time.monotonic() + time_budget
+    results: List[Dict[str, Any]] = []
+    if max_workers <= 0 or len(candidates) == 1:
+        for n_clusters in candidates:
+            if results and time.monotonic() >= deadline:
+                break
+            results.append(
+                _evaluate_k(X_scaled, n_clusters, sample_size, random_state, method)
+            )
+    else:
+        executor = _get_executor(max_workers)
+        futures: List[Future] = [
+            executor.submit(
+                _evaluate_k, X_scaled, n_clusters, sample_size, random_state, method
+            )
+            for n_clusters in candidates
+        ]
+        done, pending = wait(futures, timeout=time_budget)
+        if not done:
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+        if pending:
+            _discard_executor(executor)
+        results = [future.result() for future in done if future.exception() is None]
+        if not results:
+            # 他の呼び出しがプールを終了した場合は、最小のkだけをこのプロセスで評価する
+            results = [
+                _evaluate_k(X_scaled, candidates[0], sample_size, random_state, method)
+            ]
+
+    best = max(results, key=lambda r: (r["silhouette"], -r["inertia"]))
+    selection = {
+        "n_clusters": best["n_clusters"],
+        "model": best["model"],
+        "scores": {
+            r["n_clusters"]: {"inertia": r["inertia"], "silhouette": r["silhouette"]}
+            for r in sorted(results, key=lambda r: r["n_clusters"])
+        },
+        "complete": len(results) == len(candidates),
+    }
+    if use_cache and selection["complete"]:
+        _selection_cache.set(key, selection)
+    return selection
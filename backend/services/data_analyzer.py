@@ -1,75 +1,287 @@
 """
 データ分析処理 - pandasで分析処理
+
+pandasとscikit-learnは読み込みに時間がかかるため、APIやワーカーの起動時ではなく
+DataFrameやクラスタリングを使う時点で読み込む（ジャンル・ムード・テンポなどの
+静的メソッドはnumpyだけで動く）。
 """
 
-import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Iterable, List, Any, Mapping, Optional, Sequence, Tuple, Union
+
+from services.feature_matrix import FeatureMatrix
+from services.stats_accumulator import FeatureAccumulator
+from services.quantile_sketch import DEFAULT_PERCENTILES, FeatureSketches
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+
+# 統計量を計算するオーディオ特徴量
+STATISTICS_FEATURES = [
+    "danceability",
+    "energy",
+    "valence",
+    "tempo",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+]
+
+# テンポ分布の区間の境界（右閉区間）とラベル
+TEMPO_BIN_EDGES = np.array([0, 60, 80, 100, 120, 140, 160, 180, 200, 220, np.inf])
+TEMPO_BIN_LABELS = [
+    "0-60",
+    "60-80",
+    "80-100",
+    "100-120",
+    "120-140",
+    "140-160",
+    "160-180",
+    "180-200",
+    "200-220",
+    "220+",
+]
+
+# genre_distribution・mood_map・tempo_trendsの入力
+# （トラックごとの辞書のリスト、または列名から配列への辞書）
+TracksData = Union[List[Dict[str, Any]], Mapping[str, Sequence[Any]]]
+
+# クラスタリング・クラスタの特徴に使うオーディオ特徴量
+CLUSTER_FEATURES = [
+    "danceability",
+    "energy",
+    "valence",
+    "acousticness",
+    "instrumentalness",
+]
+
+
+def grouped_statistics(
+    values: np.ndarray, labels: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    グループごと・列ごとの件数・平均・標準偏差・最小値・最大値を一度に計算
+
+    ラベルで並べ替えてからnp.ufunc.reduceatで集計するため、
+    グループ数に関係なくデータを数回なめるだけで済む。NaNはpandasと同じく除外する。
+
+    Args:
+        values: (行数, 列数)の数値配列
+        labels: 各行のグループラベル（Noneの場合は全体を1グループとする）
+
+    Returns:
+        {"groups": グループラベル, "count", "mean", "std", "min", "max": (グループ数, 列数)の配列}
+        stdはpandasと同じ不偏標準偏差（件数が1以下の場合はNaN）
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    if labels is None:
+        groups = np.zeros(1, dtype=int)
+        sizes = np.array([len(values)])
+    else:
+        import pandas as pd
+
+        # ハッシュでラベルを番号に変換（np.uniqueの全件ソートより速い）
+        group_index, groups = pd.factorize(np.asarray(labels), sort=True)
+        sizes = np.bincount(group_index, minlength=len(groups))
+
+    n_columns = values.shape[1]
+    if len(values) == 0:
+        empty = np.full((len(groups), n_columns), np.nan)
+        return {
+            "groups": groups,
+            "count": np.zeros((len(groups), n_columns), dtype=int),
+            "mean": empty,
+            "std": empty.copy(),
+            "min": empty.copy(),
+            "max": empty.copy(),
+        }
+
+    if labels is None:
+        sorted_values = values
+    else:
+        # 小さい整数型にすると安定ソートが基数ソートになり、O(n)で並べ替えられる
+        index_dtype = np.uint16 if len(groups) <= np.iinfo(np.uint16).max else np.int64
+        order = np.argsort(group_index.astype(index_dtype), kind="stable")
+        sorted_values = np.take(values, order, axis=0)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    valid = ~np.isnan(sorted_values)
+    if valid.all():
+        # NaNがなければマスク処理を省く
+        count = np.repeat(sizes[:, None], n_columns, axis=1)
+        filled = sorted_values
+        minimum = np.minimum.reduceat(sorted_values, starts, axis=0)
+        maximum = np.maximum.reduceat(sorted_values, starts, axis=0)
+    else:
+        count = np.add.reduceat(valid, starts, axis=0)
+        filled = np.where(valid, sorted_values, 0.0)
+        minimum = np.minimum.reduceat(np.where(valid, sorted_values, np.inf), starts, axis=0)
+        maximum = np.maximum.reduceat(np.where(valid, sorted_values, -np.inf), starts, axis=0)
+    total = np.add.reduceat(filled, starts, axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        # 平均を引いてから二乗和を取る（E[x^2] - E[x]^2 より桁落ちしにくい）
+        deviation = filled - np.repeat(mean, sizes, axis=0)
+        if filled is not sorted_values:
+            deviation[~valid] = 0.0
+        squares = np.add.reduceat(deviation * deviation, starts, axis=0)
+        std = np.sqrt(squares / (count - 1))
+
+    empty = count == 0
+    mean[empty] = np.nan
+    minimum[empty] = np.nan
+    maximum[empty] = np.nan
+    std[count < 2] = np.nan
+    return {
+        "groups": groups,
+        "count": count,
+        "mean": mean,
+        "std": std,
+        "min": minimum,
+        "max": maximum,
+    }
+
+
+def _column_values(columns: Mapping[str, Sequence[Any]], name: str) -> List[Any]:
+    """列ごとの配列の辞書から1列をPythonの値のリストとして取り出す（列がなければ空）"""
+    values = columns.get(name)
+    if values is None:
+        return []
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return list(values)
+
+
+def _mean_std(values: np.ndarray) -> Tuple[float, float]:
+    """
+    pandasのmean()・std()と同じ計算順序で平均と不偏標準偏差を求める
+
+    NaNは0に置き換えて合計し、件数からは除く（2件未満の標準偏差はNaN）。
+    """
+    missing = np.isnan(values)
+    count = values.size - int(missing.sum())
+    if missing.any():
+        values = np.where(missing, 0.0, values)
+    if count == 0:
+        return float("nan"), float("nan")
+    mean = values.sum() / count
+    with np.errstate(invalid="ignore"):
+        # infを含む場合はpandasと同じくNaNになる
+        squared = (mean - values) ** 2
+    if missing.any():
+        squared[missing] = 0.0
+    std = float(np.sqrt(squared.sum() / (count - 1))) if count > 1 else float("nan")
+    return float(mean), std
 
 
 class DataAnalyzer:
     """プレイリストデータの分析を行うクラス"""
 
-    def __init__(self, features_df: pd.DataFrame):
+    def __init__(self, features_df: Union["pd.DataFrame", FeatureMatrix, None] = None):
         """
         初期化
 
         Args:
-            features_df: オーディオ特徴量を含むDataFrame
+            features_df: オーディオ特徴量を含むDataFrame、またはFeatureMatrix
+                （Noneの場合は空のDataFrame、集計からの統計量の計算だけに使う）
         """
-        self.features_df = features_df.copy()
-
-    def calculate_statistics(self) -> Dict[str, Any]:
+        if features_df is None:
+            import pandas as pd
+
+            features_df = pd.DataFrame()
+        if isinstance(features_df, FeatureMatrix):
+            # float32の行列をそのまま列として使うDataFrameにする（特徴量はコピーしない）
+            features_df = features_df.to_dataframe()
+        # 大きなライブラリでもメモリが倍にならないよう、コピーせずに保持する（変更はしない）
+        self.features_df = features_df
+        # cluster_tracks()で学習したモデル（代表曲の選択で再利用する）
+        self.scaler_: Optional["StandardScaler"] = None
+        self.kmeans_: Optional["KMeans"] = None
+        self.cluster_features_: Optional[List[str]] = None
+        # n_clusters="auto"の場合の各kの評価結果
+        self.cluster_scores_: Optional[Dict[int, Dict[str, float]]] = None
+
+    def calculate_statistics(
+        self, accumulators: Optional[Iterable[FeatureAccumulator]] = None
+    ) -> Dict[str, Any]:
         """
         基本統計量を計算
 
+        Args:
+            accumulators: 指定した場合は、DataFrameの代わりにこれらを合成した集計から
+                平均と標準偏差を求める（最小・最大は集計に含まれないため返さない）
+
         Returns:
             統計情報の辞書
         """
+        if accumulators is not None:
+            accumulator = FeatureAccumulator.combine(accumulators)
+            averages = accumulator.averages()
+            std_devs = accumulator.std_devs()
+            stats = {}
+            for col in STATISTICS_FEATURES:
+                if col in averages:
+                    stats[f"{col}_mean"] = averages[col]
+                    stats[f"{col}_std"] = std_devs[col]
+            return stats
+
         numeric_cols = [
-            "danceability",
-            "energy",
-            "valence",
-            "tempo",
-            "acousticness",
-            "instrumentalness",
-            "liveness",
-            "speechiness",
+            col for col in STATISTICS_FEATURES if col in self.features_df.columns
         ]
+        if not numeric_cols:
+            return {}
+
+        # 全列の統計量を一度に計算
+        result = grouped_statistics(self.features_df[numeric_cols].to_numpy(dtype=float))
 
         stats = {}
-        for col in numeric_cols:
-            if col in self.features_df.columns:
-                stats[f"{col}_mean"] = float(self.features_df[col].mean())
-                stats[f"{col}_std"] = float(self.features_df[col].std())
-                stats[f"{col}_min"] = float(self.features_df[col].min())
-                stats[f"{col}_max"] = float(self.features_df[col].max())
+        for i, col in enumerate(numeric_cols):
+            stats[f"{col}_mean"] = float(result["mean"][0, i])
+            stats[f"{col}_std"] = float(result["std"][0, i])
+            stats[f"{col}_min"] = float(result["min"][0, i])
+            stats[f"{col}_max"] = float(result["max"][0, i])
 
         return stats
 
     def cluster_tracks(
-        self, n_clusters: int = 5, features: Optional[List[str]] = None
-    ) -> pd.DataFrame:
+        self,
+        n_clusters: Union[int, str] = 5,
+        features: Optional[List[str]] = None,
+        method: str = "kmeans",
+        init_centers: Optional[np.ndarray] = None,
+    ) -> "pd.DataFrame":
         """
         k-meansクラスタリングでトラックを分類
 
         Args:
-            n_clusters: クラスタ数
+            n_clusters: クラスタ数（"auto"の場合はシルエット係数で自動選択）
             features: 使用する特徴量（Noneの場合は主要な特徴量を使用）
+            method: "kmeans"（全件で学習）または"minibatch"（MiniBatchKMeansで学習、曲数が多い場合に高速）。
+                n_clusters="auto"の場合も、候補の各kをこの方法で学習する
+            init_centers: 前回の学習結果の中心（標準化後の空間、ウォームスタート用）。
+                中心の数でクラスタ数が決まるため、n_clusters="auto"とは併用できない
 
         Returns:
             クラスタラベルが追加されたDataFrame
+
+        Raises:
+            ValueError: 特徴量がない場合、methodが未対応の場合、
+                n_clusters="auto"とinit_centersを併用した場合
         """
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
+        from services.cluster_selection import select_n_clusters
+
         if features is None:
-            features = [
-                "danceability",
-                "energy",
-                "valence",
-                "acousticness",
-                "instrumentalness",
-            ]
+            features = CLUSTER_FEATURES
 
         # 使用可能な特徴量のみを選択
         available_features = [f for f in features if f in self.features_df.columns]
@@ -86,17 +298,47 @@ class DataAnalyzer:
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
 
-        # k-meansクラスタリング
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        labels = kmeans.fit_predict(X_scaled)
-
-        # 結果をDataFrameに追加
-        result_df = self.features_df.copy()
+        # k-meansクラスタリング（前回の中心がある場合はそこから1回だけ学習）
+        if method not in ("kmeans", "minibatch"):
+            raise ValueError(f"未対応のクラスタリング方法です: {method}")
+        if n_clusters == "auto" and init_centers is not None:
+            raise ValueError("n_clusters=\"auto\"とinit_centersは併用できません")
+        self.cluster_scores_ = None
+        init = init_centers if init_centers is not None else "k-means++"
+        if n_clusters == "auto":
+            # 複数のkを並列に評価して選ぶ（同じ特徴量ではキャッシュから返る）
+            selection = select_n_clusters(X_scaled, method=method)
+            kmeans = selection["model"]
+            self.cluster_scores_ = selection["scores"]
+        elif method == "minibatch":
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_clusters,
+                init=init,
+                n_init=1 if init_centers is not None else 3,
+                batch_size=1024,
+                random_state=42,
+            )
+        else:
+            kmeans = KMeans(
+                n_clusters=n_clusters,
+                init=init,
+                n_init=1 if init_centers is not None else 10,
+                random_state=42,
+            )
+        labels = kmeans.labels_ if n_clusters == "auto" else kmeans.fit_predict(X_scaled)
+
+        # 代表曲の選択で標準化後の空間の中心を使えるように保持
+        self.scaler_ = scaler
+        self.kmeans_ = kmeans
+        self.cluster_features_ = available_features
+
+        # 結果をDataFrameに追加（浅いコピーなので特徴量のデータは複製されず、元のDataFrameも変わらない）
+        result_df = self.features_df.copy(deep=False)
         result_df["cluster"] = labels
 
         return result_df
 
-    def get_cluster_characteristics(self, clustered_df: pd.DataFrame) -> Dict[int, Dict[str, float]]:
+    def get_cluster_characteristics(self, clustered_df: "pd.DataFrame") -> Dict[int, Dict[str, float]]:
         """
         各クラスタの特徴を計算
 
@@ -106,143 +348,159 @@ class DataAnalyzer:
         Returns:
             クラスタIDをキーとした特徴量の辞書
         """
-        characteristics = {}
-        numeric_cols = [
-            "danceability",
-            "energy",
-            "valence",
-            "acousticness",
-            "instrumentalness",
-        ]
+        import pandas as pd
+
+        numeric_cols = [col for col in CLUSTER_FEATURES if col in clustered_df.columns]
+        labels = clustered_df["cluster"].to_numpy()
+
+        # 全クラスタ・全列の平均を一度に計算
+        result = grouped_statistics(
+            clustered_df[numeric_cols].to_numpy(dtype=float), labels
+        )
 
-        for cluster_id in clustered_df["cluster"].unique():
-            cluster_data = clustered_df[clustered_df["cluster"] == cluster_id]
-            char = {}
-            for col in numeric_cols:
-                if col in cluster_data.columns:
-                    char[col] = float(cluster_data[col].mean())
-            characteristics[int(cluster_id)] = char
+        means = {
+            int(cluster_id): {
+                col: float(result["mean"][g, i]) for i, col in enumerate(numeric_cols)
+            }
+            for g, cluster_id in enumerate(result["groups"])
+        }
 
-        return characteristics
+        # 返す順序は従来どおりクラスタの出現順
+        return {int(cluster_id): means[int(cluster_id)] for cluster_id in pd.unique(labels)}
 
     def get_representative_tracks(
-        self, clustered_df: pd.DataFrame, n_tracks: int = 3
+        self, clustered_df: "pd.DataFrame", n_tracks: int = 3
     ) -> Dict[int, List[str]]:
         """
         各クラスタの代表曲を取得（クラスタの中心に近い曲）
 
+        cluster_tracks()で学習済みの場合は、クラスタリングと同じ標準化後の空間で
+        k-meansの中心との距離を測る。未学習の場合はclustered_dfから標準化と中心を求める。
+
         Args:
             clustered_df: クラスタリング済みのDataFrame
             n_tracks: 各クラスタから取得する曲数
 
         Returns:
-            クラスタIDをキーとした代表曲のIDリストの辞書
+            クラスタIDをキーとした代表曲のIDリストの辞書（距離が近い順）
         """
-        representative_tracks = {}
-        numeric_cols = [
-            "danceability",
-            "energy",
-            "valence",
-            "acousticness",
-            "instrumentalness",
-        ]
-        available_features = [f for f in numeric_cols if f in clustered_df.columns]
+        import pandas as pd
+        from sklearn.preprocessing import StandardScaler
 
-        for cluster_id in clustered_df["cluster"].unique():
-            cluster_data = clustered_df[clustered_df["cluster"] == cluster_id]
+        labels = clustered_df["cluster"].to_numpy()
+        if "track_id" not in clustered_df.columns or n_tracks <= 0:
+            return {int(cluster_id): [] for cluster_id in pd.unique(labels)}
 
-            # クラスタの中心を計算
-            cluster_center = cluster_data[available_features].mean().values
-
-            # 各曲とクラスタ中心の距離を計算
-            distances = []
-            for idx, row in cluster_data.iterrows():
-                track_features = row[available_features].values
-                distance = np.linalg.norm(track_features - cluster_center)
-                distances.append((idx, distance))
-
-            # 距離が小さい順にソート
-            distances.sort(key=lambda x: x[1])
-
-            # 代表曲を取得
-            track_ids = []
-            for idx, _ in distances[:n_tracks]:
-                if "track_id" in clustered_df.columns:
-                    track_ids.append(clustered_df.loc[idx, "track_id"])
-            
-            representative_tracks[int(cluster_id)] = track_ids
+        # cluster_idsはソート済みのクラスタID、label_indexは各曲のcluster_ids上の位置
+        cluster_ids, label_index, counts = np.unique(
+            labels, return_inverse=True, return_counts=True
+        )
 
-        return representative_tracks
+        if self.kmeans_ is not None and all(
+            f in clustered_df.columns for f in self.cluster_features_
+        ):
+            X = np.nan_to_num(
+                clustered_df[self.cluster_features_].to_numpy(dtype=float), nan=0.0
+            )
+            X_scaled = self.scaler_.transform(X)
+            centers = self.kmeans_.cluster_centers_[cluster_ids.astype(int)]
+        else:
+            available_features = [f for f in CLUSTER_FEATURES if f in clustered_df.columns]
+            X = np.nan_to_num(
+                clustered_df[available_features].to_numpy(dtype=float), nan=0.0
+            )
+            X_scaled = StandardScaler().fit_transform(X)
+            # クラスタごとの中心（標準化後の空間での平均）
+            centers = grouped_statistics(X_scaled, labels)["mean"]
+
+        # 全曲と所属クラスタの中心との距離を一度に計算（順位だけを使うので二乗距離）
+        diff = X_scaled - centers[label_index]
+        distances = np.einsum("ij,ij->i", diff, diff)
+
+        # クラスタごとに行番号をまとめ、近いn_tracks曲だけをargpartitionで選ぶ
+        order = np.argsort(label_index, kind="stable")
+        groups = np.split(order, np.cumsum(counts)[:-1])
+        track_ids = clustered_df["track_id"].to_numpy()
+        selected = {}
+        for cluster_id, rows in zip(cluster_ids, groups):
+            if len(rows) > n_tracks:
+                rows = rows[np.argpartition(distances[rows], n_tracks - 1)[:n_tracks]]
+            rows = rows[np.argsort(distances[rows], kind="stable")]
+            selected[int(cluster_id)] = track_ids[rows].tolist()
+
+        # 返す順序は従来どおりクラスタの出現順
+        return {int(cluster_id): selected[int(cluster_id)] for cluster_id in pd.unique(labels)}
 
     @staticmethod
-    def genre_distribution(
-        tracks_data: List[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
+    def genre_distribution(tracks_data: TracksData) -> List[Dict[str, Any]]:
         """
         ジャンルの出現分布を分析
 
         Args:
-            tracks_data: トラック情報のリスト（各要素は{"genres": List[str], ...}を含む）
+            tracks_data: トラック情報のリスト（各要素は{"genres": List[str], ...}を含む）、
+                または列ごとの配列の辞書（{"genres": [List[str], ...]}）
 
         Returns:
-            [{genre: str, count: int}] の形式のリスト
+            [{genre: str, count: int}] の形式のリスト（件数の降順、同数は出現順）
         """
-        genre_counts = {}
-        for track in tracks_data:
-            genres = track.get("genres", [])
-            if not isinstance(genres, list):
-                continue
-            for genre in genres:
-                if genre:  # Noneや空文字列をスキップ
-                    genre_counts[genre] = genre_counts.get(genre, 0) + 1
-
-        result = [
+        if isinstance(tracks_data, Mapping):
+            genres_column = tracks_data.get("genres", ())
+        else:
+            genres_column = [track.get("genres", []) for track in tracks_data]
+
+        # Noneや空文字列、リストでない値はスキップ
+        genre_counts = Counter(
+            genre
+            for genres in genres_column
+            if isinstance(genres, list)
+            for genre in genres
+            if genre
+        )
+        return [
             {"genre": genre, "count": count}
-            for genre, count in genre_counts.items()
+            for genre, count in genre_counts.most_common()
         ]
-        result.sort(key=lambda x: x["count"], reverse=True)
-        return result
 
     @staticmethod
-    def mood_map(
-        tracks_data: List[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
+    def mood_map(tracks_data: TracksData) -> List[Dict[str, Any]]:
         """
         valence × energy の散布図データを分析
 
         Args:
-            tracks_data: トラック情報のリスト（各要素は{"track": str, "valence": float, "energy": float}を含む）
+            tracks_data: トラック情報のリスト（各要素は{"track": str, "valence": float, "energy": float}を含む）、
+                または列ごとの配列の辞書（{"track": [...], "valence": [...], "energy": [...]}）
 
         Returns:
             [{track: str, valence: float, energy: float}] の形式のリスト
         """
-        result = []
-        for track in tracks_data:
-            track_name = track.get("track", track.get("name", "Unknown"))
-            valence = track.get("valence")
-            energy = track.get("energy")
-
-            # None値をスキップ
-            if valence is not None and energy is not None:
-                result.append(
-                    {
-                        "track": track_name,
-                        "valence": float(valence),
-                        "energy": float(energy),
-                    }
-                )
-
-        return result
+        if isinstance(tracks_data, Mapping):
+            valence = _column_values(tracks_data, "valence")
+            energy = _column_values(tracks_data, "energy")
+            size = len(valence)
+            names = tracks_data.get("track", tracks_data.get("name"))
+            names = list(names) if names is not None else ["Unknown"] * size
+        else:
+            names = [
+                track.get("track", track.get("name", "Unknown")) for track in tracks_data
+            ]
+            valence = [track.get("valence") for track in tracks_data]
+            energy = [track.get("energy") for track in tracks_data]
+
+        # None値をスキップ
+        return [
+            {"track": name, "valence": float(v), "energy": float(e)}
+            for name, v, e in zip(names, valence, energy)
+            if v is not None and e is not None
+        ]
 
     @staticmethod
-    def tempo_trends(
-        tracks_data: List[Dict[str, Any]]
-    ) -> Dict[str, Any]:
+    def tempo_trends(tracks_data: TracksData) -> Dict[str, Any]:
         """
         テンポ（BPM）の平均・分布を分析
 
         Args:
-            tracks_data: トラック情報のリスト（各要素は{"tempo": float}を含む）
+            tracks_data: トラック情報のリスト（各要素は{"tempo": float}を含む）、
+                または列ごとの配列の辞書（{"tempo": [...]}）
 
         Returns:
             {
@@ -251,51 +509,69 @@ class DataAnalyzer:
                 "distribution": [{"range": str, "count": int}]
             }
         """
-        tempos = []
-        for track in tracks_data:
-            tempo = track.get("tempo")
-            if tempo is not None:
-                tempos.append(float(tempo))
-
-        if not tempos:
+        column = tracks_data.get("tempo") if isinstance(tracks_data, Mapping) else None
+        if isinstance(column, np.ndarray) and column.dtype.kind in "fiu":
+            # 数値の配列はNoneを含まないのでそのまま使う
+            values = column.astype(np.float64, copy=False)
+        else:
+            if isinstance(tracks_data, Mapping):
+                tempos = _column_values(tracks_data, "tempo")
+            else:
+                tempos = [track.get("tempo") for track in tracks_data]
+            values = np.asarray(
+                [tempo for tempo in tempos if tempo is not None], dtype=np.float64
+            )
+
+        if values.size == 0:
             return {
                 "mean_tempo": 0.0,
                 "std_tempo": 0.0,
                 "distribution": [],
             }
 
-        df = pd.DataFrame({"tempo": tempos})
-        mean_tempo = float(df["tempo"].mean())
-        std_tempo = float(df["tempo"].std())
-
-        # テンポの分布を20のビンに分割
-        bins = [0, 60, 80, 100, 120, 140, 160, 180, 200, 220, float("inf")]
-        labels = [
-            "0-60",
-            "60-80",
-            "80-100",
-            "100-120",
-            "120-140",
-            "140-160",
-            "160-180",
-            "180-200",
-            "200-220",
-            "220+",
-        ]
-
-        df["range"] = pd.cut(
-            df["tempo"], bins=bins, labels=labels, include_lowest=True
-        )
-        distribution_counts = df["range"].value_counts().sort_index()
+        mean_tempo, std_tempo = _mean_std(values)
 
-        distribution = [
-            {"range": str(range_label), "count": int(count)}
-            for range_label, count in distribution_counts.items()
-        ]
+        # 右閉区間（最初の区間だけ0を含む）で数え、0件の区間も含めて返す
+        bins = np.digitize(values, TEMPO_BIN_EDGES, right=True)
+        bins[values == TEMPO_BIN_EDGES[0]] = 1
+        in_range = (bins >= 1) & (bins <= len(TEMPO_BIN_LABELS))
+        counts = np.bincount(bins[in_range] - 1, minlength=len(TEMPO_BIN_LABELS))
 
         return {
             "mean_tempo": mean_tempo,
             "std_tempo": std_tempo,
-            "distribution": distribution,
+            "distribution": [
+                {"range": label, "count": int(count)}
+                for label, count in zip(TEMPO_BIN_LABELS, counts)
+            ],
         }
 
+    @staticmethod
+    def feature_percentiles(
+        tracks_data: TracksData,
+        percentiles: Sequence[int] = DEFAULT_PERCENTILES,
+        sketches: Optional[FeatureSketches] = None,
+    ) -> Dict[str, Any]:
+        """
+        オーディオ特徴量ごとの分位点を分析
+
+        Args:
+            tracks_data: トラック情報のリスト（各要素は特徴量を含む辞書）、
+                または列ごとの配列の辞書
+            percentiles: 求める分位点（パーセント）
+            sketches: 追加先のスケッチ（保存済みのスケッチに合成する場合に指定）
+
+        Returns:
+            {
+                "track_count": int,
+                "percentiles": {特徴量: {"p10": float, ...}},
+                "sketches": FeatureSketches.to_dict()の結果（合成・保存用）
+            }
+        """
+        sketches = sketches if sketches is not None else FeatureSketches()
+        sketches.update(tracks_data)
+        return {
+            "track_count": sketches.count,
+            "percentiles": sketches.percentiles(percentiles),
+            "sketches": sketches.to_dict(),
+        }
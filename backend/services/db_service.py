@@ -21,7 +21,7 @@ def save_analysis(
     Args:
         db: データベースセッション
         user_id: Spotify User ID
-        analysis_type: 分析タイプ ('genre', 'mood', 'tempo')
+        analysis_type: 分析タイプ ('genre', 'mood', 'tempo', 'percentiles')
         time_range: 期間 ('short_term', 'medium_term', 'long_term')
         result: 分析結果（JSON形式）
 
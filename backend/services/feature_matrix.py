@@ -0,0 +1,233 @@
+"""
+特徴量行列 - オーディオ特徴量をfloat32の連続した行列と曲IDの索引で保持
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+from models.schemas import AudioFeaturesResponse
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 行列の列（AudioFeaturesResponseの数値項目と同じ順序）
+FEATURE_COLUMNS = [
+    "danceability",
+    "energy",
+    "valence",
+    "tempo",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+    "loudness",
+    "mode",
+    "key",
+    "time_signature",
+]
+
+# 整数で返す列
+INTEGER_COLUMNS = {"mode", "key", "time_signature"}
+
+_COLUMN_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+# float32で元の10進の値を復元できる有効数字の桁数
+FLOAT32_DIGITS = 7
+
+
+class FeatureMatrix:
+    """
+    曲ごとのオーディオ特徴量を(曲数, 列数)のfloat32行列で保持するクラス
+
+    SpotifyのJSONから直接作成し、1曲あたりPydanticモデルや辞書の代わりに
+    4バイト×列数だけを使う。Pydanticモデルはレスポンスを返す時点でだけ生成する。
+    同じ曲IDは1行だけ持つ。
+    """
+
+    def __init__(self, ids: Optional[List[str]] = None, values: Optional[np.ndarray] = None):
+        """
+        初期化
+
+        Args:
+            ids: 曲IDのリスト（行の順序）
+            values: (曲数, len(FEATURE_COLUMNS))の特徴量行列
+        """
+        self.ids: List[str] = list(ids or [])
+        self.index: Dict[str, int] = {track_id: i for i, track_id in enumerate(self.ids)}
+        if values is None:
+            values = np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32)
+        self._values = np.ascontiguousarray(values, dtype=np.float32)
+        self._size = len(self.ids)
+
+    @classmethod
+    def from_raw(cls, features_list: Iterable[Optional[Dict[str, Any]]]) -> "FeatureMatrix":
+        """
+        Spotifyのaudio-featuresのJSON（またはその辞書）から作成
+
+        Args:
+            features_list: 特徴量の辞書のイテラブル（Noneの要素と重複した曲は無視、欠けた値はNaN）
+        """
+        ids: List[str] = []
+        seen = set()
+        rows: List[List[Optional[float]]] = []
+        for features in features_list:
+            if not features or features["id"] in seen:
+                continue
+            seen.add(features["id"])
+            ids.append(features["id"])
+            rows.append([features.get(name) for name in FEATURE_COLUMNS])
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_COLUMNS))
+        return cls(ids, values.astype(np.float32))
+
+    @classmethod
+    def gather(
+        cls, track_ids: Iterable[str], sources: Sequence["FeatureMatrix"]
+    ) -> "FeatureMatrix":
+        """
+        曲IDの順に、最初に見つかった行列の行を集める
+
+        Args:
+            track_ids: 曲IDのイテラブル（重複した曲はその回数だけ並ぶ、どの行列にもない曲は除く）
+            sources: 探す行列（前にあるものを優先）
+
+        Returns:
+            集めた行からなる新しい行列（同じ曲が複数回並ぶ場合は索引は最初の行を指す）
+        """
+        ids: List[str] = []
+        source_numbers: List[int] = []
+        rows: List[int] = []
+        for track_id in track_ids:
+            for number, source in enumerate(sources):
+                row = source.index.get(track_id)
+                if row is not None:
+                    ids.append(track_id)
+                    source_numbers.append(number)
+                    rows.append(row)
+                    break
+
+        values = np.empty((len(ids), len(FEATURE_COLUMNS)), dtype=np.float32)
+        source_numbers_array = np.asarray(source_numbers, dtype=np.intp)
+        rows_array = np.asarray(rows, dtype=np.intp)
+        for number, source in enumerate(sources):
+            selected = source_numbers_array == number
+            if selected.any():
+                values[selected] = source.values[rows_array[selected]]
+
+        matrix = cls(values=values)
+        matrix.ids = ids
+        matrix.index = {}
+        for i, track_id in enumerate(ids):
+            matrix.index.setdefault(track_id, i)
+        matrix._size = len(ids)
+        return matrix
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self.index
+
+    @property
+    def values(self) -> np.ndarray:
+        """(曲数, len(FEATURE_COLUMNS))のfloat32行列（コピーではなくビュー）"""
+        return self._values[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """特徴量の値が使うメモリのバイト数"""
+        return self.values.nbytes
+
+    def column(self, name: str) -> np.ndarray:
+        """1列分の特徴量（ビュー）"""
+        return self.values[:, _COLUMN_INDEX[name]]
+
+    def take(self, track_ids: Iterable[str]) -> "FeatureMatrix":
+        """指定した曲IDの順に行を集めた新しい行列（ない曲は除く）"""
+        return FeatureMatrix.gather(track_ids, [self])
+
+    def extend(self, other: "FeatureMatrix"):
+        """
+        別の行列のうち、まだない曲の行を追加
+
+        容量を倍々に確保するため、ページごとに追加しても全体のコピーは償却O(1)になる。
+        """
+        new_rows = [
+            i for track_id, i in other.index.items() if track_id not in self.index
+        ]
+        if not new_rows:
+            return
+        required = self._size + len(new_rows)
+        if required > len(self._values):
+            grown = np.empty(
+                (max(required, 2 * len(self._values), 64), len(FEATURE_COLUMNS)),
+                dtype=np.float32,
+            )
+            grown[: self._size] = self.values
+            self._values = grown
+        self._values[self._size : required] = other.values[new_rows]
+        for offset, i in enumerate(new_rows):
+            track_id = other.ids[i]
+            self.index[track_id] = self._size + offset
+            self.ids.append(track_id)
+        self._size = required
+
+    def to_float64(self, columns: Optional[List[str]] = None) -> np.ndarray:
+        """
+        float64の行列に変換（統計量の集計用）
+
+        float32の値をそのまま広げるため、0.123は0.12300000339…のようになる。
+        元のJSONの値が必要な場合はto_responses()のように出力時に丸める。
+
+        Args:
+            columns: 取り出す列（Noneの場合は全列）
+        """
+        values = self.values
+        if columns is not None:
+            values = values[:, [_COLUMN_INDEX[name] for name in columns]]
+        return np.asarray(values, dtype=np.float64)
+
+    def to_dataframe(self, columns: Optional[List[str]] = None) -> "pd.DataFrame":
+        """
+        DataAnalyzer用のDataFrame（track_id列と特徴量の列、特徴量はfloat32のまま）
+
+        Args:
+            columns: 含める特徴量の列（Noneの場合は全列）
+        """
+        import pandas as pd
+
+        columns = columns or FEATURE_COLUMNS
+        values = self.values
+        if columns != FEATURE_COLUMNS:
+            values = values[:, [_COLUMN_INDEX[name] for name in columns]]
+        df = pd.DataFrame(values, columns=columns, copy=False)
+        df.insert(0, "track_id", self.ids)
+        return df
+
+    def to_responses(self) -> List[AudioFeaturesResponse]:
+        """レスポンス用のAudioFeaturesResponseのリストに変換（値は元のJSONの値に丸める）"""
+        values = _round_significant(self.to_float64()).tolist()
+        return [
+            AudioFeaturesResponse(
+                id=track_id,
+                **{
+                    name: int(value) if name in INTEGER_COLUMNS else value
+                    for name, value in zip(FEATURE_COLUMNS, row)
+                },
+            )
+            for track_id, row in zip(self.ids, values)
+        ]
+
+
+def _round_significant(values: np.ndarray, digits: int = FLOAT32_DIGITS) -> np.ndarray:
+    """
+    有効数字digits桁に丸める（float32に格納した値を元のJSONの値に戻す）
+
+    Args:
+        values: float64の配列（NaNはそのまま）
+        digits: 有効数字の桁数
+    """
+    magnitude = np.floor(
+        np.log10(np.abs(values), where=values != 0, out=np.zeros_like(values))
+    )
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
@@ -0,0 +1,259 @@
+"""
+オーディオ特徴量ストア - 全ユーザー共通のリードスルーキャッシュ
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from core.config import FEATURE_CACHE_SIZE, FEATURE_MISS_TTL
+from core.database import SessionLocal, TrackAudioFeatures, init_db
+from services.cache import LRUCache, TTLCache
+
+logger = logging.getLogger(__name__)
+
+# SQLiteのバインド変数上限を超えないよう、IN句は分割して発行する
+DB_QUERY_CHUNK_SIZE = 500
+
+
+class FeatureStore:
+    """
+    トラックIDをキーとしたオーディオ特徴量のストア
+
+    トラックの特徴量は変化しないため、プロセス内LRU → DBテーブルの順に参照し、
+    どちらにもないものだけをSpotifyから取得する。
+    Spotifyが特徴量を返さなかった曲もそのことを記録するが、一時的な欠落の場合もあるため、
+    記録はmiss_ttl秒で期限切れにして取得し直す。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_memory_items: int = FEATURE_CACHE_SIZE,
+        miss_ttl: float = FEATURE_MISS_TTL,
+    ):
+        """
+        初期化
+
+        Args:
+            session_factory: DBセッションを生成する関数
+            max_memory_items: プロセス内LRUに保持する最大件数
+            miss_ttl: 特徴量がないという記録の有効期限（秒）
+        """
+        self._session_factory = session_factory
+        self.memory = LRUCache(max_memory_items)
+        self.miss_ttl = miss_ttl
+        # 特徴量がないと記録済みの曲（値はNone、DBの記録と同じ時刻に期限切れになる）
+        self.known_missing = TTLCache(max_memory_items, ttl=miss_ttl)
+
+    def _from_memory(self, track_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """プロセス内から取得し、特徴量と、特徴量がないと記録されてもいない曲を返す"""
+        found = self.memory.get_many(track_ids)
+        rest = [track_id for track_id in track_ids if track_id not in found]
+        known_missing = self.known_missing.get_many(rest)
+        return found, [track_id for track_id in rest if track_id not in known_missing]
+
+    def _remember(self, found: Dict[str, Dict[str, Any]], missing: Dict[str, float]):
+        """DBから読み込んだ・取得した結果をプロセス内に保持（missingの値は記録の残りの有効期限）"""
+        self.memory.set_many(found)
+        for track_id, ttl in missing.items():
+            self.known_missing.set(track_id, None, ttl=ttl)
+
+    def get_many(self, track_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        キャッシュ済みの特徴量を取得
+
+        Args:
+            track_ids: トラックIDのリスト
+
+        Returns:
+            トラックIDをキーとした特徴量の辞書（キャッシュにないIDと特徴量がない曲は含まれない）
+        """
+        track_ids = list(dict.fromkeys(track_ids))
+        found, unknown = self._from_memory(track_ids)
+        if unknown:
+            from_db, missing = self._read_db(unknown)
+            self._remember(from_db, missing)
+            found.update(from_db)
+        return found
+
+    def put_many(self, features_list: Iterable[Dict[str, Any]]):
+        """
+        特徴量を保存
+
+        Args:
+            features_list: Spotify APIが返した特徴量のリスト（各要素は"id"を含む）
+        """
+        features_by_id = {f["id"]: f for f in features_list if f}
+        if not features_by_id:
+            return
+        self.memory.set_many(features_by_id)
+        self._write_db(features_by_id)
+
+    def _read_db(
+        self, track_ids: List[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+        """
+        DBテーブルから取得（読み込みに失敗した場合はどちらも空の辞書）
+
+        Returns:
+            特徴量の辞書と、特徴量がないと記録済みの曲の記録の残りの有効期限（秒、期限切れの曲は含まない）
+        """
+        from_db = {}
+        missing = {}
+        now = datetime.utcnow()
+        try:
+            db = self._session_factory()
+            try:
+                for i in range(0, len(track_ids), DB_QUERY_CHUNK_SIZE):
+                    chunk = track_ids[i : i + DB_QUERY_CHUNK_SIZE]
+                    rows = (
+                        db.query(TrackAudioFeatures)
+                        .filter(TrackAudioFeatures.track_id.in_(chunk))
+                        .all()
+                    )
+                    for row in rows:
+                        if row.features is not None:
+                            from_db[row.track_id] = row.features
+                            continue
+                        fetched_at = row.fetched_at or datetime.min
+                        ttl = self.miss_ttl - (now - fetched_at).total_seconds()
+                        if ttl > 0:
+                            missing[row.track_id] = ttl
+            finally:
+                db.close()
+        except SQLAlchemyError as e:
+            logger.warning("Failed to read audio features cache: %s", e)
+        return from_db, missing
+
+    def _write_db(self, entries: Dict[str, Optional[Dict[str, Any]]]):
+        """
+        DBテーブルに保存（値がNoneの曲は特徴量がないことを記録する）
+
+        保存済みの特徴量は変えず、特徴量がないという記録だけを取得し直した結果で置き換える。
+        """
+        try:
+            db = self._session_factory()
+            try:
+                track_ids = list(entries)
+                existing = {}
+                for i in range(0, len(track_ids), DB_QUERY_CHUNK_SIZE):
+                    chunk = track_ids[i : i + DB_QUERY_CHUNK_SIZE]
+                    for row in (
+                        db.query(TrackAudioFeatures)
+                        .filter(TrackAudioFeatures.track_id.in_(chunk))
+                        .all()
+                    ):
+                        existing[row.track_id] = row
+
+                now = datetime.utcnow()
+                for track_id, features in entries.items():
+                    row = existing.get(track_id)
+                    if row is None:
+                        db.add(
+                            TrackAudioFeatures(
+                                track_id=track_id, features=features, fetched_at=now
+                            )
+                        )
+                    elif row.features is None:
+                        row.features = features
+                        row.fetched_at = now
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        except SQLAlchemyError as e:
+            # 別ワーカーが同時に保存した場合など。メモリ上には保存済みなので処理は継続する
+            logger.warning("Failed to write audio features cache: %s", e)
+
+    def iter_all(
+        self, chunk_size: int = 5000, since: Optional[datetime] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        保存済みの全特徴量をトラックID順に分割して取得（ライブラリ全体の分析用）
+
+        Args:
+            chunk_size: 1回に読み込む件数
+            since: 指定した場合はこの時刻以降に保存された特徴量だけを取得
+
+        Yields:
+            特徴量のリスト（最大chunk_size件）
+        """
+        last_track_id = None
+        while True:
+            db = self._session_factory()
+            try:
+                query = db.query(TrackAudioFeatures.track_id, TrackAudioFeatures.features)
+                if since is not None:
+                    query = query.filter(TrackAudioFeatures.fetched_at >= since)
+                if last_track_id is not None:
+                    # OFFSETは後ろほど遅くなるため、直前のキーから読み進める
+                    query = query.filter(TrackAudioFeatures.track_id > last_track_id)
+                rows = query.order_by(TrackAudioFeatures.track_id).limit(chunk_size).all()
+            finally:
+                db.close()
+            if not rows:
+                return
+            last_track_id = rows[-1][0]
+            # 特徴量がないと記録された曲は除く
+            chunk = [features for _, features in rows if features]
+            if chunk:
+                yield chunk
+
+    async def get_or_fetch(
+        self,
+        track_ids: List[str],
+        fetcher: Callable[[List[str]], Awaitable[List[Optional[Dict[str, Any]]]]],
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        リードスルーで特徴量を取得（キャッシュにないものだけをfetcherで取得して保存）
+
+        DBの読み書きはスレッドで行い、イベントループを止めない。
+        Spotifyが特徴量を返さなかった曲もそのことを記録し、記録の有効期限（miss_ttl）までは問い合わせない。
+
+        Args:
+            track_ids: トラックIDのリスト
+            fetcher: 未キャッシュのIDリストを受け取り、特徴量のリストを返すコルーチン関数
+
+        Returns:
+            トラックIDをキーとした特徴量の辞書（特徴量がない曲は含まれない）
+        """
+        track_ids = list(dict.fromkeys(track_ids))
+        found, unknown = self._from_memory(track_ids)
+        if unknown:
+            from_db, missing = await asyncio.to_thread(self._read_db, unknown)
+            self._remember(from_db, missing)
+            found.update(from_db)
+            unknown = [
+                track_id
+                for track_id in unknown
+                if track_id not in from_db and track_id not in missing
+            ]
+        if unknown:
+            fetched = {f["id"]: f for f in await fetcher(unknown) if f}
+            self._remember(
+                fetched,
+                {track_id: self.miss_ttl for track_id in unknown if track_id not in fetched},
+            )
+            await asyncio.to_thread(
+                self._write_db, {track_id: fetched.get(track_id) for track_id in unknown}
+            )
+            found.update(fetched)
+        return found
+
+
+_feature_store: Optional[FeatureStore] = None
+
+
+def get_feature_store() -> FeatureStore:
+    """プロセス共通のFeatureStoreを取得（初回呼び出し時にテーブルを作成）"""
+    global _feature_store
+    if _feature_store is None:
+        init_db()
+        _feature_store = FeatureStore()
+    return _feature_store
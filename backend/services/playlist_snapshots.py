@@ -0,0 +1,138 @@
+"""
+プレイリスト分析結果ストア - snapshot_idごとの分析結果を保存
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal, PlaylistAnalysisSnapshot, init_db
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistSnapshotStore:
+    """
+    プレイリストIDをキーとした分析結果のストア
+
+    Spotifyのプレイリストはトラックが変わるとsnapshot_idが変わるため、
+    snapshot_idが同じであれば保存済みの結果をそのまま返せる。
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        """
+        初期化
+
+        Args:
+            session_factory: DBセッションを生成する関数
+        """
+        self._session_factory = session_factory
+
+    def get(self, playlist_id: str) -> Optional[Dict[str, Any]]:
+        """
+        保存済みの分析結果を取得
+
+        Args:
+            playlist_id: プレイリストID
+
+        Returns:
+            {"snapshot_id": str, "result": dict, "accumulator": dict}、見つからない場合はNone
+        """
+        try:
+            db = self._session_factory()
+            try:
+                row = db.get(PlaylistAnalysisSnapshot, playlist_id)
+                if row is None:
+                    return None
+                return {
+                    "snapshot_id": row.snapshot_id,
+                    "result": row.result,
+                    "accumulator": row.accumulator,
+                }
+            finally:
+                db.close()
+        except SQLAlchemyError as e:
+            logger.warning("Failed to read playlist snapshot: %s", e)
+            return None
+
+    def get_accumulators(self, playlist_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        保存済みの統計量の集計だけを取得（分析結果のJSONは読み込まない）
+
+        Args:
+            playlist_ids: プレイリストIDのリスト
+
+        Returns:
+            プレイリストIDをキーとしたFeatureAccumulator.to_dict()の結果（保存されていないIDは含まれない）
+        """
+        playlist_ids = list(dict.fromkeys(playlist_ids))
+        if not playlist_ids:
+            return {}
+        try:
+            db = self._session_factory()
+            try:
+                rows = (
+                    db.query(
+                        PlaylistAnalysisSnapshot.playlist_id,
+                        PlaylistAnalysisSnapshot.accumulator,
+                    )
+                    .filter(PlaylistAnalysisSnapshot.playlist_id.in_(playlist_ids))
+                    .all()
+                )
+                return {playlist_id: accumulator for playlist_id, accumulator in rows}
+            finally:
+                db.close()
+        except SQLAlchemyError as e:
+            logger.warning("Failed to read playlist snapshots: %s", e)
+            return {}
+
+    def save(
+        self,
+        playlist_id: str,
+        snapshot_id: str,
+        result: Dict[str, Any],
+        accumulator: Dict[str, Any],
+    ):
+        """
+        分析結果を保存（既存の結果は上書き）
+
+        Args:
+            playlist_id: プレイリストID
+            snapshot_id: 分析時点のsnapshot_id
+            result: PlaylistAnalysisResponseをJSON化したもの
+            accumulator: FeatureAccumulator.to_dict()の結果
+        """
+        try:
+            db = self._session_factory()
+            try:
+                db.merge(
+                    PlaylistAnalysisSnapshot(
+                        playlist_id=playlist_id,
+                        snapshot_id=snapshot_id,
+                        result=result,
+                        accumulator=accumulator,
+                        updated_at=datetime.utcnow(),
+                    )
+                )
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        except SQLAlchemyError as e:
+            logger.warning("Failed to write playlist snapshot: %s", e)
+
+
+_snapshot_store: Optional[PlaylistSnapshotStore] = None
+
+
+def get_snapshot_store() -> PlaylistSnapshotStore:
+    """プロセス共通のPlaylistSnapshotStoreを取得（初回呼び出し時にテーブルを作成）"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        init_db()
+        _snapshot_store = PlaylistSnapshotStore()
+    return _snapshot_store
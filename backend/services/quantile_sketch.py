@@ -0,0 +1,267 @@
+"""
+分位点スケッチ - KLLスケッチによる一定メモリの近似分位点と、特徴量ごとのスケッチの集合
+"""
+
+import math
+import random
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+import numpy as np
+
+from services.stats_accumulator import STATS_FEATURES
+
+# 返す分位点（パーセント）
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+# コンパクタの容量を決めるパラメータ（kが大きいほど正確でメモリを使う）
+DEFAULT_K = 200
+# 下の階層ほど容量を小さくする比率
+CAPACITY_RATIO = 2 / 3
+
+
+class KLLSketch:
+    """
+    KLLスケッチ（Karnin, Lang, Liberty 2016）
+
+    値を階層ごとのコンパクタに保持し、容量を超えた階層は並べ替えて1つおきに
+    上の階層へ送る（上の階層の値は2倍の重みを持つ）。
+    保持する値の数は見た値の数によらず約k/(1-CAPACITY_RATIO)個で、
+    同じkのスケッチ同士は合成できる。分位点の順位の誤差はおよそ1.7/k程度。
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        """
+        初期化
+
+        Args:
+            k: 最上位のコンパクタの容量
+            seed: コンパクションで使う乱数のシード（Noneの場合は0）
+        """
+        self.k = k
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.levels: List[List[float]] = [[]]
+        self._rng = random.Random(seed or 0)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * CAPACITY_RATIO**depth)))
+
+    @property
+    def retained(self) -> int:
+        """保持している値の数"""
+        return sum(len(level) for level in self.levels)
+
+    def _compress(self):
+        """容量を超えている間、最も下の溢れた階層を1つ上に圧縮"""
+        while self.retained > sum(self._capacity(h) for h in range(len(self.levels))):
+            for h, level in enumerate(self.levels):
+                if len(level) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    level.sort()
+                    # 奇数個の場合は1つを残し、残りの偶数個から偶数番目か奇数番目を送る
+                    kept = [level.pop()] if len(level) % 2 else []
+                    offset = self._rng.randint(0, 1)
+                    self.levels[h + 1].extend(level[offset::2])
+                    self.levels[h] = kept
+                    break
+
+    def update(self, value: float):
+        """値を1つ追加（NaNは無視）"""
+        self.update_many([value])
+
+    def update_many(self, values: Iterable[float]):
+        """
+        値をまとめて追加（NaNとNoneは無視）
+
+        Args:
+            values: 値のイテラブル
+        """
+        if not isinstance(values, np.ndarray):
+            values = [value for value in values if value is not None]
+        array = np.asarray(values, dtype=np.float64)
+        array = array[~np.isnan(array)]
+        if array.size == 0:
+            return
+        self.n += int(array.size)
+        low, high = float(array.min()), float(array.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        # k個ずつ追加して圧縮することで、一時的なメモリも一定に保つ
+        for start in range(0, array.size, self.k):
+            self.levels[0].extend(array[start : start + self.k].tolist())
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """
+        別のスケッチを合成
+
+        Args:
+            other: 合成するスケッチ（kが同じであること）
+
+        Returns:
+            self
+        """
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with different k: {self.k} != {other.k}")
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """
+        分位点を求める（最近順位法：累積の重みがq×件数以上になる最小の値）
+
+        Args:
+            qs: 0〜1の分位のリスト
+
+        Returns:
+            qsと同じ順序の分位点（値がない場合はNone）
+        """
+        if self.n == 0:
+            return [None for _ in qs]
+        values = np.concatenate([np.asarray(level, dtype=np.float64) for level in self.levels])
+        weights = np.concatenate(
+            [np.full(len(level), 2**h, dtype=np.float64) for h, level in enumerate(self.levels)]
+        )
+        order = np.argsort(values, kind="stable")
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                position = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+                result.append(float(values[min(position, len(values) - 1)]))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """分位点を1つ求める"""
+        return self.quantiles([q])[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """DBに保存できる辞書に変換"""
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "levels": [list(level) for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        """to_dict()の結果から復元"""
+        sketch = cls(k=data["k"], seed=data["n"])
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [list(level) for level in data["levels"]] or [[]]
+        return sketch
+
+
+class FeatureSketches:
+    """オーディオ特徴量ごとのKLLスケッチの集合"""
+
+    def __init__(self, features: Optional[List[str]] = None, k: int = DEFAULT_K):
+        """
+        初期化
+
+        Args:
+            features: 対象の特徴量（Noneの場合はSTATS_FEATURES）
+            k: 各スケッチのk
+        """
+        self.features = list(features or STATS_FEATURES)
+        self.k = k
+        self.sketches = {name: KLLSketch(k) for name in self.features}
+
+    def update(
+        self, tracks_data: Union[Iterable[Dict[str, Any]], Mapping[str, Sequence[Any]]]
+    ):
+        """
+        トラックの特徴量を追加（値がない特徴量は数えない）
+
+        Args:
+            tracks_data: 各要素が特徴量を含む辞書のイテラブル、
+                または列ごとの配列の辞書（{"tempo": [...], ...}）
+        """
+        if isinstance(tracks_data, Mapping):
+            for name, sketch in self.sketches.items():
+                column = tracks_data.get(name)
+                if column is not None:
+                    sketch.update_many(column)
+            return
+        rows = list(tracks_data)
+        for name, sketch in self.sketches.items():
+            sketch.update_many([row.get(name) for row in rows])
+
+    def merge(self, other: "FeatureSketches") -> "FeatureSketches":
+        """別のスケッチの集合を合成（selfにない特徴量は追加）"""
+        for name, sketch in other.sketches.items():
+            if name not in self.sketches:
+                self.features.append(name)
+                self.sketches[name] = KLLSketch(sketch.k)
+            self.sketches[name].merge(sketch)
+        return self
+
+    @classmethod
+    def combine(cls, sketches: Iterable["FeatureSketches"]) -> "FeatureSketches":
+        """複数のスケッチの集合を合成した新しい集合（元の集合は変更しない）"""
+        combined = cls([])
+        for item in sketches:
+            combined.merge(item)
+        return combined
+
+    @property
+    def count(self) -> int:
+        """追加されたトラック数（特徴量ごとの件数の最大値）"""
+        return max((sketch.n for sketch in self.sketches.values()), default=0)
+
+    def percentiles(
+        self, percentiles: Sequence[int] = DEFAULT_PERCENTILES
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        特徴量ごとの分位点
+
+        Args:
+            percentiles: 求める分位点（パーセント）
+
+        Returns:
+            {特徴量: {"p10": float, ...}}（値がない特徴量は含まない）
+        """
+        result = {}
+        for name in self.features:
+            sketch = self.sketches[name]
+            if sketch.n == 0:
+                continue
+            values = sketch.quantiles([p / 100 for p in percentiles])
+            result[name] = {f"p{p}": value for p, value in zip(percentiles, values)}
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """DBに保存できる辞書に変換"""
+        return {name: sketch.to_dict() for name, sketch in self.sketches.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureSketches":
+        """to_dict()の結果から復元"""
+        sketches = cls(list(data))
+        sketches.sketches = {name: KLLSketch.from_dict(value) for name, value in data.items()}
+        if sketches.sketches:
+            sketches.k = next(iter(sketches.sketches.values())).k
+        return sketches
@@ -0,0 +1,255 @@
+"""
+レート制限対応のリクエストスケジューラ - すべてのSpotify API呼び出しが通過する
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+
+from core.config import (
+    SPOTIFY_APP_RATE_LIMIT,
+    SPOTIFY_APP_RATE_BURST,
+    SPOTIFY_USER_RATE_LIMIT,
+    SPOTIFY_USER_RATE_BURST,
+    SPOTIFY_MAX_CONCURRENCY,
+    SPOTIFY_MAX_RETRIES,
+    SPOTIFY_BACKOFF_BASE,
+    SPOTIFY_BACKOFF_MAX,
+)
+from services.cache import LRUCache
+
+# 再試行の対象とするサーバーエラー
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    トークンバケット
+
+    トークンを前借りして「何秒待てば送信できるか」を返す方式のため、
+    待機中にロックを保持しない。rateが0以下の場合は無制限。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初期化
+
+        Args:
+            rate: 1秒あたりに補充されるトークン数
+            capacity: バケットの容量（バースト可能なリクエスト数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約
+
+        Returns:
+            送信まで待つべき秒数
+        """
+        now = time.monotonic()
+        with self._lock:
+            blocked = max(0.0, self.blocked_until - now)
+            if self.rate <= 0:
+                return blocked
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, blocked)
+
+    def block_for(self, seconds: float):
+        """Retry-Afterなどで指定された秒数、新しい送信を止める"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class SchedulerMetrics:
+    """スケジューラの計測値"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.transport_errors = 0
+        self.queue_wait_count = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def record_queue_wait(self, seconds: float):
+        """キュー待ち時間を記録"""
+        self.queue_wait_count += 1
+        self.queue_wait_total += seconds
+        self.queue_wait_max = max(self.queue_wait_max, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        """計測値を辞書で返す"""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "transport_errors": self.transport_errors,
+            "queue_wait_avg_ms": (
+                self.queue_wait_total / self.queue_wait_count * 1000
+                if self.queue_wait_count
+                else 0.0
+            ),
+            "queue_wait_max_ms": self.queue_wait_max * 1000,
+        }
+
+
+class RequestScheduler:
+    """
+    Spotify API呼び出しのスケジューラ
+
+    - アプリ全体とユーザートークンごとのトークンバケットで送信レートを制限
+    - 同時送信数を上限で制限（枠を保持するのは送信中だけ）
+    - 429はRetry-Afterに従ってアプリ全体の送信を止めてから再試行
+    - 5xx・通信エラーはジッター付き指数バックオフで再試行
+    """
+
+    def __init__(
+        self,
+        app_rate: float = SPOTIFY_APP_RATE_LIMIT,
+        app_burst: float = SPOTIFY_APP_RATE_BURST,
+        user_rate: float = SPOTIFY_USER_RATE_LIMIT,
+        user_burst: float = SPOTIFY_USER_RATE_BURST,
+        max_concurrency: int = SPOTIFY_MAX_CONCURRENCY,
+        max_retries: int = SPOTIFY_MAX_RETRIES,
+        backoff_base: float = SPOTIFY_BACKOFF_BASE,
+        backoff_max: float = SPOTIFY_BACKOFF_MAX,
+    ):
+        """
+        初期化
+
+        Args:
+            app_rate: アプリ全体の1秒あたりのリクエスト数（0以下で無制限）
+            app_burst: アプリ全体のバースト可能なリクエスト数
+            user_rate: ユーザートークンごとの1秒あたりのリクエスト数（0以下で無制限）
+            user_burst: ユーザートークンごとのバースト可能なリクエスト数
+            max_concurrency: 同時に送信するリクエスト数の上限
+            max_retries: 再試行の最大回数
+            backoff_base: バックオフの基準秒数
+            backoff_max: バックオフの最大秒数
+        """
+        self.app_bucket = TokenBucket(app_rate, app_burst)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = SchedulerMetrics()
+        self._user_buckets = LRUCache(max_size=10000)
+        # asyncio.Semaphoreはイベントループに紐づくため、ループごとに用意する
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user_key)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self._user_buckets.set(user_key, bucket)
+        return bucket
+
+    def _backoff(self, attempt: int) -> float:
+        """ジッター付き指数バックオフの待ち時間（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def run(
+        self,
+        user_key: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        """
+        レート制限に従ってリクエストを送信
+
+        Args:
+            user_key: ユーザートークンを識別するキー
+            send: リクエストを送信してレスポンスを返すコルーチン関数
+
+        Returns:
+            最終的なレスポンス（再試行し尽くした場合は最後の429/5xxレスポンス）
+        """
+        user_bucket = self._user_bucket(user_key)
+        attempt = 0
+        while True:
+            queued_at = time.monotonic()
+            # レート待ちは同時送信数の枠の外で行い、1ユーザーの待ちで他のユーザーを止めない
+            delay = max(self.app_bucket.reserve(), user_bucket.reserve())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self._semaphore():
+                self.metrics.record_queue_wait(time.monotonic() - queued_at)
+                self.metrics.requests += 1
+                try:
+                    response = await send()
+                except httpx.TransportError:
+                    self.metrics.transport_errors += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    response = None
+
+            if response is not None and response.status_code == 429:
+                self.metrics.rate_limited += 1
+                if attempt >= self.max_retries:
+                    return response
+                retry_after = _retry_after(response)
+                wait = (
+                    retry_after if retry_after is not None else self._backoff(attempt)
+                )
+                # 他のリクエストもRetry-Afterまで止め、解除時に一斉に送られないよう揺らぎを加える
+                self.app_bucket.block_for(wait)
+                await asyncio.sleep(wait + random.uniform(0, self.backoff_base))
+            elif response is None or response.status_code in RETRYABLE_STATUS:
+                if response is not None:
+                    self.metrics.server_errors += 1
+                    if attempt >= self.max_retries:
+                        return response
+                await asyncio.sleep(self._backoff(attempt))
+            else:
+                return response
+
+            attempt += 1
+            self.metrics.retries += 1
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Retry-Afterヘッダーを秒数として取得"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_scheduler() -> RequestScheduler:
+    """プロセス共通のRequestSchedulerを取得"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler()
+    return _scheduler
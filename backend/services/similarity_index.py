@@ -0,0 +1,404 @@
+"""
+類似曲検索インデックス - 標準化したオーディオ特徴量のKD木による近傍検索
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from core.config import (
+    SIMILARITY_INDEX_PATH,
+    SIMILARITY_INDEX_REBUILD_RATIO,
+    SIMILARITY_INDEX_SYNC_INTERVAL,
+)
+from services.data_analyzer import CLUSTER_FEATURES
+from services.feature_store import FeatureStore, get_feature_store
+
+if TYPE_CHECKING:
+    from sklearn.neighbors import KDTree
+
+logger = logging.getLogger(__name__)
+
+# 差分がこの件数を超えるまではKD木を作り直さない
+MIN_REBUILD_SIZE = 1000
+
+# 同期の基準時刻をこれだけ前にずらす。FeatureStoreはコミット前の時刻をfetched_atに記録するため、
+# 同期中にコミットされた行は同期の開始時刻より前の時刻を持つことがある（再度読んだ曲はadd()で無視される）
+SYNC_WATERMARK_MARGIN = timedelta(minutes=5)
+
+# 保存形式のバージョン（形式を変えた場合は古いファイルを読み込まずに作り直す）
+INDEX_FORMAT_VERSION = 1
+
+
+class SimilarityIndex:
+    """
+    オーディオ特徴量が似た曲を検索するインデックス
+
+    DataAnalyzerのクラスタリングと同じ特徴量を標準化してKD木に格納する。
+    追加された曲はKD木を作り直さずに差分として保持し、検索時は総当たりで併せて調べる。
+    差分が全体のrebuild_ratioを超えたら、標準化もやり直してKD木を作り直す。
+    KD木の作成はロックの外で行い、作り終えてから参照を差し替えるため、その間も検索できる。
+    """
+
+    def __init__(
+        self,
+        features: Optional[List[str]] = None,
+        rebuild_ratio: float = SIMILARITY_INDEX_REBUILD_RATIO,
+        leaf_size: int = 40,
+    ):
+        """
+        初期化
+
+        Args:
+            features: 使用する特徴量（Noneの場合はCLUSTER_FEATURES）
+            rebuild_ratio: KD木を作り直す差分の割合
+            leaf_size: KD木の葉の件数
+        """
+        self.features = list(features or CLUSTER_FEATURES)
+        self.rebuild_ratio = rebuild_ratio
+        self.leaf_size = leaf_size
+        # KD木に入っている曲と標準化前の特徴量
+        self.ids: List[str] = []
+        self._raw = np.empty((0, len(self.features)))
+        self._tree: Optional["KDTree"] = None
+        self.mean_ = np.zeros(len(self.features))
+        self.scale_ = np.ones(len(self.features))
+        # KD木を作った後に追加された曲
+        self._delta_ids: List[str] = []
+        self._delta_raw = np.empty((0, len(self.features)))
+        self._delta_scaled = np.empty((0, len(self.features)))
+        self._index: Dict[str, Tuple[bool, int]] = {}
+        # 同期済みの特徴量の保存時刻（FeatureStore.iter_all(since=)に渡す）
+        self.synced_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self._delta_ids)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._index
+
+    def _to_rows(
+        self,
+        features_list: Iterable[Optional[Dict[str, Any]]],
+        known: Optional[Dict[str, Tuple[bool, int]]] = None,
+    ) -> Tuple[List[str], np.ndarray]:
+        """特徴量の辞書から、known（デフォルトはインデックス）にない曲のIDと行列を取り出す（値が欠けた曲は除く）"""
+        if known is None:
+            known = self._index
+        ids = []
+        rows = []
+        seen = set()
+        for features in features_list:
+            if not features or features["id"] in known or features["id"] in seen:
+                continue
+            values = [features.get(name) for name in self.features]
+            if any(value is None for value in values):
+                continue
+            seen.add(features["id"])
+            ids.append(features["id"])
+            rows.append(values)
+        return ids, np.asarray(rows, dtype=np.float64).reshape(len(rows), len(self.features))
+
+    def _scale(self, raw: np.ndarray) -> np.ndarray:
+        return (raw - self.mean_) / self.scale_
+
+    def _fit(self, raw: np.ndarray) -> Tuple[Optional["KDTree"], np.ndarray, np.ndarray]:
+        """標準化の平均・スケールを求めてKD木を作成（インデックスの状態は変えないため、ロックの外で呼ぶ）"""
+        # scikit-learnは起動を遅くするため、最初に作成する時点で読み込む
+        from sklearn.neighbors import KDTree
+
+        if not len(raw):
+            return None, np.zeros(len(self.features)), np.ones(len(self.features))
+        mean = raw.mean(axis=0)
+        std = raw.std(axis=0)
+        scale = np.where(std > 0, std, 1.0)
+        return KDTree((raw - mean) / scale, leaf_size=self.leaf_size), mean, scale
+
+    def build(self, chunks: Iterable[Iterable[Dict[str, Any]]]) -> "SimilarityIndex":
+        """
+        特徴量のチャンクからインデックスを作成
+
+        Args:
+            chunks: 特徴量の辞書のリストのイテラブル（FeatureStore.iter_all()など）
+
+        Returns:
+            self
+        """
+        ids: List[str] = []
+        index: Dict[str, Tuple[bool, int]] = {}
+        raws = []
+        for chunk in chunks:
+            chunk_ids, raw = self._to_rows(chunk, known=index)
+            for track_id in chunk_ids:
+                index[track_id] = (True, len(ids))
+                ids.append(track_id)
+            raws.append(raw)
+        raw = np.concatenate(raws) if raws else np.empty((0, len(self.features)))
+        tree, mean, scale = self._fit(raw)
+        with self._lock:
+            self.ids, self._raw, self._tree = ids, raw, tree
+            self.mean_, self.scale_ = mean, scale
+            self._delta_ids = []
+            self._delta_raw = np.empty((0, len(self.features)))
+            self._delta_scaled = np.empty((0, len(self.features)))
+            self._index = index
+        return self
+
+    def _rebuild(self):
+        """
+        差分をKD木に取り込み、標準化をやり直してKD木を作り直す（ロックの外で呼ぶ）
+
+        作成中に追加された曲は、新しい標準化で差分として引き継ぐ。
+        """
+        try:
+            with self._lock:
+                ids = self.ids + self._delta_ids
+                raw = np.concatenate([self._raw, self._delta_raw])
+                merged = len(self._delta_ids)
+            tree, mean, scale = self._fit(raw)
+            with self._lock:
+                for i, track_id in enumerate(self._delta_ids[:merged]):
+                    self._index[track_id] = (True, len(self.ids) + i)
+                delta_ids = self._delta_ids[merged:]
+                for i, track_id in enumerate(delta_ids):
+                    self._index[track_id] = (False, i)
+                self.ids, self._raw, self._tree = ids, raw, tree
+                self.mean_, self.scale_ = mean, scale
+                self._delta_ids = delta_ids
+                self._delta_raw = self._delta_raw[merged:]
+                self._delta_scaled = self._scale(self._delta_raw)
+        finally:
+            self._rebuilding = False
+
+    def add(self, features_list: Iterable[Optional[Dict[str, Any]]]) -> int:
+        """
+        特徴量を追加（既にある曲は無視）
+
+        Args:
+            features_list: 特徴量の辞書のイテラブル
+
+        Returns:
+            追加した曲数
+        """
+        with self._lock:
+            ids, raw = self._to_rows(features_list)
+            if not ids:
+                return 0
+            for track_id in ids:
+                self._index[track_id] = (False, len(self._delta_ids))
+                self._delta_ids.append(track_id)
+            self._delta_raw = np.concatenate([self._delta_raw, raw])
+            self._delta_scaled = np.concatenate([self._delta_scaled, self._scale(raw)])
+            # 作り直しは1つのスレッドだけが行う
+            rebuild = not self._rebuilding and len(self._delta_ids) > max(
+                MIN_REBUILD_SIZE, self.rebuild_ratio * len(self.ids)
+            )
+            if rebuild:
+                self._rebuilding = True
+        if rebuild:
+            self._rebuild()
+        return len(ids)
+
+    def sync(self, store: FeatureStore, chunk_size: int = 5000) -> int:
+        """
+        FeatureStoreに前回の同期以降に保存された特徴量を追加
+
+        Args:
+            store: 特徴量のストア
+            chunk_size: 1回に読み込む件数
+
+        Returns:
+            追加した曲数
+        """
+        started_at = sync_watermark()
+        added = sum(self.add(chunk) for chunk in store.iter_all(chunk_size, since=self.synced_at))
+        self.synced_at = started_at
+        return added
+
+    def _vector(self, track_id: str) -> np.ndarray:
+        with self._lock:
+            in_tree, row = self._index[track_id]
+            return self._raw[row] if in_tree else self._delta_raw[row]
+
+    def query(self, track_id: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        指定した曲に似た曲を検索
+
+        Args:
+            track_id: 曲ID（インデックスにない場合はKeyError）
+            k: 返す曲数
+
+        Returns:
+            (曲ID, 標準化後の空間でのユークリッド距離)の距離順のリスト（指定した曲は含まない）
+        """
+        return self.query_vector(self._vector(track_id), k, exclude=track_id)
+
+    def query_features(self, features: Dict[str, Any], k: int = 10) -> List[Tuple[str, float]]:
+        """
+        特徴量の辞書に似た曲を検索（インデックスにない曲用）
+
+        Args:
+            features: 特徴量の辞書
+            k: 返す曲数
+        """
+        vector = np.array([float(features[name]) for name in self.features])
+        return self.query_vector(vector, k, exclude=features.get("id"))
+
+    def query_vector(
+        self, raw: np.ndarray, k: int = 10, exclude: Optional[str] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        標準化前の特徴量ベクトルに近い曲を検索
+
+        Args:
+            raw: 標準化前の特徴量ベクトル（self.featuresの順）
+            k: 返す曲数
+            exclude: 結果から除く曲ID
+        """
+        # 作り直し中の状態を読まないよう、参照をまとめて取り出す
+        with self._lock:
+            tree, ids, mean, scale = self._tree, self.ids, self.mean_, self.scale_
+            delta_ids, delta_scaled = self._delta_ids, self._delta_scaled
+        point = (np.asarray(raw, dtype=np.float64) - mean) / scale
+        wanted = k + (1 if exclude is not None else 0)
+
+        candidates: List[Tuple[float, str]] = []
+        if tree is not None:
+            distances, rows = tree.query(point[None, :], k=min(wanted, len(ids)))
+            candidates.extend(zip(distances[0].tolist(), (ids[r] for r in rows[0])))
+        if len(delta_scaled):
+            difference = delta_scaled - point
+            squared = np.einsum("ij,ij->i", difference, difference)
+            nearest = (
+                np.argpartition(squared, wanted)[:wanted]
+                if len(squared) > wanted
+                else np.arange(len(squared))
+            )
+            candidates.extend(
+                (float(np.sqrt(squared[i])), delta_ids[i]) for i in nearest.tolist()
+            )
+
+        candidates.sort()
+        return [
+            (track_id, distance)
+            for distance, track_id in candidates
+            if track_id != exclude
+        ][:k]
+
+    def save(self, path: str):
+        """
+        ファイルに保存（一時ファイルに書いてから置き換える）
+
+        Args:
+            path: 保存先のパス
+        """
+        with self._lock:
+            state = {
+                "version": INDEX_FORMAT_VERSION,
+                "features": self.features,
+                "ids": self.ids + self._delta_ids,
+                "raw": np.concatenate([self._raw, self._delta_raw]),
+                "tree_size": len(self.ids),
+                "tree": self._tree,
+                "mean": self.mean_,
+                "scale": self.scale_,
+                "synced_at": self.synced_at,
+            }
+        import joblib
+
+        temporary_path = f"{path}.tmp"
+        joblib.dump(state, temporary_path)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "SimilarityIndex":
+        """
+        save()で保存したファイルから復元
+
+        Args:
+            path: 保存先のパス
+            **kwargs: rebuild_ratioなど__init__に渡す追加の引数
+        """
+        import joblib
+
+        state = joblib.load(path)
+        if state.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported similarity index format: {state.get('version')}")
+        index = cls(features=state["features"], **kwargs)
+        size = state["tree_size"]
+        index.ids = list(state["ids"][:size])
+        index._raw = state["raw"][:size]
+        index._tree = state["tree"]
+        index.mean_ = state["mean"]
+        index.scale_ = state["scale"]
+        index._index = {track_id: (True, i) for i, track_id in enumerate(index.ids)}
+        index.synced_at = state["synced_at"]
+        # KD木を作った後に追加された曲は差分として戻す
+        delta_ids = state["ids"][size:]
+        if delta_ids:
+            for i, track_id in enumerate(delta_ids):
+                index._index[track_id] = (False, i)
+            index._delta_ids = list(delta_ids)
+            index._delta_raw = state["raw"][size:]
+            index._delta_scaled = index._scale(state["raw"][size:])
+        return index
+
+
+def sync_watermark() -> datetime:
+    """これから読み込む特徴量の次回の同期の基準時刻（FeatureStore.iter_all(since=)に渡す）"""
+    return datetime.utcnow() - SYNC_WATERMARK_MARGIN
+
+
+_similarity_index: Optional[SimilarityIndex] = None
+_similarity_index_lock = threading.Lock()
+_last_synced = 0.0
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """
+    プロセス共通の類似曲検索インデックスを取得
+
+    初回はSIMILARITY_INDEX_PATHのファイルから読み込み（なければFeatureStoreの全曲から作成）、
+    以降はSIMILARITY_INDEX_SYNC_INTERVAL秒ごとに新しく保存された特徴量を追加する。
+    DBの読み込みとKD木の作成を伴うため、非同期処理からはスレッドで呼び出す。
+    """
+    global _similarity_index, _last_synced
+    with _similarity_index_lock:
+        store = get_feature_store()
+        if _similarity_index is None:
+            if SIMILARITY_INDEX_PATH and os.path.exists(SIMILARITY_INDEX_PATH):
+                try:
+                    _similarity_index = SimilarityIndex.load(SIMILARITY_INDEX_PATH)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Failed to load similarity index: %s", e)
+            if _similarity_index is None:
+                # 1件ずつ追加すると作り直しが繰り返されるため、全曲から一度に作成する
+                started_at = sync_watermark()
+                _similarity_index = SimilarityIndex().build(store.iter_all())
+                _similarity_index.synced_at = started_at
+                if SIMILARITY_INDEX_PATH and len(_similarity_index):
+                    try:
+                        _similarity_index.save(SIMILARITY_INDEX_PATH)
+                    except OSError as e:
+                        logger.warning("Failed to save similarity index: %s", e)
+            _last_synced = time.monotonic()
+
+        if time.monotonic() - _last_synced >= SIMILARITY_INDEX_SYNC_INTERVAL:
+            tree_size = len(_similarity_index.ids)
+            added = _similarity_index.sync(store)
+            _last_synced = time.monotonic()
+            # 差分はファイルに保存しなくても次回の同期で取り戻せるため、KD木が変わった時だけ保存する
+            if SIMILARITY_INDEX_PATH and len(_similarity_index.ids) != tree_size:
+                try:
+                    _similarity_index.save(SIMILARITY_INDEX_PATH)
+                except OSError as e:
+                    logger.warning("Failed to save similarity index: %s", e)
+            elif added:
+                logger.info("Added %d tracks to similarity index", added)
+        return _similarity_index
@@ -0,0 +1,101 @@
+"""
+シングルフライト - 同じキーの実行中の呼び出しを1つにまとめる
+"""
+
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """実行中の処理と、その結果を待っている呼び出しの数"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    同じキーで同時に呼ばれた処理を1回の実行にまとめる
+
+    最初の呼び出しが処理を別のタスクとして開始し、実行中に同じキーで呼んだ呼び出しは
+    そのタスクの結果（または例外）を共有する。完了後の呼び出しは新たに実行される。
+    処理はどの呼び出しにも属さないため、最初の呼び出しがキャンセルされても
+    他の呼び出しは結果を受け取れる。待っている呼び出しがすべてキャンセルされた場合だけ処理を止める。
+    """
+
+    def __init__(self):
+        # タスクはイベントループに紐づくため、実行中の処理はループごとに管理する
+        self._in_flight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, _Flight]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        キーごとに1回だけfnを実行して結果を返す
+
+        Args:
+            key: リクエストを識別するキー
+            fn: 実行するコルーチン関数
+
+        Returns:
+            fnの結果（同時に呼んだ呼び出し間で同じオブジェクトを共有する）
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = self._in_flight.setdefault(loop, {})
+        self.calls += 1
+
+        flight = in_flight.get(key)
+        if flight is None:
+            flight = _Flight(loop.create_task(fn()))
+            in_flight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(in_flight, key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # 待っている側がキャンセルされても共有中の処理は止めない
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 結果を待つ呼び出しがなくなったため処理を止める（後から来た呼び出しは新たに実行する）
+                if in_flight.get(key) is flight:
+                    del in_flight[key]
+                flight.task.cancel()
+
+    @staticmethod
+    def _finish(in_flight: Dict[Hashable, _Flight], key: Hashable, flight: _Flight):
+        """完了したタスクを実行中の一覧から外す"""
+        if in_flight.get(key) is flight:
+            del in_flight[key]
+        if not flight.task.cancelled():
+            # 待っている呼び出しがない場合に「未取得の例外」警告が出ないようにする
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """呼び出し数・実際の実行数・まとめられた数を返す"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+_singleflight: Optional[SingleFlight] = None
+
+
+def get_singleflight() -> SingleFlight:
+    """プロセス共通のSingleFlightを取得"""
+    global _singleflight
+    if _singleflight is None:
+        _singleflight = SingleFlight()
+    return _singleflight
@@ -1,12 +1,13 @@
 """
-Spotify API サービス - spotipyを使用したAPI連携
+Spotify API サービス - httpx.AsyncClientを使用したAPI連携
 """
 
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-from typing import List, Optional, Dict, Any
-import pandas as pd
-import numpy as np
+import asyncio
+import functools
+import math
+import httpx
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from models.schemas import (
     PlaylistResponse,
@@ -14,31 +15,171 @@ from models.schemas import (
     AudioFeaturesResponse,
     PlaylistAnalysisResponse,
     PlaylistStats,
+    PlaylistStatsItem,
+    DeduplicationReport,
+    BatchPlaylistAnalysisResponse,
+)
+from services.spotify_http import SpotifyHTTPClient
+from services.rate_limiter import RequestScheduler
+from services.singleflight import SingleFlight
+from services.feature_store import FeatureStore, get_feature_store
+from services.artist_cache import ArtistGenreCache, get_artist_cache
+from services.playlist_snapshots import PlaylistSnapshotStore, get_snapshot_store
+from services.stats_accumulator import STATS_FEATURES, FeatureAccumulator
+from services.feature_matrix import FeatureMatrix
+from core.config import SPOTIFY_PAGE_CONCURRENCY
+
+# ページング取得時の1ページあたりの件数
+PAGE_SIZE = 50
+# プレイリストの曲一覧は1ページ100件まで取得でき、オーディオ特徴の1バッチと揃う
+PLAYLIST_TRACKS_PAGE_SIZE = 100
+
+# 一括取得エンドポイントの1リクエストあたりの最大ID数
+AUDIO_FEATURES_BATCH_SIZE = 100
+ARTISTS_BATCH_SIZE = 50
+
+# fieldsパラメータで取得するフィールド（models/schemas.pyのレスポンスに必要なものだけ）
+# PlaylistResponse用（曲一覧は含めない）
+PLAYLIST_FIELDS = "id,name,description,images(url),tracks(total)"
+# 分析前の変更確認用（PlaylistResponseの項目とsnapshot_id）
+PLAYLIST_METADATA_FIELDS = f"{PLAYLIST_FIELDS},snapshot_id"
+# TrackResponse用（ページングに使うtotal/limit/offset/nextを含む）
+PLAYLIST_TRACKS_FIELDS = (
+    "items(track(id,name,duration_ms,artists(name),album(name,images(url)))),"
+    "total,limit,offset,next"
 )
 
 
 class SpotifyService:
     """Spotify APIとの連携を担当するサービス"""
 
-    def __init__(self, access_token: str):
+    def __init__(
+        self,
+        access_token: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        base_url: Optional[str] = None,
+        page_concurrency: Optional[int] = None,
+        feature_store: Optional[FeatureStore] = None,
+        artist_cache: Optional[ArtistGenreCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        singleflight: Optional[SingleFlight] = None,
+        snapshot_store: Optional[PlaylistSnapshotStore] = None,
+        token_expires_at: Optional[float] = None,
+    ):
         """
         初期化
         
         Args:
             access_token: Spotify OAuthアクセストークン
+            http_client: 利用するhttpx.AsyncClient（Noneの場合はプロセス共通のコネクションプールを使用）
+            base_url: Spotify APIのベースURL（Noneの場合は設定値を使用）
+            page_concurrency: ページ並行取得時の同時リクエスト数の上限
+            feature_store: オーディオ特徴量のキャッシュ（Noneの場合はプロセス共通のものを使用）
+            artist_cache: アーティストのジャンルキャッシュ（Noneの場合はプロセス共通のものを使用）
+            scheduler: リクエストスケジューラ（Noneの場合はプロセス共通のものを使用）
+            singleflight: 同一リクエストをまとめるSingleFlight（Noneの場合はプロセス共通のものを使用）
+            snapshot_store: プレイリスト分析結果のストア（Noneの場合はプロセス共通のものを使用）
+            token_expires_at: アクセストークンの有効期限（UNIX時刻、分からない場合はNone）
         """
-        self.client = spotipy.Spotify(auth=access_token)
-    
-    def get_current_user(self):
+        self.client = SpotifyHTTPClient(
+            access_token,
+            base_url=base_url,
+            http_client=http_client,
+            scheduler=scheduler,
+            singleflight=singleflight,
+            token_expires_at=token_expires_at,
+        )
+        self.page_concurrency = page_concurrency or SPOTIFY_PAGE_CONCURRENCY
+        self.feature_store = feature_store or get_feature_store()
+        self.artist_cache = artist_cache or get_artist_cache()
+        self.snapshot_store = snapshot_store or get_snapshot_store()
+
+    async def get_current_user(self):
         """現在のユーザー情報を取得"""
-        return self.client.current_user()
+        return await self.client.current_user()
+
+    async def _iter_pages(
+        self,
+        fetch_page: Callable[..., Awaitable[Dict[str, Any]]],
+        parallel: bool = True,
+        page_size: int = PAGE_SIZE,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        ページング結果を1ページずつ元の順序で返す
 
-    async def get_user_playlists(self) -> List[PlaylistResponse]:
-        """ユーザーのプレイリスト一覧を取得"""
+        Args:
+            fetch_page: limit/offsetを受け取り1ページ分を返すコルーチン関数
+            parallel: Trueの場合、1ページ目のtotalから残りのoffsetを計算して
+                      最大page_concurrencyページ先まで先読みする。
+                      Falseの場合はnextを順番にたどる。
+            page_size: 1ページあたりの件数
+
+        Yields:
+            ページのJSON
+        """
+        first = await fetch_page(limit=page_size, offset=0)
+        yield first
+        if not parallel or "total" not in first:
+            page = first
+            while page.get("next"):
+                page = await self.client.next(page)
+                yield page
+            return
+
+        limit = first.get("limit") or page_size
+        # 先読み中のページは最大page_concurrency件に抑え、先頭から順に返す
+        pending: "deque[asyncio.Task]" = deque()
+        try:
+            for offset in range(limit, first["total"], limit):
+                if len(pending) >= self.page_concurrency:
+                    yield await pending.popleft()
+                pending.append(
+                    asyncio.ensure_future(fetch_page(limit=limit, offset=offset))
+                )
+            while pending:
+                yield await pending.popleft()
+        finally:
+            # 途中で打ち切られた場合は先読み中のリクエストを止める
+            for task in pending:
+                task.cancel()
+
+    async def _fetch_pages(
+        self,
+        fetch_page: Callable[..., Awaitable[Dict[str, Any]]],
+        parallel: bool = True,
+        page_size: int = PAGE_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """
+        ページング結果を全ページ取得
+
+        Args:
+            fetch_page: limit/offsetを受け取り1ページ分を返すコルーチン関数
+            parallel: ページを先読みして並行取得するかどうか（_iter_pagesを参照）
+            page_size: 1ページあたりの件数
+
+        Returns:
+            元の順序に並んだページのリスト
+        """
+        return [
+            page
+            async for page in self._iter_pages(fetch_page, parallel, page_size)
+        ]
+
+    async def get_user_playlists(
+        self, parallel_pages: bool = True
+    ) -> List[PlaylistResponse]:
+        """
+        ユーザーのプレイリスト一覧を取得
+
+        Args:
+            parallel_pages: ページを並行取得するかどうか
+        """
         playlists = []
-        results = self.client.current_user_playlists(limit=50)
+        pages = await self._fetch_pages(
+            self.client.current_user_playlists, parallel=parallel_pages
+        )
 
-        while results:
+        for results in pages:
             for item in results["items"]:
                 playlists.append(
                     PlaylistResponse(
@@ -49,17 +190,12 @@ class SpotifyService:
                         track_count=item["tracks"]["total"],
                     )
                 )
-            if results["next"]:
-                results = self.client.next(results)
-            else:
-                break
 
         return playlists
 
-    async def get_playlist_details(self, playlist_id: str) -> PlaylistResponse:
-        """プレイリストの詳細を取得"""
-        playlist = self.client.playlist(playlist_id)
-
+    @staticmethod
+    def _to_playlist_response(playlist: Dict[str, Any]) -> PlaylistResponse:
+        """プレイリストのJSONをPlaylistResponseに変換"""
         return PlaylistResponse(
             id=playlist["id"],
             name=playlist["name"],
@@ -68,39 +204,207 @@ class SpotifyService:
             track_count=playlist["tracks"]["total"],
         )
 
-    async def get_playlist_tracks(self, playlist_id: str) -> List[TrackResponse]:
-        """プレイリストの曲一覧を取得"""
-        tracks = []
-        results = self.client.playlist_tracks(playlist_id, limit=50)
+    async def get_playlist_details(self, playlist_id: str) -> PlaylistResponse:
+        """プレイリストの詳細を取得"""
+        playlist = await self.client.playlist(playlist_id, fields=PLAYLIST_FIELDS)
+        return self._to_playlist_response(playlist)
 
-        while results:
-            for item in results["items"]:
-                if item["track"] and item["track"]["id"]:
-                    track = item["track"]
-                    tracks.append(
-                        TrackResponse(
-                            id=track["id"],
-                            name=track["name"],
-                            artists=[artist["name"] for artist in track["artists"]],
-                            album_name=track["album"]["name"],
-                            album_image=(
-                                track["album"]["images"][0]["url"]
-                                if track["album"]["images"]
-                                else None
-                            ),
-                            duration_ms=track["duration_ms"],
-                        )
+    @staticmethod
+    def _to_track_responses(page: Dict[str, Any]) -> List[TrackResponse]:
+        """プレイリストの曲一覧1ページ分をTrackResponseのリストに変換"""
+        tracks = []
+        for item in page["items"]:
+            if item["track"] and item["track"]["id"]:
+                track = item["track"]
+                tracks.append(
+                    TrackResponse(
+                        id=track["id"],
+                        name=track["name"],
+                        artists=[artist["name"] for artist in track["artists"]],
+                        album_name=track["album"]["name"],
+                        album_image=(
+                            track["album"]["images"][0]["url"]
+                            if track["album"]["images"]
+                            else None
+                        ),
+                        duration_ms=track["duration_ms"],
                     )
-            if results["next"]:
-                results = self.client.next(results)
-            else:
-                break
+                )
+        return tracks
+
+    async def iter_playlist_tracks(
+        self, playlist_id: str, parallel_pages: bool = True
+    ) -> AsyncIterator[List[TrackResponse]]:
+        """
+        プレイリストの曲一覧を1ページずつ取得
+
+        Args:
+            playlist_id: プレイリストID
+            parallel_pages: ページを先読みして並行取得するかどうか
 
+        Yields:
+            1ページ分の曲のリスト（元の順序）
+        """
+        pages = self._iter_pages(
+            functools.partial(
+                self.client.playlist_tracks, playlist_id, fields=PLAYLIST_TRACKS_FIELDS
+            ),
+            parallel=parallel_pages,
+            page_size=PLAYLIST_TRACKS_PAGE_SIZE,
+        )
+        try:
+            async for page in pages:
+                yield self._to_track_responses(page)
+        finally:
+            await pages.aclose()
+
+    async def iter_playlist_features(
+        self,
+        playlist_id: str,
+        known: Optional[FeatureMatrix] = None,
+    ) -> AsyncIterator[Tuple[List[TrackResponse], FeatureMatrix]]:
+        """
+        プレイリストの曲とオーディオ特徴を1ページずつ取得
+
+        ページが届くたびにそのページの特徴量の取得を始めるため、
+        特徴量の取得と曲一覧のページングが並行して進む。
+        保持するのは先読み中の最大page_concurrencyページ分だけ。
+
+        Args:
+            playlist_id: プレイリストID
+            known: 取得済みの特徴量（ここにある曲はSpotifyから取得しない）
+
+        Yields:
+            (1ページ分の曲のリスト, そのうち特徴量がある曲の特徴量行列（曲の順序）)
+        """
+        known = known if known is not None else FeatureMatrix()
+
+        async def fetch_features(tracks: List[TrackResponse]) -> FeatureMatrix:
+            missing = [track.id for track in tracks if track.id not in known]
+            fetched = FeatureMatrix.from_raw(await self._fetch_audio_features(missing))
+            return FeatureMatrix.gather((track.id for track in tracks), [known, fetched])
+
+        pages = self.iter_playlist_tracks(playlist_id)
+        pending: "deque[Tuple[List[TrackResponse], asyncio.Task]]" = deque()
+        try:
+            async for tracks in pages:
+                pending.append((tracks, asyncio.ensure_future(fetch_features(tracks))))
+                if len(pending) > self.page_concurrency:
+                    tracks, task = pending.popleft()
+                    yield tracks, await task
+            while pending:
+                tracks, task = pending.popleft()
+                yield tracks, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+            await pages.aclose()
+
+    async def get_playlist_tracks(
+        self, playlist_id: str, parallel_pages: bool = True
+    ) -> List[TrackResponse]:
+        """
+        プレイリストの曲一覧を取得
+
+        Args:
+            playlist_id: プレイリストID
+            parallel_pages: ページを並行取得するかどうか
+        """
+        tracks = []
+        async for page in self.iter_playlist_tracks(playlist_id, parallel_pages):
+            tracks.extend(page)
         return tracks
 
+    async def _fetch_audio_features(
+        self, track_ids: List[str]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        オーディオ特徴の生データを取得（キャッシュにない曲だけをSpotifyから取得）
+
+        Args:
+            track_ids: 曲IDのリスト
+
+        Returns:
+            track_idsと同じ順序の特徴量リスト（特徴量がない曲はNone）
+        """
+        features_by_id = await self.feature_store.get_or_fetch(
+            track_ids, self._request_audio_features
+        )
+        return [features_by_id.get(track_id) for track_id in track_ids]
+
+    async def _request_audio_features(
+        self, track_ids: List[str]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        オーディオ特徴の生データをSpotifyから100件ずつのバッチで並行取得
+
+        Args:
+            track_ids: 曲IDのリスト
+
+        Returns:
+            track_idsと同じ順序の特徴量リスト（特徴量がない曲はNone）
+        """
+        batches = [
+            track_ids[i : i + AUDIO_FEATURES_BATCH_SIZE]
+            for i in range(0, len(track_ids), AUDIO_FEATURES_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(self.client.audio_features(batch) for batch in batches)
+        )
+        return [feature for features in results for feature in features]
+
+    async def _fetch_artist_genres(
+        self, artist_ids: List[str]
+    ) -> Dict[str, List[str]]:
+        """
+        アーティストのジャンルを取得（キャッシュにないアーティストだけをSpotifyから取得）
+
+        Args:
+            artist_ids: アーティストIDのリスト
+
+        Returns:
+            アーティストIDをキーとしたジャンルリストの辞書
+        """
+        return await self.artist_cache.get_or_fetch(
+            artist_ids, self._request_artist_genres
+        )
+
+    async def _request_artist_genres(
+        self, artist_ids: List[str]
+    ) -> Dict[str, List[str]]:
+        """
+        アーティストのジャンルをSpotifyから50件ずつ一括取得
+
+        Args:
+            artist_ids: 重複のないアーティストIDのリスト
+
+        Returns:
+            アーティストIDをキーとしたジャンルリストの辞書
+        """
+
+        async def fetch(batch: List[str]) -> List[Optional[Dict[str, Any]]]:
+            try:
+                return (await self.client.artists(batch))["artists"]
+            except Exception:
+                return []
+
+        results = await asyncio.gather(
+            *(
+                fetch(artist_ids[i : i + ARTISTS_BATCH_SIZE])
+                for i in range(0, len(artist_ids), ARTISTS_BATCH_SIZE)
+            )
+        )
+
+        artist_genres = {}
+        for artists in results:
+            for artist in artists:
+                if artist:
+                    artist_genres[artist["id"]] = artist.get("genres", [])
+        return artist_genres
+
     async def get_audio_features(self, track_id: str) -> AudioFeaturesResponse:
         """曲のオーディオ特徴を取得"""
-        features = self.client.audio_features([track_id])[0]
+        features = (await self._fetch_audio_features([track_id]))[0]
 
         if not features:
             raise ValueError(f"Track {track_id} has no audio features")
@@ -126,93 +430,217 @@ class SpotifyService:
     ) -> List[AudioFeaturesResponse]:
         """複数の曲のオーディオ特徴を一括取得"""
         features_list = []
-        batch_size = 100
-
-        for i in range(0, len(track_ids), batch_size):
-            batch = track_ids[i : i + batch_size]
-            features = self.client.audio_features(batch)
-
-            for feature in features:
-                if feature:
-                    features_list.append(
-                        AudioFeaturesResponse(
-                            id=feature["id"],
-                            danceability=feature["danceability"],
-                            energy=feature["energy"],
-                            valence=feature["valence"],
-                            tempo=feature["tempo"],
-                            acousticness=feature["acousticness"],
-                            instrumentalness=feature["instrumentalness"],
-                            liveness=feature["liveness"],
-                            speechiness=feature["speechiness"],
-                            loudness=feature["loudness"],
-                            mode=feature["mode"],
-                            key=feature["key"],
-                            time_signature=feature["time_signature"],
-                        )
+        features = await self._fetch_audio_features(track_ids)
+
+        for feature in features:
+            if feature:
+                features_list.append(
+                    AudioFeaturesResponse(
+                        id=feature["id"],
+                        danceability=feature["danceability"],
+                        energy=feature["energy"],
+                        valence=feature["valence"],
+                        tempo=feature["tempo"],
+                        acousticness=feature["acousticness"],
+                        instrumentalness=feature["instrumentalness"],
+                        liveness=feature["liveness"],
+                        speechiness=feature["speechiness"],
+                        loudness=feature["loudness"],
+                        mode=feature["mode"],
+                        key=feature["key"],
+                        time_signature=feature["time_signature"],
                     )
+                )
 
         return features_list
 
+    @staticmethod
+    def _to_playlist_stats(
+        total_tracks: int, accumulator: FeatureAccumulator
+    ) -> PlaylistStats:
+        """集計済みの統計量からPlaylistStatsを作成"""
+        return PlaylistStats(
+            total_tracks=total_tracks,
+            analyzed_tracks=accumulator.total,
+            averages=accumulator.averages(),
+            std_devs=accumulator.std_devs(),
+        )
+
+    async def get_combined_stats(self, playlist_ids: List[str]) -> PlaylistStats:
+        """
+        分析済みの複数のプレイリストを合わせた統計情報を返す
+
+        保存済みの集計を合成するだけで、曲やSpotify APIにはアクセスしない。
+        複数のプレイリストに入っている曲は、入っている回数だけ数える。
+
+        Args:
+            playlist_ids: プレイリストIDのリスト（analyze_playlist()で分析済みであること）
+
+        Returns:
+            合成した統計情報（total_tracksは特徴量がある曲数の合計）
+
+        Raises:
+            ValueError: 分析されていないプレイリストがある場合
+        """
+        playlist_ids = list(dict.fromkeys(playlist_ids))
+        stored = await asyncio.to_thread(self.snapshot_store.get_accumulators, playlist_ids)
+        missing = [playlist_id for playlist_id in playlist_ids if playlist_id not in stored]
+        if missing:
+            raise ValueError(f"Playlists have not been analyzed: {', '.join(missing)}")
+        accumulator = FeatureAccumulator.combine(
+            FeatureAccumulator.from_dict(stored[playlist_id]) for playlist_id in playlist_ids
+        )
+        return self._to_playlist_stats(accumulator.total, accumulator)
+
     async def analyze_playlist(
         self, playlist_id: str
     ) -> PlaylistAnalysisResponse:
-        """プレイリスト全体を分析"""
-        # プレイリスト詳細を取得
-        playlist = await self.get_playlist_details(playlist_id)
+        """
+        プレイリスト全体を分析
 
-        # 曲一覧を取得
-        tracks = await self.get_playlist_tracks(playlist_id)
+        snapshot_idが前回の分析時から変わっていなければ保存済みの結果を返す
+        （プレイリストの名前や説明などは毎回取得したものを返す）。
+        変わっている場合は、追加された曲のオーディオ特徴だけを取得し、
+        統計情報は前回の集計に追加・削除分を反映して更新する。
+        """
+        # 曲一覧を含まないメタデータだけを取得して変更の有無を確認
+        metadata = await self.client.playlist(
+            playlist_id, fields=PLAYLIST_METADATA_FIELDS
+        )
+        playlist = self._to_playlist_response(metadata)
+        snapshot_id = metadata.get("snapshot_id")
+
+        # DBの読み書きはスレッドで行い、イベントループを止めない
+        stored = await asyncio.to_thread(self.snapshot_store.get, playlist_id)
+        if stored is not None and snapshot_id and stored["snapshot_id"] == snapshot_id:
+            # snapshot_idは曲が変わった時だけ変わるため、名前や説明は取得したメタデータで置き換える
+            result = PlaylistAnalysisResponse.model_validate(stored["result"])
+            result.playlist = playlist
+            return result
+
+        # 前回の結果は保存されたJSONから直接行列にする（Pydanticモデルは作らない）
+        if stored is not None:
+            previous_ids = Counter(track["id"] for track in stored["result"]["tracks"])
+            library = FeatureMatrix.from_raw(stored["result"]["features"])
+            accumulator = FeatureAccumulator.from_dict(stored["accumulator"])
+        else:
+            previous_ids = Counter()
+            library = FeatureMatrix()
+            accumulator = FeatureAccumulator()
 
-        # 曲のIDを抽出
+        # 曲一覧のページングと並行して、前回の分析にない曲の特徴量だけを取得
+        tracks = []
+        async for page_tracks, page_features in self.iter_playlist_features(
+            playlist_id, known=library
+        ):
+            tracks.extend(page_tracks)
+            library.extend(page_features)
         track_ids = [track.id for track in tracks]
 
-        # オーディオ特徴を取得
-        features = await self.get_audio_features_batch(track_ids)
-
-        # 統計情報を計算
-        if features:
-            df = pd.DataFrame([f.model_dump() for f in features])
-            stats = PlaylistStats(
-                total_tracks=len(tracks),
-                analyzed_tracks=len(features),
-                averages={
-                    "danceability": float(df["danceability"].mean()),
-                    "energy": float(df["energy"].mean()),
-                    "valence": float(df["valence"].mean()),
-                    "tempo": float(df["tempo"].mean()),
-                    "acousticness": float(df["acousticness"].mean()),
-                    "instrumentalness": float(df["instrumentalness"].mean()),
-                    "liveness": float(df["liveness"].mean()),
-                    "speechiness": float(df["speechiness"].mean()),
-                },
-                std_devs={
-                    "danceability": float(df["danceability"].std()),
-                    "energy": float(df["energy"].std()),
-                    "valence": float(df["valence"].std()),
-                    "tempo": float(df["tempo"].std()),
-                    "acousticness": float(df["acousticness"].std()),
-                    "instrumentalness": float(df["instrumentalness"].std()),
-                    "liveness": float(df["liveness"].std()),
-                    "speechiness": float(df["speechiness"].std()),
-                },
-            )
-        else:
-            stats = PlaylistStats(
-                total_tracks=len(tracks),
-                analyzed_tracks=0,
-                averages={},
-                std_devs={},
-            )
+        # 同じ曲が複数回入る場合があるため、曲IDの多重集合で差分を取る
+        current_ids = Counter(track_ids)
+        accumulator.remove_matrix(library.take((previous_ids - current_ids).elements()))
+        accumulator.add_matrix(library.take((current_ids - previous_ids).elements()))
+
+        features = library.take(track_ids)
 
-        return PlaylistAnalysisResponse(
+        # 統計情報は集計済みの値から求める
+        stats = self._to_playlist_stats(len(tracks), accumulator)
+
+        result = PlaylistAnalysisResponse(
             playlist=playlist,
             tracks=tracks,
-            features=features,
+            features=features.to_responses(),
             stats=stats,
         )
+        if snapshot_id:
+            await asyncio.to_thread(
+                self.snapshot_store.save,
+                playlist_id,
+                snapshot_id,
+                result.model_dump(),
+                accumulator.to_dict(),
+            )
+        return result
+
+    async def analyze_playlists(
+        self, playlist_ids: List[str]
+    ) -> BatchPlaylistAnalysisResponse:
+        """
+        複数のプレイリストを一括で分析
+
+        各プレイリストのメタデータと曲一覧を並行して取得し、
+        全プレイリストの曲IDの和集合について特徴量を1回ずつ取得する。
+        結果は統計情報だけで、プレイリストごとの分析結果の保存は行わない。
+
+        Args:
+            playlist_ids: プレイリストIDのリスト（重複は除く）
+
+        Returns:
+            プレイリストごとの統計情報、重複を除いた全曲の統計情報、
+            重複をまとめて減ったリクエスト数
+        """
+        playlist_ids = list(dict.fromkeys(playlist_ids))
+        loaded = await asyncio.gather(
+            *(
+                asyncio.gather(
+                    self.get_playlist_details(playlist_id),
+                    self.get_playlist_tracks(playlist_id),
+                )
+                for playlist_id in playlist_ids
+            )
+        )
+        track_ids = [[track.id for track in tracks] for _, tracks in loaded]
+        unique_ids = list(dict.fromkeys(track_id for ids in track_ids for track_id in ids))
+
+        # キャッシュになくSpotifyに問い合わせた曲とリクエスト数を記録
+        fetched: List[str] = []
+        requests = 0
+
+        async def request(ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+            nonlocal requests
+            fetched.extend(ids)
+            requests += math.ceil(len(ids) / AUDIO_FEATURES_BATCH_SIZE)
+            return await self._request_audio_features(ids)
+
+        features_by_id = await self.feature_store.get_or_fetch(unique_ids, request)
+        library = FeatureMatrix.from_raw(features_by_id.get(track_id) for track_id in unique_ids)
+
+        items = []
+        for (playlist, tracks), ids in zip(loaded, track_ids):
+            accumulator = FeatureAccumulator.from_matrix(library.take(ids))
+            items.append(
+                PlaylistStatsItem(
+                    playlist=playlist,
+                    stats=self._to_playlist_stats(len(tracks), accumulator),
+                )
+            )
+
+        # プレイリストごとに取得した場合は、各プレイリストの未キャッシュの曲を別々に取得する
+        fetched_ids = set(fetched)
+        requests_without_dedup = sum(
+            math.ceil(
+                sum(1 for track_id in set(ids) if track_id in fetched_ids)
+                / AUDIO_FEATURES_BATCH_SIZE
+            )
+            for ids in track_ids
+        )
+        return BatchPlaylistAnalysisResponse(
+            playlists=items,
+            combined=self._to_playlist_stats(
+                len(unique_ids), FeatureAccumulator.from_matrix(library)
+            ),
+            deduplication=DeduplicationReport(
+                track_refs=sum(len(ids) for ids in track_ids),
+                unique_tracks=len(unique_ids),
+                fetched_tracks=len(fetched),
+                audio_features_requests=requests,
+                requests_without_dedup=requests_without_dedup,
+                requests_saved=requests_without_dedup - requests,
+            ),
+        )
 
-    def get_top_tracks_with_genres(
+    async def get_top_tracks_with_genres(
         self, limit: int = 50, time_range: str = "medium_term"
     ) -> List[Dict[str, Any]]:
         """
@@ -225,27 +653,37 @@ class SpotifyService:
         Returns:
             トラック情報のリスト（各要素は{"track": str, "valence": float, "energy": float, "tempo": float, "genres": List[str]}を含む）
         """
-        results = self.client.current_user_top_tracks(
+        results = await self.client.current_user_top_tracks(
             limit=limit, time_range=time_range
         )
         tracks_data = []
+        items = results["items"]
+
+        # 全トラックのアーティストIDを重複なく収集（各トラック最大5アーティストまで）
+        artist_ids = list(
+            dict.fromkeys(
+                artist["id"]
+                for item in items
+                for artist in item["artists"][:5]
+                if artist["id"]
+            )
+        )
+
+        # ジャンルとオーディオ特徴を一括で並行取得
+        artist_genres, audio_features_list = await asyncio.gather(
+            self._fetch_artist_genres(artist_ids),
+            self._fetch_audio_features([item["id"] for item in items]),
+        )
 
-        for item in results["items"]:
+        for item, audio_features in zip(items, audio_features_list):
             track_id = item["id"]
             track_name = item["name"]
-            artist_ids = [artist["id"] for artist in item["artists"]]
 
-            # アーティスト情報を取得してジャンルを抽出
+            # アーティストのジャンルを集約
             genres = set()
-            for artist_id in artist_ids[:5]:  # 最大5アーティストまで
-                try:
-                    artist = self.client.artist(artist_id)
-                    genres.update(artist.get("genres", []))
-                except Exception:
-                    continue
-
-            # オーディオ特徴を取得
-            audio_features = self.client.audio_features([track_id])[0]
+            for artist in item["artists"][:5]:  # 最大5アーティストまで
+                genres.update(artist_genres.get(artist["id"], []))
+
             if not audio_features:
                 continue
 
@@ -262,7 +700,7 @@ class SpotifyService:
 
         return tracks_data
 
-    def get_user_top_tracks_with_features(
+    async def get_user_top_tracks_with_features(
         self, limit: int = 50, time_range: str = "medium_term"
     ) -> List[Dict[str, Any]]:
         """
@@ -273,15 +711,16 @@ class SpotifyService:
             time_range: 期間 ("short_term", "medium_term", "long_term")
 
         Returns:
-            トラック情報のリスト（各要素は{"track": str, "valence": float, "energy": float, "tempo": float}を含む）
+            トラック情報のリスト（各要素は{"track": str, "track_id": str}と
+            STATS_FEATURESの各特徴量（"valence", "energy", "tempo"など）を含む）
         """
-        results = self.client.current_user_top_tracks(
+        results = await self.client.current_user_top_tracks(
             limit=limit, time_range=time_range
         )
         tracks_data = []
 
         track_ids = [item["id"] for item in results["items"]]
-        audio_features_list = self.client.audio_features(track_ids)
+        audio_features_list = await self._fetch_audio_features(track_ids)
 
         for item, features in zip(results["items"], audio_features_list):
             if not features:
@@ -291,9 +730,7 @@ class SpotifyService:
                 {
                     "track": item["name"],
                     "track_id": item["id"],
-                    "valence": features.get("valence"),
-                    "energy": features.get("energy"),
-                    "tempo": features.get("tempo"),
+                    **{name: features.get(name) for name in STATS_FEATURES},
                 }
             )
 
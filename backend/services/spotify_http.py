@@ -0,0 +1,262 @@
+"""
+Spotify Web API 非同期トランスポート - httpx.AsyncClientを使用したAPI呼び出し
+"""
+
+import asyncio
+import hashlib
+import weakref
+import httpx
+from typing import Any, Dict, List, Optional
+
+from core.config import (
+    SPOTIFY_API_BASE_URL,
+    SPOTIFY_HTTP_TIMEOUT,
+    SPOTIFY_HTTP_CONNECT_TIMEOUT,
+    SPOTIFY_HTTP_MAX_CONNECTIONS,
+    SPOTIFY_HTTP_MAX_KEEPALIVE,
+    SPOTIFY_HTTP_KEEPALIVE_EXPIRY,
+    SPOTIFY_HTTP2,
+)
+from services.rate_limiter import RequestScheduler, get_scheduler
+from services.singleflight import SingleFlight, get_singleflight
+
+
+class SpotifyAPIError(Exception):
+    """Spotify APIがエラーレスポンスを返した場合の例外"""
+
+    def __init__(
+        self, status: int, message: str, retry_after: Optional[float] = None
+    ):
+        """
+        初期化
+
+        Args:
+            status: HTTPステータスコード
+            message: エラーメッセージ
+            retry_after: Retry-Afterヘッダーの値（秒）
+        """
+        super().__init__(f"Spotify API error {status}: {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class SpotifyRateLimitError(SpotifyAPIError):
+    """Spotify APIのレート制限（429）を再試行し尽くした場合の例外"""
+
+
+def token_fingerprint(access_token: str) -> str:
+    """アクセストークンを識別するためのハッシュ（トークン自体は保持しない）"""
+    return hashlib.sha256(access_token.encode()).hexdigest()[:32]
+
+
+def _http2_available() -> bool:
+    """HTTP/2に必要なh2パッケージがインストールされているか"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """設定値に従ってキープアライブ付きのhttpx.AsyncClientを生成"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(SPOTIFY_HTTP_TIMEOUT, connect=SPOTIFY_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SPOTIFY_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=SPOTIFY_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=SPOTIFY_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=SPOTIFY_HTTP2 and _http2_available(),
+    )
+
+
+# コネクションはイベントループに紐づくため、共有クライアントはループごとに保持する
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """現在のイベントループで共有するhttpx.AsyncClient（コネクションプール）を取得"""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = create_http_client()
+        _http_clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """現在のイベントループの共有クライアントを閉じる（アプリ終了時などに呼び出す）"""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _parse_error(response: httpx.Response) -> SpotifyAPIError:
+    """エラーレスポンスをSpotifyAPIErrorに変換"""
+    message = response.reason_phrase
+    try:
+        body = response.json()
+        error = body.get("error")
+        if isinstance(error, dict):
+            message = error.get("message", message)
+        elif isinstance(error, str):
+            message = body.get("error_description", error)
+    except ValueError:
+        pass
+
+    retry_after = None
+    if "Retry-After" in response.headers:
+        try:
+            retry_after = float(response.headers["Retry-After"])
+        except ValueError:
+            retry_after = None
+
+    error_class = SpotifyRateLimitError if response.status_code == 429 else SpotifyAPIError
+    return error_class(response.status_code, message, retry_after=retry_after)
+
+
+class SpotifyHTTPClient:
+    """
+    Spotify Web APIの非同期クライアント
+
+    spotipy.Spotifyと同じメソッド名・戻り値（生のJSON）を持つため、
+    SpotifyServiceからはspotipyと同じ感覚で利用できる。
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        base_url: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        singleflight: Optional[SingleFlight] = None,
+        token_expires_at: Optional[float] = None,
+    ):
+        """
+        初期化
+
+        Args:
+            access_token: Spotify OAuthアクセストークン
+            base_url: APIのベースURL（Noneの場合は設定値を使用）
+            http_client: 利用するhttpx.AsyncClient（Noneの場合はプロセス共通のコネクションプールを使用）
+            scheduler: リクエストスケジューラ（Noneの場合はプロセス共通のものを使用）
+            singleflight: 同一リクエストをまとめるSingleFlight（Noneの場合はプロセス共通のものを使用）
+            token_expires_at: アクセストークンの有効期限（UNIX時刻、分からない場合はNone）
+        """
+        self.access_token = access_token
+        self.token_key = token_fingerprint(access_token)
+        self.token_expires_at = token_expires_at
+        self.scheduler = scheduler or get_scheduler()
+        self.singleflight = singleflight or get_singleflight()
+        self.base_url = (base_url or SPOTIFY_API_BASE_URL).rstrip("/")
+        self._http_client = http_client
+
+    @property
+    def _http(self) -> httpx.AsyncClient:
+        """リクエストに使うHTTPクライアント（トークンは送信時にヘッダーで付与する）"""
+        return self._http_client or get_http_client()
+
+    def _url(self, path_or_url: str) -> str:
+        """パスを絶対URLに変換（nextのような絶対URLはそのまま）"""
+        if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
+            return path_or_url
+        return f"{self.base_url}/{path_or_url.lstrip('/')}"
+
+    async def get(
+        self, path_or_url: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        GETリクエストを送信してJSONを返す
+
+        同じトークン・URL・パラメータのリクエストが実行中の場合は、新たに送信せず
+        その結果を共有する（結果のオブジェクトは呼び出し元間で共有されるため変更しないこと）。
+
+        Args:
+            path_or_url: APIパス（例: "me/playlists"）または絶対URL
+            params: クエリパラメータ（値がNoneのものは送信しない）
+
+        Returns:
+            レスポンスのJSON
+        """
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+
+        url = self._url(path_or_url)
+        key = (self.token_key, url, tuple(sorted((params or {}).items())))
+        return await self.singleflight.do(key, lambda: self._send(url, params))
+
+    async def _send(
+        self, url: str, params: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """スケジューラを通してリクエストを送信"""
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        response = await self.scheduler.run(
+            self.token_key,
+            lambda: self._http.get(url, params=params or None, headers=headers),
+        )
+        if response.status_code >= 400:
+            raise _parse_error(response)
+        return response.json()
+
+    async def current_user(self) -> Dict[str, Any]:
+        """現在のユーザー情報を取得"""
+        return await self.get("me")
+
+    async def current_user_playlists(
+        self, limit: int = 50, offset: int = 0
+    ) -> Dict[str, Any]:
+        """現在のユーザーのプレイリスト一覧（1ページ分）を取得"""
+        return await self.get("me/playlists", {"limit": limit, "offset": offset})
+
+    async def playlist(
+        self, playlist_id: str, fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """プレイリストを取得"""
+        return await self.get(f"playlists/{playlist_id}", {"fields": fields})
+
+    async def playlist_tracks(
+        self,
+        playlist_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        fields: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """プレイリストの曲一覧（1ページ分）を取得"""
+        return await self.get(
+            f"playlists/{playlist_id}/tracks",
+            {"limit": limit, "offset": offset, "fields": fields},
+        )
+
+    async def next(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """ページング結果の次のページを取得"""
+        if result.get("next"):
+            return await self.get(result["next"])
+        return None
+
+    async def current_user_top_tracks(
+        self, limit: int = 20, offset: int = 0, time_range: str = "medium_term"
+    ) -> Dict[str, Any]:
+        """現在のユーザーの上位トラックを取得"""
+        return await self.get(
+            "me/top/tracks",
+            {"limit": limit, "offset": offset, "time_range": time_range},
+        )
+
+    async def artist(self, artist_id: str) -> Dict[str, Any]:
+        """アーティスト情報を取得"""
+        return await self.get(f"artists/{artist_id}")
+
+    async def artists(self, artist_ids: List[str]) -> Dict[str, Any]:
+        """複数アーティストの情報を一括取得（最大50件）"""
+        return await self.get("artists", {"ids": ",".join(artist_ids)})
+
+    async def audio_features(
+        self, tracks: List[str]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """複数曲のオーディオ特徴を一括取得（最大100件）"""
+        results = await self.get("audio-features", {"ids": ",".join(tracks)})
+        return results["audio_features"]
@@ -0,0 +1,241 @@
+"""
+統計量アキュムレータ - 特徴量ごとの件数・平均・分散を逐次更新
+"""
+
+import math
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+import numpy as np
+
+if TYPE_CHECKING:
+    from services.feature_matrix import FeatureMatrix
+
+# PlaylistStatsで集計するオーディオ特徴量
+STATS_FEATURES = [
+    "danceability",
+    "energy",
+    "valence",
+    "tempo",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+]
+
+
+class FeatureAccumulator:
+    """
+    特徴量ごとの件数・平均・偏差平方和（M2）を保持するアキュムレータ
+
+    Welfordのアルゴリズムで1曲ずつ追加・削除でき、Chanらの方法で
+    他のアキュムレータと合成・差し引きできるため、
+    全曲を読み直さずに平均と標準偏差を更新できる。
+    """
+
+    def __init__(self, features: Optional[List[str]] = None):
+        """
+        初期化
+
+        Args:
+            features: 集計する特徴量（Noneの場合はSTATS_FEATURES）
+        """
+        self.features = list(features or STATS_FEATURES)
+        self.count = {name: 0 for name in self.features}
+        self.mean = {name: 0.0 for name in self.features}
+        self.m2 = {name: 0.0 for name in self.features}
+
+    def add(self, row: Dict[str, Any]):
+        """1曲分の特徴量を追加（値がNoneの特徴量は数えない）"""
+        for name in self.features:
+            value = row.get(name)
+            if value is None:
+                continue
+            value = float(value)
+            self.count[name] += 1
+            delta = value - self.mean[name]
+            self.mean[name] += delta / self.count[name]
+            self.m2[name] += delta * (value - self.mean[name])
+
+    def remove(self, row: Dict[str, Any]):
+        """追加済みの1曲分の特徴量を取り除く"""
+        for name in self.features:
+            value = row.get(name)
+            if value is None or self.count[name] == 0:
+                continue
+            value = float(value)
+            if self.count[name] == 1:
+                self.count[name] = 0
+                self.mean[name] = 0.0
+                self.m2[name] = 0.0
+                continue
+            previous_mean = self.mean[name]
+            self.count[name] -= 1
+            self.mean[name] = (previous_mean * (self.count[name] + 1) - value) / self.count[name]
+            self.m2[name] = max(
+                0.0, self.m2[name] - (value - previous_mean) * (value - self.mean[name])
+            )
+
+    def update(self, rows: Iterable[Dict[str, Any]]):
+        """複数曲分の特徴量を追加"""
+        for row in rows:
+            self.add(row)
+
+    @classmethod
+    def from_matrix(
+        cls, matrix: "FeatureMatrix", features: Optional[List[str]] = None
+    ) -> "FeatureAccumulator":
+        """
+        FeatureMatrixの全曲を集計したアキュムレータを作成（NaNは数えない）
+
+        Args:
+            matrix: 特徴量行列
+            features: 集計する特徴量（Noneの場合はSTATS_FEATURES）
+        """
+        accumulator = cls(features)
+        values = matrix.to_float64(accumulator.features)
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, values, 0.0).sum(axis=0)
+        means = np.divide(
+            sums, counts, out=np.zeros(len(accumulator.features)), where=counts > 0
+        )
+        m2s = (np.where(valid, values - means, 0.0) ** 2).sum(axis=0)
+        for name, count, mean, m2 in zip(
+            accumulator.features, counts.tolist(), means.tolist(), m2s.tolist()
+        ):
+            accumulator.count[name] = count
+            accumulator.mean[name] = mean
+            accumulator.m2[name] = m2
+        return accumulator
+
+    def merge(self, other: "FeatureAccumulator") -> "FeatureAccumulator":
+        """
+        別のアキュムレータの集計を合成（Chanらの方法、曲を読み直さずに特徴量の数だけの計算で済む）
+
+        同じ曲が両方に含まれる場合は2曲として数える（多重集合の和）。
+        selfにない特徴量はselfに追加する。
+
+        Args:
+            other: 合成するアキュムレータ
+
+        Returns:
+            self
+        """
+        for name in other.features:
+            if name not in self.count:
+                self.features.append(name)
+                self.count[name] = 0
+                self.mean[name] = 0.0
+                self.m2[name] = 0.0
+            count = other.count[name]
+            if count == 0:
+                continue
+            total = self.count[name] + count
+            delta = other.mean[name] - self.mean[name]
+            self.m2[name] += (
+                other.m2[name] + delta * delta * self.count[name] * count / total
+            )
+            self.mean[name] += delta * count / total
+            self.count[name] = total
+        return self
+
+    def subtract(self, other: "FeatureAccumulator") -> "FeatureAccumulator":
+        """
+        合成済みのアキュムレータの集計を取り除く（mergeの逆演算）
+
+        Args:
+            other: 取り除くアキュムレータ（selfに含まれている曲の集計であること）
+
+        Returns:
+            self
+        """
+        for name in other.features:
+            count = other.count[name]
+            if name not in self.count or count == 0 or self.count[name] == 0:
+                continue
+            previous_count = self.count[name]
+            remaining = previous_count - count
+            if remaining <= 0:
+                self.count[name] = 0
+                self.mean[name] = 0.0
+                self.m2[name] = 0.0
+                continue
+            remaining_mean = (
+                self.mean[name] * previous_count - other.mean[name] * count
+            ) / remaining
+            delta = other.mean[name] - remaining_mean
+            self.m2[name] = max(
+                0.0,
+                self.m2[name]
+                - other.m2[name]
+                - delta * delta * remaining * count / previous_count,
+            )
+            self.mean[name] = remaining_mean
+            self.count[name] = remaining
+        return self
+
+    @classmethod
+    def combine(
+        cls, accumulators: Iterable["FeatureAccumulator"]
+    ) -> "FeatureAccumulator":
+        """
+        複数のアキュムレータを合成した新しいアキュムレータ（複数プレイリストやライブラリ全体の集計用）
+
+        Args:
+            accumulators: 合成するアキュムレータ（元のアキュムレータは変更しない）
+        """
+        combined = cls()
+        for accumulator in accumulators:
+            combined.merge(accumulator)
+        return combined
+
+    def add_matrix(self, matrix: "FeatureMatrix"):
+        """FeatureMatrixの全曲をまとめて追加"""
+        self.merge(FeatureAccumulator.from_matrix(matrix, self.features))
+
+    def remove_matrix(self, matrix: "FeatureMatrix"):
+        """追加済みのFeatureMatrixの全曲をまとめて取り除く"""
+        self.subtract(FeatureAccumulator.from_matrix(matrix, self.features))
+
+    @property
+    def total(self) -> int:
+        """集計済みの曲数"""
+        return max(self.count.values(), default=0)
+
+    def averages(self) -> Dict[str, float]:
+        """特徴量ごとの平均"""
+        return {
+            name: self.mean[name] for name in self.features if self.count[name] > 0
+        }
+
+    def std_devs(self) -> Dict[str, float]:
+        """特徴量ごとの標準偏差（pandasのstd()と同じ不偏標準偏差、1曲の場合はNaN）"""
+        return {
+            name: (
+                math.sqrt(self.m2[name] / (self.count[name] - 1))
+                if self.count[name] > 1
+                else float("nan")
+            )
+            for name in self.features
+            if self.count[name] > 0
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """DBに保存できる辞書に変換"""
+        return {
+            name: {
+                "count": self.count[name],
+                "mean": self.mean[name],
+                "m2": self.m2[name],
+            }
+            for name in self.features
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeatureAccumulator":
+        """to_dict()の結果から復元"""
+        accumulator = cls(list(data))
+        for name, values in data.items():
+            accumulator.count[name] = int(values["count"])
+            accumulator.mean[name] = float(values["mean"])
+            accumulator.m2[name] = float(values["m2"])
+        return accumulator
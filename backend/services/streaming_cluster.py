@@ -0,0 +1,285 @@
+"""
+ストリーミングクラスタリング - MiniBatchKMeans.partial_fitでライブラリ全体を分割して学習
+"""
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Union
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from services.data_analyzer import CLUSTER_FEATURES
+
+if TYPE_CHECKING:
+    from services.stats_accumulator import FeatureAccumulator
+
+# partial_fitに渡すチャンクの型（DataFrame、特徴量の辞書のリスト、(行数, 列数)の配列）
+Chunk = Union[pd.DataFrame, List[Dict[str, Any]], np.ndarray]
+
+# fit_streamに渡すチャンクのストリーム（2回読むため、リストなどか、呼び出すたびに新しく作る関数）
+ChunkSource = Union[Iterable[Chunk], Callable[[], Iterable[Chunk]]]
+
+
+def _make_scaler(
+    mean: Iterable[float], var: Iterable[float], n_samples_seen: int
+) -> StandardScaler:
+    """保存済みの平均・分散（母分散）から学習済みのStandardScalerを作成"""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(mean, dtype=float)
+    scaler.var_ = np.asarray(var, dtype=float)
+    scaler.scale_ = np.sqrt(np.where(scaler.var_ > 0, scaler.var_, 1.0))
+    scaler.n_samples_seen_ = n_samples_seen
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
+
+
+class StreamingClusterer:
+    """
+    特徴量のチャンクを順に受け取ってk-meansを学習するクラスタラー
+
+    全曲をメモリに載せずに、ストリームやDBから読み込んだチャンクごとに
+    MiniBatchKMeansの中心を更新する。学習済みの中心の座標系が途中で変わらないよう、
+    標準化はk-meansの学習を始める前に決めて固定する（prepare()で1パス目に求めるか、
+    scaler_from_accumulator()などで保存済みの統計量から作る）。
+    prepare()ではストリーム全体から無作為に抽出した曲で初期の中心も決めるため、
+    曲が並んだ順に偏りがあっても最初のチャンクに引きずられない。
+    to_dict()で保存した状態から再開（ウォームスタート）できる。
+    """
+
+    def __init__(
+        self,
+        n_clusters: int = 5,
+        features: Optional[List[str]] = None,
+        batch_size: int = 1024,
+        random_state: int = 42,
+        init_centers: Optional[np.ndarray] = None,
+        scaler: Optional[StandardScaler] = None,
+    ):
+        """
+        初期化
+
+        Args:
+            n_clusters: クラスタ数
+            features: 使用する特徴量（Noneの場合はCLUSTER_FEATURES）
+            batch_size: MiniBatchKMeansのミニバッチの件数
+            random_state: 乱数のシード
+            init_centers: 前回の学習結果の中心（標準化後の空間、ウォームスタート用）
+            scaler: 学習済みの標準化（Noneの場合はprepare()またはfit_stream()で求める）
+        """
+        self.n_clusters = n_clusters
+        self.features = list(features or CLUSTER_FEATURES)
+        self.random_state = random_state
+        # 初期の中心を決めるために1パス目で抽出する件数（MiniBatchKMeansのinit_sizeの既定値と同じ）
+        self.init_size = max(3 * batch_size, n_clusters)
+        self._warm_start = init_centers is not None
+        self.scaler_ = scaler or StandardScaler()
+        self.kmeans_ = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init=init_centers if init_centers is not None else "k-means++",
+            n_init=1 if init_centers is not None else 3,
+            # 中心が決まっている場合、偏ったチャンクで数が0のクラスタを別の点に付け替えない
+            reassignment_ratio=0.0 if init_centers is not None else 0.01,
+            batch_size=batch_size,
+            random_state=random_state,
+        )
+        self.n_samples_seen_ = 0
+        # 最初のpartial_fitにはクラスタ数以上の行が必要なため、それまで溜めておく行
+        self._pending: List[np.ndarray] = []
+
+    def _to_array(self, chunk: Chunk) -> np.ndarray:
+        """チャンクを(行数, 特徴量数)の配列に変換（NaNは0とする）"""
+        if isinstance(chunk, np.ndarray):
+            X = chunk.astype(float, copy=False)
+        else:
+            if not isinstance(chunk, pd.DataFrame):
+                chunk = pd.DataFrame(chunk, columns=self.features)
+            X = chunk[self.features].to_numpy(dtype=float)
+        return np.nan_to_num(X, nan=0.0)
+
+    @property
+    def scaler_fitted(self) -> bool:
+        """標準化の統計量が決まっているか"""
+        return hasattr(self.scaler_, "mean_")
+
+    @property
+    def pending_samples(self) -> int:
+        """クラスタ数に満たないため、まだ学習していない行数"""
+        return sum(len(X) for X in self._pending)
+
+    @property
+    def needs_prepare(self) -> bool:
+        """k-meansの学習前に1パス目（prepare()）が必要か"""
+        return not self.scaler_fitted or (
+            not self._warm_start and self.n_samples_seen_ == 0 and not self._pending
+        )
+
+    def prepare(self, chunks: Iterable[Chunk]) -> "StreamingClusterer":
+        """
+        k-meansの学習前の1パス目
+
+        標準化が決まっていない場合はチャンク全体から統計量を求めて固定し、
+        ウォームスタートでない場合は無作為に抽出した曲から初期の中心を決める。
+
+        Args:
+            chunks: 特徴量のチャンクのイテラブル
+
+        Returns:
+            self
+        """
+        if self.n_samples_seen_ or self._pending:
+            raise ValueError("prepare() must be called before partial_fit()")
+        fit_scaler = not self.scaler_fitted
+        scaler = StandardScaler() if fit_scaler else self.scaler_
+        rng = np.random.default_rng(self.random_state)
+        # 乱数のキーが小さい順にinit_size件を残す（チャンクの順序によらない無作為抽出）
+        sample = np.empty((0, len(self.features)))
+        keys = np.empty(0)
+        for chunk in chunks:
+            X = self._to_array(chunk)
+            if not len(X):
+                continue
+            if fit_scaler:
+                scaler.partial_fit(X)
+            sample = np.concatenate([sample, X])
+            keys = np.concatenate([keys, rng.random(len(X))])
+            if len(keys) > self.init_size:
+                keep = np.argpartition(keys, self.init_size)[: self.init_size]
+                sample, keys = sample[keep], keys[keep]
+        if not len(sample):
+            raise ValueError("No samples to fit the clusterer")
+        self.scaler_ = scaler
+        if not self._warm_start and len(sample) >= self.n_clusters:
+            centers = KMeans(
+                n_clusters=self.n_clusters, n_init=3, random_state=self.random_state
+            ).fit(scaler.transform(sample)).cluster_centers_
+            self.kmeans_.set_params(init=centers, n_init=1, reassignment_ratio=0.0)
+        return self
+
+    @classmethod
+    def scaler_from_accumulator(
+        cls, accumulator: "FeatureAccumulator", features: Optional[List[str]] = None
+    ) -> StandardScaler:
+        """
+        FeatureAccumulatorの集計から標準化を作成（全曲を読み直さずに済む）
+
+        Args:
+            accumulator: 特徴量ごとの件数・平均・偏差平方和
+            features: 使用する特徴量（Noneの場合はCLUSTER_FEATURES）
+        """
+        features = list(features or CLUSTER_FEATURES)
+        missing = [name for name in features if accumulator.count.get(name, 0) == 0]
+        if missing:
+            raise ValueError(f"No statistics for features: {', '.join(missing)}")
+        return _make_scaler(
+            [accumulator.mean[name] for name in features],
+            [accumulator.m2[name] / accumulator.count[name] for name in features],
+            accumulator.total,
+        )
+
+    def partial_fit(self, chunk: Chunk) -> "StreamingClusterer":
+        """
+        1チャンク分を学習（標準化は固定したまま使う）
+
+        最初の学習にはクラスタ数以上の行が必要なため、それに満たない行は次のチャンクまで溜めておく。
+
+        Args:
+            chunk: 特徴量のチャンク
+
+        Returns:
+            self
+        """
+        if not self.scaler_fitted:
+            raise ValueError("Fit the scaler with prepare() or pass one before partial_fit()")
+        X = self._to_array(chunk)
+        if len(X) == 0:
+            return self
+        if self._pending:
+            X = np.concatenate([*self._pending, X])
+            self._pending = []
+        if self.n_samples_seen_ == 0 and len(X) < self.n_clusters:
+            self._pending.append(X)
+            return self
+        self.kmeans_.partial_fit(self.scaler_.transform(X))
+        self.n_samples_seen_ += len(X)
+        return self
+
+    def fit_stream(self, chunks: ChunkSource) -> "StreamingClusterer":
+        """
+        チャンクのストリームを最後まで学習
+
+        標準化か初期の中心が決まっていない場合は、1パス目（prepare()）でそれらを決めてから
+        2パス目でk-meansを学習する。
+
+        Args:
+            chunks: 特徴量のチャンクのリストなど、または呼び出すたびにチャンクのイテラブルを返す関数
+                （lambda: store.iter_all()など）
+
+        Returns:
+            self
+        """
+        passes = chunks if callable(chunks) else lambda: chunks
+        if self.needs_prepare:
+            if not callable(chunks) and iter(chunks) is chunks:
+                raise ValueError(
+                    "Chunks are read twice to prepare the clusterer; "
+                    "pass a list or a function returning the chunks"
+                )
+            self.prepare(passes())
+        for chunk in passes():
+            self.partial_fit(chunk)
+        if self._pending:
+            raise ValueError(
+                f"At least {self.n_clusters} samples are needed, got {self.pending_samples}"
+            )
+        return self
+
+    @property
+    def cluster_centers_(self) -> np.ndarray:
+        """標準化後の空間でのクラスタの中心"""
+        return self.kmeans_.cluster_centers_
+
+    def predict(self, chunk: Chunk) -> np.ndarray:
+        """チャンクの各曲のクラスタラベルを返す"""
+        return self.kmeans_.predict(self.scaler_.transform(self._to_array(chunk)))
+
+    def inertia(self, chunks: Iterable[Chunk]) -> float:
+        """チャンク全体について、最も近い中心までの二乗距離の合計を返す"""
+        total = 0.0
+        for chunk in chunks:
+            X = self.scaler_.transform(self._to_array(chunk))
+            total += float(-self.kmeans_.score(X)) if len(X) else 0.0
+        return total
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ウォームスタート用にDBなどへ保存できる辞書に変換"""
+        return {
+            "n_clusters": self.n_clusters,
+            "features": self.features,
+            "centers": self.cluster_centers_.tolist(),
+            "scaler_mean": self.scaler_.mean_.tolist(),
+            "scaler_var": self.scaler_.var_.tolist(),
+            "scaler_n_samples_seen": int(self.scaler_.n_samples_seen_),
+            "n_samples_seen": self.n_samples_seen_,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **kwargs) -> "StreamingClusterer":
+        """
+        to_dict()の結果から、前回の中心と標準化を引き継いだクラスタラーを生成
+
+        Args:
+            data: to_dict()の結果
+            **kwargs: batch_sizeなど__init__に渡す追加の引数
+        """
+        scaler = _make_scaler(
+            data["scaler_mean"], data["scaler_var"], data["scaler_n_samples_seen"]
+        )
+        clusterer = cls(
+            n_clusters=data["n_clusters"],
+            features=data["features"],
+            init_centers=np.asarray(data["centers"]),
+            scaler=scaler,
+            **kwargs,
+        )
+        clusterer.n_samples_seen_ = data.get("n_samples_seen", 0)
+        return clusterer
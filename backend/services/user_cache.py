@@ -0,0 +1,106 @@
+"""
+ユーザーIDキャッシュ - アクセストークンごとに/meの結果（ユーザーID）を共有
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from core.config import USER_ID_CACHE_SIZE, USER_ID_CACHE_TTL
+from services.cache import create_cache
+from services.singleflight import SingleFlight
+
+
+class UserIdCache:
+    """
+    トークンのハッシュ（token_fingerprint()）をキーとしたユーザーIDのキャッシュ
+
+    トークンのユーザーは変わらないため、リクエストのたびに/meを呼ばずに済む。
+    有効期限はUSER_ID_CACHE_TTL（アクセストークンと同じ1時間）とトークンの残りの有効期間の
+    短い方で、トークン自体は保持しない。/meで確認した時刻も保持し、DBやキャッシュだけから
+    返すリクエストでは確認から時間が経っていれば/meで確認し直す（失効したトークンを通さない）。
+    バックエンドはプロセス内（TTLCache）またはRedis（RedisCache）。
+    """
+
+    def __init__(self, backend: Optional[Any] = None):
+        """
+        初期化
+
+        Args:
+            backend: キャッシュのバックエンド（Noneの場合は設定に応じて生成）
+        """
+        self.backend = backend or create_cache(
+            "user_ids", max_size=USER_ID_CACHE_SIZE, ttl=USER_ID_CACHE_TTL
+        )
+        # 同じトークンで同時にミスした場合は/meを1回だけ呼ぶ
+        self.singleflight = SingleFlight()
+
+    async def get(self, token_key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        キャッシュ済みのユーザーID
+
+        Args:
+            token_key: アクセストークンのハッシュ
+            max_age: 指定した場合は/meでの確認からこの秒数以内のものだけを返す
+
+        Returns:
+            ユーザーID（ない場合はNone）
+        """
+        entry = (await self.backend.aget_many([token_key])).get(token_key)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry["verified_at"] > max_age:
+            return None
+        return entry["user_id"]
+
+    async def get_or_fetch(
+        self,
+        token_key: str,
+        fetcher: Callable[[], Awaitable[str]],
+        expires_at: Optional[float] = None,
+        max_age: Optional[float] = None,
+    ) -> str:
+        """
+        リードスルーでユーザーIDを取得（キャッシュにない場合はfetcherで取得して保存）
+
+        Args:
+            token_key: アクセストークンのハッシュ
+            fetcher: /meでユーザーIDを返すコルーチン関数（失敗した場合は保存しない）
+            expires_at: トークンの有効期限（UNIX時刻、分かる場合）。過ぎている場合はキャッシュを使わない
+            max_age: 指定した場合は/meでの確認からこの秒数を過ぎたものを確認し直す
+
+        Returns:
+            ユーザーID
+        """
+        expired = expires_at is not None and expires_at <= time.time()
+        user_id = None if expired else await self.get(token_key, max_age=max_age)
+        if user_id is not None:
+            return user_id
+
+        async def fetch_and_store() -> str:
+            user_id = await fetcher()
+            now = time.time()
+            ttl = USER_ID_CACHE_TTL
+            if expires_at is not None:
+                ttl = min(ttl, expires_at - now)
+            if ttl > 0:
+                await self.backend.aset_many(
+                    {token_key: {"user_id": user_id, "verified_at": now}}, ttl=ttl
+                )
+            return user_id
+
+        return await self.singleflight.do(token_key, fetch_and_store)
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・保持件数を返す"""
+        return self.backend.stats()
+
+
+_user_id_cache: Optional[UserIdCache] = None
+
+
+def get_user_id_cache() -> UserIdCache:
+    """プロセス共通のUserIdCacheを取得"""
+    global _user_id_cache
+    if _user_id_cache is None:
+        _user_id_cache = UserIdCache()
+    return _user_id_cache
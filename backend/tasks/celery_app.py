@@ -4,6 +4,7 @@ Celery設定 - 定期更新ジョブ
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 import os
 from dotenv import load_dotenv
 
@@ -12,10 +13,17 @@ load_dotenv()
 # RedisのURL（デフォルトはローカル）
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+# ブローカーと結果バックエンド（外部サービスなしで動かす場合は memory:// と cache+memory://）
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+
+# タスクをワーカーに送らず呼び出し元のプロセスで実行する（負荷試験・テスト用）
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() in ("1", "true", "yes")
+
 celery_app = Celery(
     "spotify_analytics",
-    broker=REDIS_URL,
-    backend=REDIS_URL,
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND,
 )
 
 celery_app.conf.update(
@@ -24,6 +32,8 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_always_eager=CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=CELERY_TASK_ALWAYS_EAGER,
 )
 
 # 1日1回実行（毎日午前3時）
@@ -36,3 +46,11 @@ celery_app.conf.beat_schedule = {
 
 celery_app.conf.timezone = "UTC"
 
+
+@worker_process_init.connect
+def init_worker_db(**kwargs):
+    """ワーカープロセスの起動時にデータベースを初期化（APIと同じくimport時には行わない）"""
+    from core.database import init_db
+
+    init_db()
+
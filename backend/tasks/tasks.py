@@ -4,14 +4,14 @@ Celeryタスク - Spotifyデータの定期更新
 
 from tasks.celery_app import celery_app
 from services.spotify_client import SpotifyService
+from services.spotify_http import close_http_client
 from services.data_analyzer import DataAnalyzer
 from services.db_service import save_analysis
 from core.database import SessionLocal
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+import asyncio
 import os
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 load_dotenv()
 
@@ -50,6 +50,24 @@ def update_spotify_data():
         raise
 
 
+async def _fetch_user_top_tracks(
+    access_token: str, time_range: str
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """ジャンル付き・特徴量付きの上位トラックを並行して取得"""
+    service = SpotifyService(access_token)
+    try:
+        return await asyncio.gather(
+            service.get_top_tracks_with_genres(limit=50, time_range=time_range),
+            service.get_user_top_tracks_with_features(
+                limit=50, time_range=time_range
+            ),
+        )
+    finally:
+        # asyncio.runのイベントループとともに共有コネクションプールを閉じる
+        await close_http_client()
+
+
+@celery_app.task(name="tasks.tasks.update_user_analytics")
 def update_user_analytics(
     user_id: str,
     access_token: str,
@@ -65,21 +83,17 @@ def update_user_analytics(
     """
     db = SessionLocal()
     try:
-        service = SpotifyService(access_token)
-        
-        # ジャンル分布を取得して保存
-        tracks_with_genres = service.get_top_tracks_with_genres(
-            limit=50, time_range=time_range
+        tracks_with_genres, tracks_with_features = asyncio.run(
+            _fetch_user_top_tracks(access_token, time_range)
         )
+        
+        # ジャンル分布を保存
         genre_result = DataAnalyzer.genre_distribution(tracks_with_genres)
         save_analysis(
             db, user_id, "genre", time_range, {"distribution": genre_result}
         )
         
-        # ムードマップを取得して保存
-        tracks_with_features = service.get_user_top_tracks_with_features(
-            limit=50, time_range=time_range
-        )
+        # ムードマップを保存
         mood_result = DataAnalyzer.mood_map(tracks_with_features)
         save_analysis(
             db, user_id, "mood", time_range, {"mood_map": mood_result}
@@ -90,6 +104,12 @@ def update_user_analytics(
         save_analysis(
             db, user_id, "tempo", time_range, tempo_result
         )
+
+        # 特徴量の分位点をスケッチとともに保存
+        percentiles_result = DataAnalyzer.feature_percentiles(tracks_with_features)
+        save_analysis(
+            db, user_id, "percentiles", time_range, percentiles_result
+        )
         
         db.commit()
         print(f"Updated analytics for user {user_id}")
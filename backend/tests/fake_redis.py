@@ -0,0 +1,123 @@
+"""
+テスト用のRedisスタンドイン
+RedisCacheが使うコマンドだけをプロセス内で実装
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+from services.cache import REDIS_EVICT_SCRIPT
+
+
+class FakeRedis:
+    """redis.Redisの一部コマンドを模したインメモリ実装"""
+
+    def __init__(self):
+        self._values: Dict[str, bytes] = {}
+        self._expires: Dict[str, float] = {}
+        self._zsets: Dict[str, Dict[str, float]] = {}
+
+    def _alive(self, name: str) -> bool:
+        expires_at = self._expires.get(name)
+        if expires_at is not None and expires_at <= time.time():
+            self._values.pop(name, None)
+            self._expires.pop(name, None)
+        return name in self._values
+
+    def get(self, name: str) -> Optional[bytes]:
+        return self._values.get(name) if self._alive(name) else None
+
+    def mget(self, names: List[str]) -> List[Optional[bytes]]:
+        return [self.get(name) for name in names]
+
+    def set(self, name: str, value: Any, ex: Optional[int] = None) -> bool:
+        self._values[name] = value.encode() if isinstance(value, str) else value
+        if ex is not None:
+            self._expires[name] = time.time() + ex
+        else:
+            self._expires.pop(name, None)
+        return True
+
+    def delete(self, *names: Any) -> int:
+        deleted = 0
+        for name in names:
+            name = name.decode() if isinstance(name, bytes) else name
+            if self._values.pop(name, None) is not None:
+                deleted += 1
+            self._expires.pop(name, None)
+            if self._zsets.pop(name, None) is not None:
+                deleted += 1
+        return deleted
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        zset = self._zsets.setdefault(name, {})
+        added = len([member for member in mapping if member not in zset])
+        zset.update(mapping)
+        return added
+
+    def zcard(self, name: str) -> int:
+        return len(self._zsets.get(name, {}))
+
+    def zrange(self, name: str, start: int, end: int) -> List[bytes]:
+        members = sorted(self._zsets.get(name, {}).items(), key=lambda x: x[1])
+        end = len(members) if end == -1 else end + 1
+        return [member.encode() for member, _ in members[start:end]]
+
+    def zrangebyscore(self, name: str, min_score: float, max_score: float) -> List[bytes]:
+        members = sorted(self._zsets.get(name, {}).items(), key=lambda x: x[1])
+        return [member.encode() for member, score in members if min_score <= score <= max_score]
+
+    def zrem(self, name: str, *members: Any) -> int:
+        zset = self._zsets.get(name, {})
+        removed = 0
+        for member in members:
+            member = member.decode() if isinstance(member, bytes) else member
+            if zset.pop(member, None) is not None:
+                removed += 1
+        return removed
+
+    def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> int:
+        # Luaは実行できないため、RedisCacheの削除スクリプトだけを同じ手順で再現する
+        if script != REDIS_EVICT_SCRIPT:
+            raise NotImplementedError("FakeRedis only supports REDIS_EVICT_SCRIPT")
+        index_key, expiry_key = keys_and_args[:numkeys]
+        max_size, now = int(keys_and_args[numkeys]), float(keys_and_args[numkeys + 1])
+
+        def remove(members: List[bytes]) -> int:
+            if members:
+                self.delete(*members)
+                self.zrem(index_key, *members)
+                self.zrem(expiry_key, *members)
+            return len(members)
+
+        removed = remove(self.zrangebyscore(expiry_key, float("-inf"), now))
+        excess = self.zcard(index_key) - max_size
+        if excess > 0:
+            removed += remove(self.zrange(index_key, 0, excess - 1))
+        return removed
+
+    def pipeline(self) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """コマンドを溜めてexecute()でまとめて実行するパイプライン"""
+
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self) -> List[Any]:
+        results = [
+            getattr(self._client, name)(*args, **kwargs)
+            for name, args, kwargs in self._commands
+        ]
+        self._commands = []
+        return results
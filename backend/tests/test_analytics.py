@@ -3,25 +3,41 @@
 pytest + HTTPX使用
 """
 
+import asyncio
 import pytest
-from httpx import AsyncClient
+import time
+from httpx import AsyncClient, ASGITransport
 import sys
 from pathlib import Path
 
 # backendディレクトリをパスに追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from api.main import app
+from api.main import app, get_spotify_service
+from services.analytics_cache import AnalyticsCache
+from services.cache import RedisCache, TTLCache
+from services.spotify_http import SpotifyAPIError
+from services.user_cache import UserIdCache
+from tests.fake_redis import FakeRedis
 from unittest.mock import Mock, patch
 
 
 @pytest.fixture
 async def client():
     """テスト用のクライアント"""
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
 
+@pytest.fixture(autouse=True)
+def analytics_cache():
+    """テストごとに空の分析結果キャッシュ・ユーザーIDキャッシュを使う"""
+    cache = AnalyticsCache(TTLCache())
+    with patch("api.main.get_analytics_cache", return_value=cache), \
+         patch("api.main.get_user_id_cache", return_value=UserIdCache(TTLCache())):
+        yield cache
+
+
 @pytest.fixture
 def mock_spotify_service():
     """SpotifyServiceのモック"""
@@ -74,6 +90,8 @@ def mock_spotify_service():
     mock_service.get_user_top_tracks_with_features = get_user_top_tracks_with_features
     mock_service.client = Mock()
     mock_service.client.current_user.return_value = {"id": "test_user_id"}
+    mock_service.client.token_key = "test_token_key"
+    mock_service.client.token_expires_at = None
     
     return mock_service
 
@@ -81,12 +99,12 @@ def mock_spotify_service():
 @pytest.mark.asyncio
 async def test_genre_distribution(client: AsyncClient, mock_spotify_service):
     """ジャンル分布APIのテスト"""
-        from core.database import SessionLocal
+    from core.database import SessionLocal
     
     async def mock_get_current_user_id(*args, **kwargs):
         return "test_user_id"
     
-    with patch("api.main.get_spotify_service", return_value=mock_spotify_service), \
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}), \
          patch("api.main.get_current_user_id", side_effect=mock_get_current_user_id), \
          patch("core.database.get_db") as mock_get_db:
         mock_db = SessionLocal()
@@ -113,12 +131,12 @@ async def test_genre_distribution(client: AsyncClient, mock_spotify_service):
 @pytest.mark.asyncio
 async def test_mood_map(client: AsyncClient, mock_spotify_service):
     """ムードマップAPIのテスト"""
-        from core.database import SessionLocal
+    from core.database import SessionLocal
     
     async def mock_get_current_user_id(*args, **kwargs):
         return "test_user_id"
     
-    with patch("api.main.get_spotify_service", return_value=mock_spotify_service), \
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}), \
          patch("api.main.get_current_user_id", side_effect=mock_get_current_user_id), \
          patch("core.database.get_db") as mock_get_db:
         mock_db = SessionLocal()
@@ -146,12 +164,12 @@ async def test_mood_map(client: AsyncClient, mock_spotify_service):
 @pytest.mark.asyncio
 async def test_tempo_trends(client: AsyncClient, mock_spotify_service):
     """テンポトレンドAPIのテスト"""
-        from core.database import SessionLocal
+    from core.database import SessionLocal
     
     async def mock_get_current_user_id(*args, **kwargs):
         return "test_user_id"
     
-    with patch("api.main.get_spotify_service", return_value=mock_spotify_service), \
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}), \
          patch("api.main.get_current_user_id", side_effect=mock_get_current_user_id), \
          patch("core.database.get_db") as mock_get_db:
         mock_db = SessionLocal()
@@ -179,7 +197,7 @@ async def test_tempo_trends(client: AsyncClient, mock_spotify_service):
 @pytest.mark.asyncio
 async def test_debug_raw_top_tracks(client: AsyncClient, mock_spotify_service):
     """デバッグエンドポイントのテスト"""
-    with patch("api.main.get_spotify_service", return_value=mock_spotify_service):
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}):
         response = await client.get(
             "/debug/raw-top-tracks?limit=20&time_range=medium_term",
             headers={"Authorization": "Bearer test_token"},
@@ -191,3 +209,190 @@ async def test_debug_raw_top_tracks(client: AsyncClient, mock_spotify_service):
     assert "tracks" in data
     assert isinstance(data["tracks"], list)
 
+
+
+@pytest.mark.asyncio
+async def test_feature_percentiles_combined(client: AsyncClient, mock_spotify_service):
+    """分位点APIで保存したスケッチを、期間をまたいで合成できる"""
+    from core.database import get_db
+    from tests.test_spotify_client import make_session_factory
+
+    session_factory = make_session_factory()
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def mock_get_current_user_id(*args, **kwargs):
+        return "test_user_id"
+
+    overrides = {get_spotify_service: lambda: mock_spotify_service, get_db: override_get_db}
+    with patch.dict(app.dependency_overrides, overrides), \
+         patch("api.main.get_current_user_id", side_effect=mock_get_current_user_id):
+        missing = await client.get(
+            "/analytics/feature-percentiles/combined",
+            headers={"Authorization": "Bearer test_token"},
+        )
+        for time_range in ("short_term", "long_term"):
+            response = await client.get(
+                f"/analytics/feature-percentiles?time_range={time_range}",
+                headers={"Authorization": "Bearer test_token"},
+            )
+            assert response.status_code == 200
+        combined = await client.get(
+            "/analytics/feature-percentiles/combined?time_ranges=short_term&time_ranges=long_term",
+            headers={"Authorization": "Bearer test_token"},
+        )
+
+    assert missing.status_code == 404
+    data = response.json()
+    assert data["track_count"] == 2
+    assert data["percentiles"]["tempo"]["p10"] == 120.0
+    assert data["percentiles"]["tempo"]["p90"] == 130.0
+    assert "sketches" not in data
+    assert combined.status_code == 200
+    assert combined.json()["track_count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_analytics_response_cache(client: AsyncClient, mock_spotify_service):
+    """同じユーザー・条件の2回目はキャッシュから返し、refreshで分析し直す"""
+    calls = []
+    fetch = mock_spotify_service.get_user_top_tracks_with_features
+
+    async def get_user_top_tracks_with_features(limit=50, time_range="medium_term"):
+        calls.append((limit, time_range))
+        return await fetch(limit=limit, time_range=time_range)
+
+    mock_spotify_service.get_user_top_tracks_with_features = get_user_top_tracks_with_features
+    me_calls = []
+
+    async def get_current_user():
+        me_calls.append(1)
+        return {"id": "test_user_id"}
+
+    mock_spotify_service.get_current_user = get_current_user
+
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}):
+        responses = [
+            await client.get(
+                f"/analytics/tempo-trends?save=false&{query}",
+                headers={"Authorization": "Bearer test_token"},
+            )
+            for query in ("limit=50", "limit=50", "limit=20", "limit=50&refresh=true", "limit=50")
+        ]
+
+    assert [r.headers["X-Cache"] for r in responses] == ["MISS", "HIT", "MISS", "MISS", "HIT"]
+    assert calls == [(50, "medium_term"), (20, "medium_term"), (50, "medium_term")]
+    assert responses[1].json() == responses[0].json()
+    # /meはトークンごとに1回だけ
+    assert len(me_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_user_lookup_runs_concurrently_with_analysis(client: AsyncClient, mock_spotify_service):
+    """ユーザーIDが未キャッシュの場合、/meとデータ取得が並行して進む"""
+    fetch_started = asyncio.Event()
+    fetch = mock_spotify_service.get_user_top_tracks_with_features
+
+    async def get_user_top_tracks_with_features(limit=50, time_range="medium_term"):
+        fetch_started.set()
+        return await fetch(limit=limit, time_range=time_range)
+
+    async def get_current_user():
+        # データ取得が始まるまで/meの応答を返さない（順に実行すると待ち続ける）
+        await asyncio.wait_for(fetch_started.wait(), timeout=5)
+        return {"id": "test_user_id"}
+
+    mock_spotify_service.get_user_top_tracks_with_features = get_user_top_tracks_with_features
+    mock_spotify_service.get_current_user = get_current_user
+
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}):
+        response = await client.get(
+            "/analytics/mood-map?save=false",
+            headers={"Authorization": "Bearer test_token"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "MISS"
+    assert len(response.json()) == 2
+
+
+@pytest.mark.asyncio
+async def test_analytics_cache_shared_through_redis():
+    """Redisバックエンドでは、別のワーカー（別のインスタンス）の結果にヒットする"""
+    redis = FakeRedis()
+    workers = [AnalyticsCache(RedisCache(redis, "analytics")) for _ in range(2)]
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"mean_tempo": 120.0}
+
+    first = await workers[0].get_or_compute("user1", "tempo", 50, "short_term", compute)
+    second = await workers[1].get_or_compute("user1", "tempo", 50, "short_term", compute)
+    other_user = await workers[1].get_or_compute("user2", "tempo", 50, "short_term", compute)
+    unknown = await workers[1].get_or_compute("unknown", "tempo", 50, "short_term", compute)
+    unknown_again = await workers[1].get_or_compute("unknown", "tempo", 50, "short_term", compute)
+
+    assert first == ({"mean_tempo": 120.0}, False)
+    assert second == ({"mean_tempo": 120.0}, True)
+    assert other_user[1] is False
+    # ユーザーが特定できない場合はキャッシュしない
+    assert unknown[1] is False and unknown_again[1] is False
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_user_id_cache_is_bounded_by_token_expiry():
+    """ユーザーIDのキャッシュはトークンの有効期限を過ぎず、確認から時間が経てば/meで確認し直す"""
+    cache = UserIdCache(TTLCache())
+    calls = []
+
+    async def fetch_user_id():
+        calls.append(1)
+        return "user1"
+
+    now = time.time()
+    assert await cache.get_or_fetch("soon", fetch_user_id, expires_at=now + 0.2) == "user1"
+    assert await cache.get_or_fetch("soon", fetch_user_id) == "user1"
+    await asyncio.sleep(0.3)
+    assert await cache.get("soon") is None
+
+    # 期限切れのトークンはキャッシュを使わず、保存もしない
+    await cache.get_or_fetch("expired", fetch_user_id, expires_at=now - 1)
+    assert await cache.get("expired") is None
+
+    await cache.get_or_fetch("stale", fetch_user_id)
+    assert await cache.get_or_fetch("stale", fetch_user_id, max_age=60) == "user1"
+    await asyncio.sleep(0.01)
+    await cache.get_or_fetch("stale", fetch_user_id, max_age=0)
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_history_rechecks_revoked_token(client: AsyncClient, mock_spotify_service):
+    """ユーザーIDがキャッシュ済みでも、DBだけから返す/historyは失効したトークンを通さない"""
+    revoked = False
+
+    async def get_current_user():
+        if revoked:
+            raise SpotifyAPIError(401, "The access token expired")
+        return {"id": "test_user_id"}
+
+    mock_spotify_service.get_current_user = get_current_user
+    headers = {"Authorization": "Bearer test_token"}
+
+    with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: mock_spotify_service}), \
+         patch("api.main.get_user_analysis_history", return_value=[]), \
+         patch("api.main.USER_ID_VERIFY_INTERVAL", 0):
+        first = await client.get("/history", headers=headers)
+        revoked = True
+        await asyncio.sleep(0.01)
+        second = await client.get("/history", headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 401
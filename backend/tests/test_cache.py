@@ -0,0 +1,122 @@
+"""
+キャッシュのテスト
+プロセス内バックエンドとRedisバックエンド（FakeRedis）を使用
+"""
+
+import pytest
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.artist_cache import ArtistGenreCache
+from services.cache import LRUCache, RedisCache, TTLCache
+from tests.fake_redis import FakeRedis
+
+
+def make_backends(max_size: int = 3, ttl: float = 60.0):
+    """同じ設定のプロセス内バックエンドとRedisバックエンドを生成"""
+    return [
+        TTLCache(max_size=max_size, ttl=ttl),
+        RedisCache(FakeRedis(), "test", max_size=max_size, ttl=ttl),
+    ]
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """最も古く使われた値から削除されること"""
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+@pytest.mark.parametrize("backend", make_backends(), ids=["memory", "redis"])
+def test_backend_lru_eviction_and_counters(backend):
+    """件数上限を超えた場合にLRUで削除され、ヒット・ミスが数えられること"""
+    backend.set_many({"a": ["pop"], "b": ["rock"], "c": []})
+    time.sleep(0.01)
+    assert backend.get("a") == ["pop"]
+    time.sleep(0.01)
+    backend.set("d", ["jazz"])
+
+    assert backend.get_many(["a", "b", "c", "d"]) == {
+        "a": ["pop"],
+        "c": [],
+        "d": ["jazz"],
+    }
+    assert backend.stats() == {"hits": 4, "misses": 1, "size": 3}
+
+
+def test_redis_write_and_eviction_use_one_round_trip():
+    """保存と件数上限を超えた分の削除が1回のパイプラインで行われること"""
+    client = Mock(wraps=FakeRedis())
+    backend = RedisCache(client, "test", max_size=2)
+    backend.set_many({"a": 1, "b": 2})
+    client.reset_mock()
+
+    backend.set_many({"c": 3, "d": 4})
+
+    assert [name for name, _, _ in client.method_calls] == ["pipeline"]
+    assert backend.get_many(["a", "b", "c", "d"]) == {"c": 3, "d": 4}
+    assert backend.stats()["size"] == 2
+
+
+def test_redis_index_drops_expired_keys():
+    """有効期限で消えたキーは索引から除かれ、件数に数えず、上限による削除の対象にもならないこと"""
+    client = FakeRedis()
+    backend = RedisCache(client, "test", max_size=2, ttl=60)
+    backend.set("a", 1, ttl=1)
+    backend.set("b", 2)
+    assert backend.stats()["size"] == 2
+
+    time.sleep(1.1)
+
+    assert backend.stats()["size"] == 1
+    backend.set("c", 3)
+    assert backend.get_many(["a", "b", "c"]) == {"b": 2, "c": 3}
+    assert client.zrange("test:__lru__", 0, -1) == [b"test:b", b"test:c"]
+    assert client.zcard("test:__expiry__") == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", make_backends(), ids=["memory", "redis"])
+async def test_backend_coroutines_match_sync_methods(backend):
+    """aget_many()/aset_many()が同期版と同じ結果を返すこと"""
+    await backend.aset_many({"a": ["pop"], "b": []})
+    assert await backend.aget_many(["a", "b", "x"]) == backend.get_many(["a", "b", "x"])
+    assert await backend.aget_many(["a"]) == {"a": ["pop"]}
+
+
+@pytest.mark.parametrize("backend", make_backends(ttl=1), ids=["memory", "redis"])
+def test_backend_expires_entries(backend):
+    """有効期限を過ぎた値は取得できないこと"""
+    backend.set("a", ["pop"])
+    assert backend.get("a") == ["pop"]
+
+    time.sleep(1.1)
+
+    assert backend.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_artist_genre_cache_fetches_only_misses():
+    """キャッシュにないアーティストだけが取得されること"""
+    cache = ArtistGenreCache(RedisCache(FakeRedis(), "artist_genres"))
+    requested = []
+
+    async def fetcher(artist_ids):
+        requested.append(artist_ids)
+        return {artist_id: [f"genre-{artist_id}"] for artist_id in artist_ids}
+
+    await cache.get_or_fetch(["a1", "a2"], fetcher)
+    genres = await cache.get_or_fetch(["a2", "a3", "a2"], fetcher)
+
+    assert genres == {"a2": ["genre-a2"], "a3": ["genre-a3"]}
+    assert requested == [["a1", "a2"], ["a3"]]
+    assert cache.stats()["hits"] == 1
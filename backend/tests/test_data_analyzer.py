@@ -0,0 +1,343 @@
+"""
+DataAnalyzerのテスト
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+import sys
+from unittest.mock import patch
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.data_analyzer import DataAnalyzer, grouped_statistics
+
+CLUSTER_FEATURES = ["danceability", "energy", "valence", "acousticness", "instrumentalness"]
+
+
+def make_features_df(n: int = 500, seed: int = 0) -> pd.DataFrame:
+    """テスト用のオーディオ特徴量のDataFrame"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.random(n) for col in CLUSTER_FEATURES})
+    df["tempo"] = rng.uniform(60, 200, n)
+    df["track_id"] = [f"track{i}" for i in range(n)]
+    return df
+
+
+def test_representative_tracks_are_closest_to_kmeans_centers():
+    """代表曲が標準化後の空間でk-meansの中心に最も近い曲になること"""
+    analyzer = DataAnalyzer(make_features_df())
+    clustered = analyzer.cluster_tracks(n_clusters=4)
+
+    representatives = analyzer.get_representative_tracks(clustered, n_tracks=3)
+
+    X_scaled = analyzer.scaler_.transform(clustered[CLUSTER_FEATURES].to_numpy())
+    assert list(representatives) == [int(c) for c in clustered["cluster"].unique()]
+    for cluster_id, track_ids in representatives.items():
+        rows = np.flatnonzero(clustered["cluster"].to_numpy() == cluster_id)
+        distances = np.linalg.norm(
+            X_scaled[rows] - analyzer.kmeans_.cluster_centers_[cluster_id], axis=1
+        )
+        expected = clustered["track_id"].to_numpy()[rows[np.argsort(distances)[:3]]]
+        assert track_ids == expected.tolist()
+
+
+def test_representative_tracks_without_fitted_model():
+    """学習済みモデルがなくてもクラスタ列から代表曲を選べること"""
+    df = make_features_df(n=50)
+    fitted = DataAnalyzer(df)
+    clustered = fitted.cluster_tracks(n_clusters=3)
+
+    representatives = DataAnalyzer(df).get_representative_tracks(clustered, n_tracks=100)
+
+    # クラスタの曲数より多く要求した場合はクラスタの全曲を返す
+    assert sorted(len(ids) for ids in representatives.values()) == sorted(
+        clustered["cluster"].value_counts().tolist()
+    )
+    assert representatives == fitted.get_representative_tracks(clustered, n_tracks=100)
+
+
+def test_grouped_statistics_matches_pandas():
+    """グループごとの統計量がpandasのgroupbyと一致すること（NaNは除外）"""
+    df = make_features_df(n=300)
+    df.loc[::7, "energy"] = np.nan
+    labels = np.random.default_rng(1).integers(0, 5, len(df))
+    df.loc[labels == 4, "valence"] = np.nan
+
+    result = grouped_statistics(df[CLUSTER_FEATURES].to_numpy(), labels)
+    expected = df[CLUSTER_FEATURES].groupby(labels).agg(["count", "mean", "std", "min", "max"])
+
+    for name in ("count", "mean", "std", "min", "max"):
+        np.testing.assert_allclose(
+            result[name], expected.xs(name, axis=1, level=1).to_numpy(dtype=float)
+        )
+
+
+def test_statistics_and_characteristics_match_pandas():
+    """calculate_statisticsとget_cluster_characteristicsがpandasの計算と一致し、元のDataFrameを変えないこと"""
+    df = make_features_df()
+    columns = list(df.columns)
+    analyzer = DataAnalyzer(df)
+
+    stats = analyzer.calculate_statistics()
+    for col in CLUSTER_FEATURES + ["tempo"]:
+        assert stats[f"{col}_mean"] == pytest.approx(df[col].mean())
+        assert stats[f"{col}_std"] == pytest.approx(df[col].std())
+        assert stats[f"{col}_min"] == df[col].min()
+        assert stats[f"{col}_max"] == df[col].max()
+
+    clustered = analyzer.cluster_tracks(n_clusters=3)
+    characteristics = analyzer.get_cluster_characteristics(clustered)
+    expected = clustered.groupby("cluster", sort=False)[CLUSTER_FEATURES].mean()
+    assert list(characteristics) == expected.index.tolist()
+    for cluster_id, means in characteristics.items():
+        assert means == pytest.approx(expected.loc[cluster_id].to_dict())
+
+    assert list(df.columns) == columns
+
+
+def make_blobs_df(n_per_cluster: int = 300, seed: int = 0) -> pd.DataFrame:
+    """はっきり分かれた4つの塊からなる特徴量のDataFrame"""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((4, len(CLUSTER_FEATURES)))
+    X = np.repeat(centers, n_per_cluster, axis=0) + rng.normal(
+        0, 0.01, (4 * n_per_cluster, len(CLUSTER_FEATURES))
+    )
+    df = pd.DataFrame(X, columns=CLUSTER_FEATURES)
+    df["track_id"] = [f"track{i:05d}" for i in range(len(df))]
+    df["blob"] = np.repeat(np.arange(4), n_per_cluster)
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def test_streaming_clusterer_recovers_blobs_from_feature_store_chunks():
+    """FeatureStoreから分割して読み込んだ特徴量で、全件のk-meansと同じ分割になること"""
+    from services.streaming_cluster import StreamingClusterer
+    from tests.test_spotify_client import make_feature_store
+
+    df = make_blobs_df()
+    store = make_feature_store()
+    store.put_many(
+        {"id": row["track_id"], **{f: row[f] for f in CLUSTER_FEATURES}}
+        for row in df.to_dict("records")
+    )
+    chunks = list(store.iter_all(chunk_size=250))
+    assert [len(c) for c in chunks] == [250, 250, 250, 250, 200]
+
+    clusterer = StreamingClusterer(n_clusters=4, features=CLUSTER_FEATURES, batch_size=200)
+    clusterer.fit_stream(chunks)
+    assert clusterer.n_samples_seen_ == len(df)
+
+    # 塊とクラスタが1対1に対応する
+    labels = clusterer.predict(df)
+    pairs = set(zip(df["blob"], labels))
+    assert len(pairs) == 4 and len({label for _, label in pairs}) == 4
+
+    full = DataAnalyzer(df).cluster_tracks(n_clusters=4, features=CLUSTER_FEATURES)
+    assert pd.crosstab(full["cluster"], labels).gt(0).sum().eq(1).all()
+
+
+def test_streaming_clusterer_warm_start_keeps_centers_and_scaler():
+    """保存した状態から再開すると、同じ中心・標準化から学習を続けること"""
+    from services.streaming_cluster import StreamingClusterer
+
+    df = make_blobs_df()
+    clusterer = StreamingClusterer(n_clusters=4, features=CLUSTER_FEATURES)
+    clusterer.fit_stream([df.iloc[:600], df.iloc[600:]])
+    state = clusterer.to_dict()
+
+    resumed = StreamingClusterer.from_dict(state)
+    X = df[CLUSTER_FEATURES].to_numpy()
+    np.testing.assert_allclose(resumed.scaler_.transform(X), clusterer.scaler_.transform(X))
+    resumed.partial_fit(df.iloc[:300])
+
+    # 同じ分布の追加データでは中心はほとんど動かず、ラベルも保たれる
+    np.testing.assert_allclose(resumed.cluster_centers_, clusterer.cluster_centers_, atol=0.05)
+    np.testing.assert_array_equal(resumed.predict(df), clusterer.predict(df))
+    assert resumed.n_samples_seen_ == len(df) + 300
+
+    # DataAnalyzerでも前回の中心からMiniBatchKMeansで学習できる
+    analyzer = DataAnalyzer(df)
+    clustered = analyzer.cluster_tracks(
+        n_clusters=4,
+        features=CLUSTER_FEATURES,
+        method="minibatch",
+        init_centers=np.asarray(state["centers"]),
+    )
+    assert clustered["cluster"].nunique() == 4
+    with pytest.raises(ValueError):
+        analyzer.cluster_tracks(method="dbscan")
+
+
+def test_streaming_clusterer_freezes_scaler_on_unshuffled_stream():
+    """塊ごとに並んだストリームでも、固定した標準化で全件のk-meansと同じ分割になること"""
+    from services.stats_accumulator import FeatureAccumulator
+    from services.streaming_cluster import StreamingClusterer
+
+    df = make_blobs_df().sort_values("blob").reset_index(drop=True)
+    # 最初のチャンクがクラスタ数より少なくても、溜めてから学習する
+    chunks = [df.iloc[:2]] + [df.iloc[i : i + 200] for i in range(2, len(df), 200)]
+    full = DataAnalyzer(df).cluster_tracks(n_clusters=4, features=CLUSTER_FEATURES)
+
+    clusterer = StreamingClusterer(n_clusters=4, features=CLUSTER_FEATURES, batch_size=200)
+    clusterer.fit_stream(lambda: iter(chunks))
+    assert clusterer.n_samples_seen_ == len(df)
+    X = df[CLUSTER_FEATURES].to_numpy()
+    np.testing.assert_allclose(clusterer.scaler_.mean_, X.mean(axis=0))
+    assert pd.crosstab(full["cluster"], clusterer.predict(df)).gt(0).sum().eq(1).all()
+
+    # 保存済みの統計量から作った標準化でも同じになる
+    accumulator = FeatureAccumulator(CLUSTER_FEATURES)
+    accumulator.update(df.to_dict("records"))
+    scaler = StreamingClusterer.scaler_from_accumulator(accumulator)
+    np.testing.assert_allclose(scaler.transform(X), clusterer.scaler_.transform(X))
+    resumed = StreamingClusterer(n_clusters=4, scaler=scaler, batch_size=200).fit_stream(chunks)
+    assert pd.crosstab(full["cluster"], resumed.predict(df)).gt(0).sum().eq(1).all()
+
+    # 1回しか読めないストリームと、クラスタ数に満たない件数はエラー
+    with pytest.raises(ValueError):
+        StreamingClusterer(n_clusters=4).fit_stream(iter(chunks))
+    with pytest.raises(ValueError):
+        StreamingClusterer(n_clusters=4).fit_stream([df.iloc[:3]])
+
+
+def test_auto_cluster_count_is_selected_in_parallel_and_cached():
+    """n_clusters="auto"で塊の数が選ばれ、同じ特徴量の2回目はキャッシュから返ること"""
+    from services import cluster_selection
+
+    df = make_blobs_df()
+    X_scaled = StandardScaler().fit_transform(df[CLUSTER_FEATURES].to_numpy())
+
+    selection = cluster_selection.select_n_clusters(X_scaled, k_max=6, max_workers=2)
+    assert selection["n_clusters"] == 4
+    assert selection["complete"] and sorted(selection["scores"]) == [2, 3, 4, 5, 6]
+    hits = cluster_selection._selection_cache.hits
+    assert cluster_selection.select_n_clusters(X_scaled, k_max=6, max_workers=2) is selection
+    assert cluster_selection._selection_cache.hits == hits + 1
+
+    analyzer = DataAnalyzer(df)
+    clustered = analyzer.cluster_tracks(n_clusters="auto", features=CLUSTER_FEATURES)
+    assert clustered["cluster"].nunique() == 4
+    assert analyzer.cluster_scores_[4]["silhouette"] == max(
+        s["silhouette"] for s in analyzer.cluster_scores_.values()
+    )
+
+    # 自動選択でもmethodに従い、init_centersとは併用できない
+    minibatch = analyzer.cluster_tracks(
+        n_clusters="auto", features=CLUSTER_FEATURES, method="minibatch"
+    )
+    assert minibatch["cluster"].nunique() == 4
+    assert isinstance(analyzer.kmeans_, MiniBatchKMeans)
+    with pytest.raises(ValueError):
+        analyzer.cluster_tracks(n_clusters="auto", init_centers=np.zeros((4, 5)))
+
+
+def test_auto_cluster_count_stops_at_time_budget():
+    """制限時間を過ぎても、評価が終わったkの中から選ぶこと"""
+    from services.cluster_selection import select_n_clusters
+
+    X = np.random.default_rng(1).random((300, 5))
+    selection = select_n_clusters(X, time_budget=0.0, max_workers=0)
+    assert list(selection["scores"]) == [2]
+    assert selection["n_clusters"] == 2 and not selection["complete"]
+    # 打ち切った結果はキャッシュせず、次の呼び出しで評価し直す
+    assert select_n_clusters(X, time_budget=60.0, max_workers=0)["complete"]
+
+
+def test_timed_out_candidates_do_not_keep_pool_workers():
+    """打ち切ったkの評価が残ったプロセスプールは終了し、次回は新しいプールを使うこと"""
+    from services import cluster_selection
+
+    X = np.random.default_rng(2).random((2000, 5))
+    executor = cluster_selection._get_executor(2)
+    processes = []
+    original_discard = cluster_selection._discard_executor
+
+    def discard(pool):
+        processes.extend(pool._processes.values())
+        original_discard(pool)
+
+    with patch.object(cluster_selection, "_discard_executor", side_effect=discard):
+        selection = cluster_selection.select_n_clusters(
+            X, k_max=10, time_budget=0.0, max_workers=2, use_cache=False
+        )
+
+    assert not selection["complete"]
+    assert cluster_selection._executor is not executor
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+
+
+def legacy_tempo_trends(tracks_data):
+    """変更前のpandasによるtempo_trends"""
+    tempos = [float(t["tempo"]) for t in tracks_data if t.get("tempo") is not None]
+    if not tempos:
+        return {"mean_tempo": 0.0, "std_tempo": 0.0, "distribution": []}
+    df = pd.DataFrame({"tempo": tempos})
+    bins = [0, 60, 80, 100, 120, 140, 160, 180, 200, 220, float("inf")]
+    labels = ["0-60", "60-80", "80-100", "100-120", "120-140",
+              "140-160", "160-180", "180-200", "200-220", "220+"]
+    df["range"] = pd.cut(df["tempo"], bins=bins, labels=labels, include_lowest=True)
+    counts = df["range"].value_counts().sort_index()
+    return {
+        "mean_tempo": float(df["tempo"].mean()),
+        "std_tempo": float(df["tempo"].std()),
+        "distribution": [{"range": str(k), "count": int(v)} for k, v in counts.items()],
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_static_analyzers_match_previous_output_for_rows_and_columns(seed):
+    """genre_distribution・mood_map・tempo_trendsが変更前と同じ結果を返し、列の配列も受け付けること"""
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 80))
+    genres = ["pop", "rock", "jazz", "", None, "anime"]
+    tracks = []
+    for i in range(n):
+        track = {
+            "track": f"Song {i}",
+            "valence": float(rng.random()) if rng.random() > 0.1 else None,
+            "energy": float(rng.random()),
+            "tempo": float(rng.choice([0.0, 60.0, 220.0, np.inf, np.nan, -1.0]))
+            if rng.random() < 0.2
+            else float(rng.uniform(40, 240)),
+            "genres": [genres[j] for j in rng.integers(0, len(genres), rng.integers(0, 4))],
+        }
+        if rng.random() < 0.1:
+            track["genres"] = None
+        tracks.append(track)
+
+    tempo = DataAnalyzer.tempo_trends(tracks)
+    expected_tempo = legacy_tempo_trends(tracks)
+    np.testing.assert_equal(tempo, expected_tempo)
+
+    genre_counts = {}
+    for track in tracks:
+        for genre in track["genres"] or []:
+            if genre:
+                genre_counts[genre] = genre_counts.get(genre, 0) + 1
+    expected_genres = sorted(
+        ({"genre": g, "count": c} for g, c in genre_counts.items()),
+        key=lambda x: x["count"],
+        reverse=True,
+    )
+    assert DataAnalyzer.genre_distribution(tracks) == expected_genres
+
+    expected_mood = [
+        {"track": t["track"], "valence": t["valence"], "energy": t["energy"]}
+        for t in tracks
+        if t["valence"] is not None
+    ]
+    assert DataAnalyzer.mood_map(tracks) == expected_mood
+
+    columns = {key: [t[key] for t in tracks] for key in tracks[0]}
+    columns["energy"] = np.array(columns["energy"])
+    assert DataAnalyzer.genre_distribution(columns) == expected_genres
+    assert DataAnalyzer.mood_map(columns) == expected_mood
+    np.testing.assert_equal(DataAnalyzer.tempo_trends(columns), expected_tempo)
+    tempo_array = np.array([t["tempo"] for t in tracks])
+    np.testing.assert_equal(DataAnalyzer.tempo_trends({"tempo": tempo_array}), expected_tempo)
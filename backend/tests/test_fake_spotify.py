@@ -0,0 +1,162 @@
+"""
+フェイクSpotify Web APIのテスト
+SpotifyServiceをASGITransportでフェイクに接続して使用
+"""
+
+import pytest
+import httpx
+import sys
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fake_spotify import FakeSpotifyConfig, create_app
+from services.artist_cache import ArtistGenreCache
+from services.cache import TTLCache
+from services.feature_store import FeatureStore
+from services.playlist_snapshots import PlaylistSnapshotStore
+from services.rate_limiter import RequestScheduler
+from services.singleflight import SingleFlight
+from services.spotify_client import PLAYLIST_TRACKS_FIELDS, SpotifyService
+from tests.test_spotify_client import make_session_factory
+
+BASE_URL = "http://fake-spotify/v1"
+
+
+def make_service(app, token: str = "load_test_token") -> SpotifyService:
+    """フェイクに接続するSpotifyServiceを生成"""
+    session_factory = make_session_factory()
+    return SpotifyService(
+        token,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+        base_url=BASE_URL,
+        feature_store=FeatureStore(session_factory=session_factory),
+        artist_cache=ArtistGenreCache(TTLCache()),
+        scheduler=RequestScheduler(app_rate=0, user_rate=0, backoff_base=0.01),
+        singleflight=SingleFlight(),
+        snapshot_store=PlaylistSnapshotStore(session_factory),
+    )
+
+
+@pytest.mark.asyncio
+async def test_service_runs_against_fake_spotify():
+    """プレイリスト分析と上位トラック取得がフェイクだけで完結すること"""
+    app = create_app(FakeSpotifyConfig(playlist_size=250, playlists_per_user=3))
+    service = make_service(app)
+
+    playlists = await service.get_user_playlists()
+    assert len(playlists) == 3
+    assert all(p.track_count == 250 for p in playlists)
+
+    analysis = await service.analyze_playlist(playlists[0].id)
+    assert len(analysis.tracks) == 250
+    assert analysis.stats.analyzed_tracks == 250
+
+    top_tracks = await service.get_top_tracks_with_genres(limit=20)
+    assert len(top_tracks) == 20
+    assert all(track["genres"] for track in top_tracks)
+
+    # 同じトークンなら同じユーザー・同じデータになる
+    assert await make_service(app).get_user_playlists() == playlists
+    assert await make_service(app, "other_token").get_user_playlists() != playlists
+
+
+@pytest.mark.asyncio
+async def test_fake_spotify_applies_fields_projection():
+    """fieldsで指定した項目だけを返すこと"""
+    app = create_app(FakeSpotifyConfig(playlist_size=10))
+    service = make_service(app)
+    playlist_id = (await service.get_user_playlists())[0].id
+
+    page = await service.client.playlist_tracks(
+        playlist_id, limit=5, fields=PLAYLIST_TRACKS_FIELDS
+    )
+
+    assert set(page) == {"items", "total", "limit", "offset", "next"}
+    assert set(page["items"][0]["track"]) == {"id", "name", "duration_ms", "artists", "album"}
+    assert page["next"] is not None
+
+
+@pytest.mark.asyncio
+async def test_fake_spotify_injects_rate_limits():
+    """429を注入しても、スケジューラの再試行で結果が揃うこと"""
+    app = create_app(
+        FakeSpotifyConfig(playlist_size=300, rate_limit_ratio=0.3, retry_after=0)
+    )
+    service = make_service(app)
+    service.client.scheduler.max_retries = 10
+
+    tracks = await service.get_playlist_tracks((await service.get_user_playlists())[0].id)
+
+    assert len(tracks) == 300
+    assert app.state.stats["rate_limited"] > 0
+
+
+@pytest.mark.asyncio
+async def test_fake_spotify_records_and_replays(tmp_path):
+    """記録したレスポンスを、別の設定のフェイクでも同じ内容で再生すること"""
+    upstream = create_app(FakeSpotifyConfig(seed=1, playlist_size=120))
+    recorder = create_app(
+        FakeSpotifyConfig(
+            mode="record",
+            fixtures_dir=str(tmp_path),
+            upstream_url="http://upstream/v1",
+        ),
+        upstream_client=httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=upstream), base_url="http://upstream"
+        ),
+    )
+    recorded_service = make_service(recorder)
+    playlist_id = (await recorded_service.get_user_playlists())[0].id
+    recorded = await recorded_service.get_playlist_tracks(playlist_id)
+    assert len(recorded) == 120
+    assert list(tmp_path.glob("*.json"))
+
+    # シードが違うフェイクでも、記録済みのリクエストは記録した内容を返す
+    replayer = create_app(
+        FakeSpotifyConfig(seed=2, mode="replay", fixtures_dir=str(tmp_path))
+    )
+    replayed = await make_service(replayer).get_playlist_tracks(playlist_id)
+
+    assert replayed == recorded
+    # 曲一覧の2ページとも記録から返している
+    assert replayer.state.stats["replayed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_analyze_playlists_fetches_shared_tracks_once():
+    """一括分析では、複数のプレイリストに入っている曲の特徴量を1回だけ取得すること"""
+    # 曲の種類を少なくしてプレイリスト間で曲を重複させる
+    app = create_app(FakeSpotifyConfig(playlist_size=150, playlists_per_user=4, track_pool=300))
+    service = make_service(app)
+    playlist_ids = [playlist.id for playlist in await service.get_user_playlists()]
+    requests = []
+    original = service.client.audio_features
+
+    async def audio_features(ids):
+        requests.append(ids)
+        return await original(ids)
+
+    service.client.audio_features = audio_features
+    result = await service.analyze_playlists(playlist_ids + playlist_ids[:1])
+
+    fetched = [track_id for ids in requests for track_id in ids]
+    report = result.deduplication
+    assert len(fetched) == len(set(fetched)) == report.unique_tracks == report.fetched_tracks
+    assert report.track_refs == 600
+    assert report.unique_tracks < 300
+    assert report.audio_features_requests == len(requests) == 3
+    assert report.requests_without_dedup == 8
+    assert report.requests_saved == 5
+
+    # プレイリストごとの統計は、1件ずつ分析した場合と同じ
+    assert [item.playlist.id for item in result.playlists] == playlist_ids
+    single = await service.analyze_playlist(playlist_ids[1])
+    stats = result.playlists[1].stats
+    assert stats.total_tracks == single.stats.total_tracks
+    assert stats.analyzed_tracks == single.stats.analyzed_tracks
+    assert stats.averages == pytest.approx(single.stats.averages)
+    assert stats.std_devs == pytest.approx(single.stats.std_devs)
+    assert len(requests) == 3
+    assert result.combined.total_tracks == report.unique_tracks
@@ -0,0 +1,72 @@
+"""
+FeatureMatrixのテスト
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.data_analyzer import DataAnalyzer
+from services.feature_matrix import FEATURE_COLUMNS, FeatureMatrix
+from services.stats_accumulator import STATS_FEATURES, FeatureAccumulator
+from tests.test_spotify_client import make_features
+
+
+def make_raw(numbers):
+    """Spotifyのaudio-featuresと同じ形の辞書（値は小数点以下3桁）"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for n in numbers:
+        features = make_features(f"track{n}")
+        for name in ("danceability", "energy", "valence", "acousticness"):
+            features[name] = round(float(rng.random()), 3)
+        features["tempo"] = round(float(rng.uniform(60, 200)), 3)
+        rows.append(features)
+    return rows
+
+
+def test_from_raw_round_trips_json_values_and_gathers_in_order():
+    """float32で保持してもレスポンスの値が元のJSONと一致し、曲IDの順に集められること"""
+    raw = make_raw(range(10))
+    matrix = FeatureMatrix.from_raw([None, *raw, raw[0]])
+
+    assert matrix.ids == [f"track{i}" for i in range(10)]
+    assert matrix.values.dtype == np.float32
+    assert matrix.nbytes == 10 * len(FEATURE_COLUMNS) * 4
+    assert [r.model_dump() for r in matrix.to_responses()] == raw
+
+    extra = FeatureMatrix.from_raw(make_raw([3, 20, 21]))
+    matrix.extend(extra)
+    assert len(matrix) == 12 and matrix.index["track21"] == 11
+
+    picked = FeatureMatrix.gather(["track21", "track1", "missing", "track1"], [extra, matrix])
+    assert picked.ids == ["track21", "track1", "track1"]
+    np.testing.assert_array_equal(picked.values[1], picked.values[2])
+    np.testing.assert_array_equal(picked.column("tempo")[0], extra.column("tempo")[2])
+
+
+def test_accumulator_and_analyzer_consume_matrix():
+    """行列をまとめて追加・削除した統計量がpandasと一致し、DataAnalyzerが行列をコピーせずに使うこと"""
+    raw = make_raw(range(200))
+    matrix = FeatureMatrix.from_raw(raw)
+
+    accumulator = FeatureAccumulator()
+    accumulator.add_matrix(matrix.take(f"track{i}" for i in range(150)))
+    accumulator.add_matrix(matrix.take(f"track{i}" for i in range(150, 200)))
+    accumulator.remove_matrix(matrix.take(f"track{i}" for i in range(20)))
+
+    expected = pd.DataFrame(raw[20:])[STATS_FEATURES]
+    assert accumulator.total == 180
+    for name in STATS_FEATURES:
+        assert accumulator.averages()[name] == pytest.approx(expected[name].mean())
+        assert accumulator.std_devs()[name] == pytest.approx(expected[name].std())
+
+    analyzer = DataAnalyzer(matrix)
+    assert np.shares_memory(analyzer.features_df["danceability"].to_numpy(), matrix.values)
+    stats = analyzer.calculate_statistics()
+    assert stats["tempo_mean"] == pytest.approx(pd.DataFrame(raw)["tempo"].mean(), rel=1e-6)
@@ -0,0 +1,50 @@
+"""
+起動時のimportのテスト（重い依存とDB初期化を最初に使う時点まで遅らせる）
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(BACKEND_DIR))
+
+HEAVY_MODULES = ["pandas", "sklearn", "scipy", "joblib", "spotipy"]
+
+
+@pytest.mark.parametrize("module", ["api.main", "tasks.tasks"])
+def test_import_does_not_load_heavy_dependencies(module, tmp_path):
+    """importしただけではpandas・scikit-learnなどを読み込まず、DBファイルも作らない"""
+    database_path = tmp_path / "import.db"
+    script = (
+        f"import json, sys; import {module}; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{database_path}"},
+    ).stdout
+
+    assert json.loads(output.strip().splitlines()[-1]) == []
+    assert not database_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_initializes_database():
+    """DBの初期化はアプリの起動時に行う"""
+    from api.main import app, lifespan
+
+    with patch("api.main.init_db") as init_db, patch("api.main.close_http_client"):
+        async with lifespan(app):
+            init_db.assert_called_once()
@@ -0,0 +1,89 @@
+"""
+KLLSketch・FeatureSketchesのテスト
+"""
+
+import json
+import numpy as np
+import pytest
+import sys
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.data_analyzer import DataAnalyzer
+from services.quantile_sketch import FeatureSketches, KLLSketch
+from services.stats_accumulator import STATS_FEATURES
+
+
+def rank_error(sorted_values: np.ndarray, value: float, q: float) -> float:
+    """valueの順位とqの差（0〜1）"""
+    return abs(np.searchsorted(sorted_values, value) / len(sorted_values) - q)
+
+
+def test_small_input_is_exact():
+    """kより少ない値では正確な最近順位の分位点になる"""
+    values = np.random.default_rng(0).random(50)
+    sketch = KLLSketch()
+    sketch.update_many(values)
+
+    ordered = np.sort(values)
+    assert sketch.quantiles([0.1, 0.5, 0.9]) == [ordered[4], ordered[24], ordered[44]]
+    assert sketch.quantile(0) == ordered[0]
+    assert sketch.quantile(1) == ordered[-1]
+
+
+def test_large_input_error_and_constant_memory():
+    """大量の値でも順位の誤差が小さく、保持する値の数は一定"""
+    values = np.random.default_rng(1).normal(120, 25, 500_000)
+    sketch = KLLSketch()
+    retained = []
+    for chunk in np.array_split(values, 10):
+        sketch.update_many(chunk)
+        retained.append(sketch.retained)
+
+    ordered = np.sort(values)
+    for q in (0.1, 0.5, 0.9):
+        assert rank_error(ordered, sketch.quantile(q), q) < 0.01
+    assert sketch.n == len(values)
+    assert max(retained) <= 3 * sketch.k + 2 * len(sketch.levels)
+
+
+def test_merge_matches_single_sketch():
+    """分割して作ったスケッチの合成も、全体の分位点を近似する"""
+    values = np.random.default_rng(2).exponential(1.0, 200_000)
+    parts = []
+    for i, chunk in enumerate(np.array_split(values, 4)):
+        part = KLLSketch(seed=i)
+        part.update_many(chunk)
+        parts.append(part)
+
+    merged = KLLSketch()
+    for part in parts:
+        merged.merge(part)
+
+    ordered = np.sort(values)
+    assert merged.n == len(values)
+    assert merged.min == ordered[0] and merged.max == ordered[-1]
+    for q in (0.1, 0.5, 0.9):
+        assert rank_error(ordered, merged.quantile(q), q) < 0.01
+
+    with pytest.raises(ValueError):
+        merged.merge(KLLSketch(k=100))
+
+
+def test_feature_percentiles_round_trip_and_combine():
+    """保存したスケッチを復元して合成すると、全トラックの分位点になる"""
+    rng = np.random.default_rng(3)
+    rows = [{name: float(rng.random()) for name in STATS_FEATURES} for _ in range(120)]
+    rows[0]["tempo"] = None
+
+    short = DataAnalyzer.feature_percentiles(rows[:60])
+    long = DataAnalyzer.feature_percentiles(rows[60:])
+    stored = [json.loads(json.dumps(result["sketches"])) for result in (short, long)]
+    combined = FeatureSketches.combine(FeatureSketches.from_dict(data) for data in stored)
+
+    assert combined.count == 120
+    assert combined.sketches["tempo"].n == 119
+    assert combined.percentiles() == DataAnalyzer.feature_percentiles(rows)["percentiles"]
+    assert set(short["percentiles"]["energy"]) == {"p10", "p25", "p50", "p75", "p90"}
@@ -0,0 +1,177 @@
+"""
+類似曲検索インデックスのテスト
+"""
+
+import numpy as np
+from datetime import datetime, timedelta
+import pytest
+import sys
+import threading
+from pathlib import Path
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import Mock, patch
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.database import TrackAudioFeatures
+from models.schemas import AudioFeaturesResponse
+from services.data_analyzer import CLUSTER_FEATURES
+from services.similarity_index import SimilarityIndex
+from tests.test_spotify_client import make_feature_store
+
+
+def make_raw(start: int, count: int, seed: int = 0):
+    """ランダムなオーディオ特徴量の辞書のリスト"""
+    rng = np.random.default_rng(seed)
+    return [
+        {"id": f"track{i}", **{name: float(rng.random()) for name in CLUSTER_FEATURES}}
+        for i in range(start, start + count)
+    ]
+
+
+def brute_force(index: SimilarityIndex, raw, track_id: str, k: int):
+    """全曲との距離を計算した正解"""
+    X = np.array([[f[name] for name in CLUSTER_FEATURES] for f in raw])
+    scaled = (X - index.mean_) / index.scale_
+    ids = [f["id"] for f in raw]
+    point = scaled[ids.index(track_id)]
+    distances = np.linalg.norm(scaled - point, axis=1)
+    order = [i for i in np.argsort(distances, kind="stable") if ids[i] != track_id]
+    return [ids[i] for i in order[:k]]
+
+
+def test_index_matches_brute_force_with_incremental_delta_and_persistence(tmp_path):
+    """KD木と差分の検索結果が総当たりと一致し、同期・作り直し・保存後も変わらないこと"""
+    store = make_feature_store()
+    raw = make_raw(0, 3000)
+    store.put_many(raw)
+
+    index = SimilarityIndex(rebuild_ratio=0.5).build(store.iter_all(chunk_size=1000))
+    assert len(index) == 3000
+    assert [i for i, _ in index.query("track7", 10)] == brute_force(index, raw, "track7", 10)
+
+    # 保存後に追加された曲は差分として検索され、KD木は作り直さない
+    index.synced_at = None
+    extra = make_raw(3000, 1200, seed=1)
+    store.put_many(extra)
+    assert index.sync(store) == 1200
+    assert len(index.ids) == 3000 and len(index) == 4200
+    assert [i for i, _ in index.query("track3100", 10)] == brute_force(
+        index, raw + extra, "track3100", 10
+    )
+    assert index.sync(store) == 0
+
+    path = str(tmp_path / "index.joblib")
+    index.save(path)
+    loaded = SimilarityIndex.load(path, rebuild_ratio=0.5)
+    assert len(loaded) == 4200 and loaded.synced_at == index.synced_at
+    assert loaded.query("track3100", 10) == index.query("track3100", 10)
+
+    # 差分が全体のrebuild_ratioを超えるとKD木に取り込まれ、標準化もやり直す
+    loaded.add(make_raw(5000, 400, seed=2))
+    assert len(loaded.ids) == 4600 and len(loaded) == 4600
+    everything = raw + extra + make_raw(5000, 400, seed=2)
+    assert [i for i, _ in loaded.query("track42", 5)] == brute_force(
+        loaded, everything, "track42", 5
+    )
+
+
+def test_sync_picks_up_rows_committed_during_previous_sync():
+    """同期の読み込み後に、開始時刻より前のfetched_atでコミットされた曲も次回の同期で取り込むこと"""
+    store = make_feature_store()
+    store.put_many(make_raw(0, 10))
+    index = SimilarityIndex()
+    late = make_raw(100, 1, seed=1)[0]
+    iter_all = store.iter_all
+
+    def iter_all_then_commit(*args, **kwargs):
+        yield from iter_all(*args, **kwargs)
+        # 同期の開始前にfetched_atを決めた書き込みが、読み込みの後にコミットされる
+        db = store._session_factory()
+        db.add(
+            TrackAudioFeatures(
+                track_id=late["id"],
+                features=late,
+                fetched_at=datetime.utcnow() - timedelta(seconds=1),
+            )
+        )
+        db.commit()
+        db.close()
+
+    with patch.object(store, "iter_all", side_effect=iter_all_then_commit):
+        assert index.sync(store) == 10
+    assert late["id"] not in index
+    assert index.sync(store) == 1
+    assert late["id"] in index
+
+
+def test_rebuild_does_not_block_queries_or_lose_added_tracks():
+    """KD木の作り直し中も検索・追加ができ、その間に追加された曲は差分として残ること"""
+    raw = make_raw(0, 1000)
+    index = SimilarityIndex(rebuild_ratio=0.1).build([raw])
+    started, release = threading.Event(), threading.Event()
+    fit = index._fit
+
+    def slow_fit(values):
+        started.set()
+        assert release.wait(5)
+        return fit(values)
+
+    extra = make_raw(1000, 1001, seed=1)
+    with patch.object(index, "_fit", side_effect=slow_fit):
+        rebuilding = threading.Thread(target=index.add, args=(extra,))
+        rebuilding.start()
+        assert started.wait(5)
+        # 作り直しを待たずに検索・追加できる
+        assert len(index.query("track1500", 5)) == 5
+        late = make_raw(3000, 10, seed=2)
+        assert index.add(late) == 10
+        release.set()
+        rebuilding.join(5)
+
+    assert len(index.ids) == 2001 and len(index) == 2011
+    everything = raw + extra + late
+    assert [i for i, _ in index.query("track3005", 5)] == brute_force(
+        index, everything, "track3005", 5
+    )
+    assert [i for i, _ in index.query("track1500", 5)] == brute_force(
+        index, everything, "track1500", 5
+    )
+
+
+@pytest.mark.asyncio
+async def test_similar_tracks_route():
+    """キャッシュ済みの曲とインデックスにない曲のどちらでも類似曲を返すこと"""
+    from api.main import app, get_spotify_service
+
+    raw = make_raw(0, 500)
+    index = SimilarityIndex().build([raw])
+    unknown = {**make_raw(900, 1, seed=3)[0], "valence": 0.5}
+
+    service = Mock()
+
+    async def get_audio_features(track_id):
+        if track_id != unknown["id"]:
+            raise ValueError(f"Track {track_id} has no audio features")
+        return AudioFeaturesResponse(
+            **unknown, tempo=120.0, liveness=0.1, speechiness=0.1, loudness=-5.0,
+            mode=1, key=0, time_signature=4,
+        )
+
+    service.get_audio_features = get_audio_features
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        with patch.dict(app.dependency_overrides, {get_spotify_service: lambda: service}), \
+             patch("api.main.get_similarity_index", return_value=index):
+            headers = {"Authorization": "Bearer test_token"}
+            known = await client.get("/api/tracks/track7/similar?limit=5", headers=headers)
+            other = await client.get(f"/api/tracks/{unknown['id']}/similar", headers=headers)
+            missing = await client.get("/api/tracks/nothing/similar", headers=headers)
+
+    assert known.status_code == 200
+    assert [item["id"] for item in known.json()] == brute_force(index, raw, "track7", 5)
+    assert other.status_code == 200 and len(other.json()) == 10
+    distances = [item["distance"] for item in other.json()]
+    assert distances == sorted(distances)
+    assert missing.status_code == 404
@@ -0,0 +1,573 @@
+"""
+SpotifyServiceのテスト
+httpx.MockTransportでSpotify APIを置き換えて使用
+"""
+
+import asyncio
+import pytest
+import httpx
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from services.artist_cache import ArtistGenreCache
+from services.cache import TTLCache
+from services.feature_store import FeatureStore
+from services.playlist_snapshots import PlaylistSnapshotStore
+from services.rate_limiter import RequestScheduler
+from services.singleflight import SingleFlight
+from services.spotify_client import PLAYLIST_TRACKS_FIELDS, SpotifyService
+from services.spotify_http import SpotifyAPIError, SpotifyRateLimitError
+
+
+def make_scheduler(**kwargs) -> RequestScheduler:
+    """レート制限なし・短いバックオフのスケジューラを生成"""
+    options = {"app_rate": 0, "user_rate": 0, "backoff_base": 0.01}
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def make_feature_store(max_memory_items: int = 1000) -> FeatureStore:
+    """インメモリSQLiteを使うFeatureStoreを生成"""
+    return FeatureStore(
+        session_factory=make_session_factory(), max_memory_items=max_memory_items
+    )
+
+
+def make_track(i: int) -> dict:
+    """テスト用のトラックオブジェクト"""
+    return {
+        "id": f"track{i}",
+        "name": f"Song {i}",
+        "duration_ms": 200000,
+        "artists": [{"id": f"artist{i % 3}", "name": f"Artist {i % 3}"}],
+        "album": {"name": f"Album {i}", "images": []},
+    }
+
+
+def make_features(track_id: str) -> dict:
+    """テスト用のオーディオ特徴（曲番号に応じて値を変える）"""
+    n = int(track_id.removeprefix("track")) if track_id.startswith("track") else 0
+    return {
+        "id": track_id,
+        "danceability": 0.5 + (n % 5) / 10,
+        "energy": 0.6 + (n % 4) / 10,
+        "valence": 0.7,
+        "tempo": 120.0 + n % 30,
+        "acousticness": 0.1,
+        "instrumentalness": 0.0,
+        "liveness": 0.2,
+        "speechiness": 0.05,
+        "loudness": -5.0,
+        "mode": 1,
+        "key": 5,
+        "time_signature": 4,
+    }
+
+
+def spotify_handler(
+    total_tracks: int = 120, requests: list = None, track_numbers: list = None
+):
+    """
+    Spotify APIのスタンドインとなるハンドラを生成
+
+    track_numbersを渡した場合はpl1の曲をその番号の並びにする（呼び出し後に変更可能）
+    """
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if requests is not None:
+            requests.append(request)
+        path = request.url.path
+        params = request.url.params
+        numbers = track_numbers if track_numbers is not None else range(total_tracks)
+
+        if path == "/v1/me":
+            return httpx.Response(200, json={"id": "user1"})
+        if path == "/v1/playlists/pl1":
+            return httpx.Response(
+                200,
+                json={
+                    "id": "pl1",
+                    "name": "Playlist 1",
+                    "description": None,
+                    "images": [],
+                    "tracks": {"total": len(numbers)},
+                    "snapshot_id": f"snap-{hash(tuple(numbers))}",
+                },
+            )
+        if path == "/v1/playlists/pl1/tracks":
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", 50))
+            end = min(offset + limit, len(numbers))
+            next_url = (
+                f"https://api.spotify.com/v1/playlists/pl1/tracks?offset={end}&limit={limit}"
+                if end < len(numbers)
+                else None
+            )
+            return httpx.Response(
+                200,
+                json={
+                    "items": [{"track": make_track(i)} for i in numbers[offset:end]],
+                    "total": len(numbers),
+                    "offset": offset,
+                    "limit": limit,
+                    "next": next_url,
+                },
+            )
+        if path == "/v1/audio-features":
+            ids = params["ids"].split(",")
+            return httpx.Response(
+                200, json={"audio_features": [make_features(i) for i in ids]}
+            )
+        if path == "/v1/me/top/tracks":
+            limit = int(params.get("limit", 20))
+            return httpx.Response(
+                200, json={"items": [make_track(i) for i in range(limit)]}
+            )
+        if path.startswith("/v1/artists"):
+            if path == "/v1/artists":
+                ids = params["ids"].split(",")
+                return httpx.Response(
+                    200,
+                    json={"artists": [{"id": a, "genres": [f"genre-{a}"]} for a in ids]},
+                )
+            artist_id = path.rsplit("/", 1)[-1]
+            return httpx.Response(200, json={"id": artist_id, "genres": [f"genre-{artist_id}"]})
+        if path == "/v1/playlists/missing":
+            return httpx.Response(
+                404, json={"error": {"status": 404, "message": "Not found"}}
+            )
+        return httpx.Response(404, json={"error": {"status": 404, "message": path}})
+
+    return handler
+
+
+def make_session_factory():
+    """一時ファイルのSQLiteのセッションファクトリを生成（DB操作はスレッドから並行して行われる）"""
+    directory = tempfile.TemporaryDirectory()
+    engine = create_engine(
+        f"sqlite:///{directory.name}/test.db",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    # ディレクトリはセッションファクトリが破棄されるときに削除する
+    return sessionmaker(bind=engine, info={"directory": directory})
+
+
+def make_service(
+    handler,
+    feature_store: FeatureStore = None,
+    scheduler: RequestScheduler = None,
+    singleflight: SingleFlight = None,
+    snapshot_store: PlaylistSnapshotStore = None,
+) -> SpotifyService:
+    """MockTransportを使うSpotifyServiceを生成"""
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return SpotifyService(
+        "test_token",
+        http_client=http_client,
+        feature_store=feature_store or make_feature_store(),
+        artist_cache=ArtistGenreCache(TTLCache()),
+        scheduler=scheduler or make_scheduler(),
+        singleflight=singleflight or SingleFlight(),
+        snapshot_store=snapshot_store or PlaylistSnapshotStore(make_session_factory()),
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_playlist_tracks_follows_all_pages():
+    """全ページの曲が元の順序で取得されること"""
+    requests = []
+    service = make_service(spotify_handler(total_tracks=120, requests=requests))
+
+    tracks = await service.get_playlist_tracks("pl1")
+
+    assert [t.id for t in tracks] == [f"track{i}" for i in range(120)]
+    assert all(r.headers["Authorization"] == "Bearer test_token" for r in requests)
+    # 必要なフィールドだけを要求している
+    assert all(r.url.params["fields"] == PLAYLIST_TRACKS_FIELDS for r in requests)
+
+
+@pytest.mark.asyncio
+async def test_get_audio_features_batch_splits_into_batches():
+    """100件ごとにバッチ分割して取得されること"""
+    requests = []
+    service = make_service(spotify_handler(requests=requests))
+
+    features = await service.get_audio_features_batch([f"t{i}" for i in range(250)])
+
+    assert len(features) == 250
+    assert len([r for r in requests if r.url.path == "/v1/audio-features"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_top_tracks_with_genres_shape():
+    """ジャンル付き上位トラックの形式が保たれ、一括エンドポイントだけが使われること"""
+    requests = []
+    service = make_service(spotify_handler(requests=requests))
+
+    tracks = await service.get_top_tracks_with_genres(limit=5)
+
+    assert sorted(r.url.path for r in requests) == [
+        "/v1/artists",
+        "/v1/audio-features",
+        "/v1/me/top/tracks",
+    ]
+
+    assert len(tracks) == 5
+    assert tracks[0] == {
+        "track": "Song 0",
+        "track_id": "track0",
+        "genres": ["genre-artist0"],
+        "valence": 0.7,
+        "energy": 0.6,
+        "tempo": 120.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_api_error_is_raised():
+    """エラーレスポンスがSpotifyAPIErrorになること"""
+    service = make_service(spotify_handler())
+
+    with pytest.raises(SpotifyAPIError) as exc_info:
+        await service.get_playlist_details("missing")
+
+    assert exc_info.value.status == 404
+    assert exc_info.value.message == "Not found"
+
+
+@pytest.mark.asyncio
+async def test_parallel_pages_are_bounded_and_ordered():
+    """並行取得が同時リクエスト数の上限を守り、元の順序で返ること"""
+    base_handler = spotify_handler(total_tracks=1000)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # 後ろのページほど早く返して順序の入れ替わりを起こす
+        await asyncio.sleep(0.01 / (1 + int(request.url.params.get("offset", 0)) // 50))
+        in_flight -= 1
+        return base_handler(request)
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    service = SpotifyService(
+        "test_token",
+        http_client=http_client,
+        page_concurrency=4,
+        feature_store=make_feature_store(),
+        artist_cache=ArtistGenreCache(TTLCache()),
+        scheduler=make_scheduler(),
+        snapshot_store=PlaylistSnapshotStore(make_session_factory()),
+    )
+
+    parallel = await service.get_playlist_tracks("pl1")
+    sequential = await service.get_playlist_tracks("pl1", parallel_pages=False)
+
+    assert [t.id for t in parallel] == [f"track{i}" for i in range(1000)]
+    assert parallel == sequential
+    assert max_in_flight <= 4
+
+
+@pytest.mark.asyncio
+async def test_audio_features_are_read_through_cache():
+    """キャッシュ済みの特徴量はSpotifyに問い合わせないこと"""
+    requests = []
+    # LRUを小さくしてDBテーブルからの読み込みも通す
+    feature_store = make_feature_store(max_memory_items=10)
+    service = make_service(spotify_handler(requests=requests), feature_store)
+
+    await service.get_audio_features_batch([f"t{i}" for i in range(50)])
+    requests.clear()
+    features = await service.get_audio_features_batch([f"t{i}" for i in range(60)])
+
+    assert [f.id for f in features] == [f"t{i}" for i in range(60)]
+    feature_requests = [r for r in requests if r.url.path == "/v1/audio-features"]
+    assert len(feature_requests) == 1
+    assert feature_requests[0].url.params["ids"].split(",") == [f"t{i}" for i in range(50, 60)]
+
+
+@pytest.mark.asyncio
+async def test_missing_features_are_recorded_and_db_runs_off_loop():
+    """特徴量がない曲も記録されて再取得されず、DBの読み書きはイベントループの外で行われること"""
+    session_factory = make_session_factory()
+    requested = []
+    db_threads = set()
+
+    async def fetcher(ids):
+        requested.append(list(ids))
+        return [None if i == "local1" else {"id": i, "tempo": 100.0} for i in ids]
+
+    def tracking_factory():
+        db_threads.add(threading.get_ident())
+        return session_factory()
+
+    store = FeatureStore(session_factory=tracking_factory)
+    first = await store.get_or_fetch(["t1", "local1"], fetcher)
+    second = await store.get_or_fetch(["t1", "local1"], fetcher)
+    # DBテーブルにも記録されるため、別プロセスのストアでも再取得しない
+    restarted = FeatureStore(session_factory=session_factory)
+    third = await restarted.get_or_fetch(["local1", "t2"], fetcher)
+
+    assert first == second == {"t1": {"id": "t1", "tempo": 100.0}}
+    assert third == {"t2": {"id": "t2", "tempo": 100.0}}
+    assert requested == [["t1", "local1"], ["t2"]]
+    assert restarted.get_many(["local1", "t1"]) == {"t1": {"id": "t1", "tempo": 100.0}}
+    assert threading.get_ident() not in db_threads
+
+
+@pytest.mark.asyncio
+async def test_missing_features_record_expires_and_is_refetched():
+    """特徴量がないという記録は有効期限が過ぎると取得し直し、取得できた特徴量で置き換わること"""
+    session_factory = make_session_factory()
+    requested = []
+    available = set()
+
+    async def fetcher(ids):
+        requested.append(list(ids))
+        return [{"id": i, "tempo": 100.0} if i in available else None for i in ids]
+
+    store = FeatureStore(session_factory=session_factory, miss_ttl=0.3)
+    assert await store.get_or_fetch(["local1"], fetcher) == {}
+    assert await store.get_or_fetch(["local1"], fetcher) == {}
+    assert await FeatureStore(session_factory=session_factory).get_or_fetch(
+        ["local1"], fetcher
+    ) == {}
+    assert requested == [["local1"]]
+
+    await asyncio.sleep(0.4)
+    available.add("local1")
+    assert await store.get_or_fetch(["local1"], fetcher) == {
+        "local1": {"id": "local1", "tempo": 100.0}
+    }
+    assert requested == [["local1"], ["local1"]]
+    # DBの記録も置き換わり、類似曲検索などの差分の読み込みにも含まれる
+    restarted = FeatureStore(session_factory=session_factory)
+    assert restarted.get_many(["local1"]) == {"local1": {"id": "local1", "tempo": 100.0}}
+    assert [f["id"] for chunk in restarted.iter_all() for f in chunk] == ["local1"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_honour_retry_after():
+    """429はRetry-Afterだけ待って再試行され、再試行し尽くすとSpotifyRateLimitErrorになること"""
+    base_handler = spotify_handler()
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(asyncio.get_running_loop().time())
+        if request.url.path == "/v1/me" and len(attempts) <= 2:
+            return httpx.Response(429, headers={"Retry-After": "0.1"})
+        if request.url.path == "/v1/me/playlists":
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return base_handler(request)
+
+    scheduler = make_scheduler(max_retries=2)
+    service = make_service(handler, scheduler=scheduler)
+
+    assert await service.get_current_user() == {"id": "user1"}
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.1
+    assert scheduler.metrics.rate_limited == 2
+
+    with pytest.raises(SpotifyRateLimitError) as exc_info:
+        await service.get_user_playlists()
+    assert exc_info.value.status == 429
+    assert scheduler.metrics.snapshot()["retries"] == 4
+
+
+@pytest.mark.asyncio
+async def test_user_rate_wait_does_not_block_other_users():
+    """あるユーザーのレート待ちが同時送信数の枠を占有せず、他のユーザーを待たせないこと"""
+    scheduler = make_scheduler(user_rate=2, user_burst=1, max_concurrency=1)
+
+    async def send() -> httpx.Response:
+        return httpx.Response(200)
+
+    # ユーザーAのバケットを使い切り、次の送信は約0.5秒待ちになる
+    await scheduler.run("user_a", send)
+    waiting = asyncio.create_task(scheduler.run("user_a", send))
+    await asyncio.sleep(0.01)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await scheduler.run("user_b", send)
+    assert loop.time() - start < 0.1
+    assert not waiting.done()
+
+    await waiting
+    assert scheduler.metrics.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_are_coalesced():
+    """同時に実行された同一リクエストは1回だけ送信されること"""
+    base_handler = spotify_handler()
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return base_handler(request)
+
+    singleflight = SingleFlight()
+    service = make_service(handler, singleflight=singleflight)
+
+    results = await asyncio.gather(
+        service.get_user_top_tracks_with_features(limit=10),
+        service.get_user_top_tracks_with_features(limit=10),
+        service.get_top_tracks_with_genres(limit=10),
+    )
+
+    assert results[0] == results[1]
+    assert requests.count("/v1/me/top/tracks") == 1
+    assert requests.count("/v1/audio-features") == 1
+    assert singleflight.stats()["coalesced"] == 4
+
+    # 完了後の呼び出しは新たに送信される
+    await service.get_current_user()
+    await service.get_current_user()
+    assert requests.count("/v1/me") == 2
+
+
+@pytest.mark.asyncio
+async def test_singleflight_survives_leader_cancellation():
+    """最初の呼び出しがキャンセルされても、同じキーで待っている呼び出しは結果を受け取ること"""
+    singleflight = SingleFlight()
+    started = []
+    cancelled = []
+
+    async def fetch():
+        started.append(1)
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return {"id": "user1"}
+
+    leader = asyncio.create_task(singleflight.do("me", fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(singleflight.do("me", fetch))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == {"id": "user1"}
+    assert leader.cancelled()
+    assert started == [1] and cancelled == []
+
+    # 待っている呼び出しがすべてキャンセルされた場合は処理も止まる
+    only = asyncio.create_task(singleflight.do("me", fetch))
+    await asyncio.sleep(0.01)
+    only.cancel()
+    await asyncio.sleep(0.01)
+    assert cancelled == [1]
+    assert await singleflight.do("me", fetch) == {"id": "user1"}
+
+
+@pytest.mark.asyncio
+async def test_analyze_playlist_reuses_snapshot_and_updates_incrementally():
+    """snapshot_idが同じなら保存済みの結果を返し、変更時は追加分だけ取得すること"""
+    requests = []
+    track_numbers = list(range(120))
+    handler = spotify_handler(requests=requests, track_numbers=track_numbers)
+    service = make_service(handler)
+
+    first = await service.analyze_playlist("pl1")
+    assert first.stats.analyzed_tracks == 120
+
+    # 変更がなければメタデータの1リクエストだけで済む
+    requests.clear()
+    assert await service.analyze_playlist("pl1") == first
+    assert len(requests) == 1
+    assert requests[0].url.params["fields"]
+
+    # 5曲削除して3曲追加すると、追加した曲の特徴量だけを取得する
+    del track_numbers[:5]
+    track_numbers.extend([500, 501, 502])
+    requests.clear()
+    updated = await service.analyze_playlist("pl1")
+    feature_requests = [r for r in requests if r.url.path == "/v1/audio-features"]
+    assert len(feature_requests) == 1
+    assert sorted(feature_requests[0].url.params["ids"].split(",")) == [
+        "track500",
+        "track501",
+        "track502",
+    ]
+
+    # 逐次更新した統計情報が最初から計算した結果と一致する
+    recomputed = await make_service(handler).analyze_playlist("pl1")
+    assert [f.id for f in updated.features] == [f.id for f in recomputed.features]
+    assert updated.stats.analyzed_tracks == recomputed.stats.analyzed_tracks == 118
+    for name, value in recomputed.stats.averages.items():
+        assert updated.stats.averages[name] == pytest.approx(value)
+        assert updated.stats.std_devs[name] == pytest.approx(
+            recomputed.stats.std_devs[name], abs=1e-9
+        )
+
+
+@pytest.mark.asyncio
+async def test_analyze_playlist_returns_fresh_details_for_unchanged_snapshot():
+    """曲が変わらずに名前や説明だけが変わった場合も、最新の情報を返すこと"""
+    requests = []
+    details = {}
+    base = spotify_handler(requests=requests)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = base(request)
+        if request.url.path == "/v1/playlists/pl1" and details:
+            return httpx.Response(200, json={**response.json(), **details})
+        return response
+
+    service = make_service(handler)
+    first = await service.analyze_playlist("pl1")
+
+    details.update(name="Renamed", description="New description")
+    requests.clear()
+    renamed = await service.analyze_playlist("pl1")
+
+    # snapshot_idは変わらないため、曲一覧や特徴量は取得し直さない
+    assert len(requests) == 1
+    assert renamed.playlist.name == "Renamed"
+    assert renamed.playlist.description == "New description"
+    assert renamed.stats == first.stats and renamed.features == first.features
+
+
+@pytest.mark.asyncio
+async def test_iter_playlist_features_overlaps_paging_and_stops_early():
+    """ページの到着ごとに特徴量を取得し、途中で打ち切ると残りを取得しないこと"""
+    requests = []
+    service = make_service(spotify_handler(total_tracks=1000, requests=requests))
+    service.page_concurrency = 2
+
+    pages = []
+    async for tracks, features in service.iter_playlist_features("pl1"):
+        pages.append((tracks, features))
+    paths = [r.url.path for r in requests]
+
+    assert [t.id for tracks, _ in pages for t in tracks] == [
+        f"track{i}" for i in range(1000)
+    ]
+    assert all(features.ids == [t.id for t in tracks] for tracks, features in pages)
+    # 最初の特徴量取得が最後のページ取得より先に始まっている
+    assert paths.index("/v1/audio-features") < len(paths) - 1 - paths[::-1].index(
+        "/v1/playlists/pl1/tracks"
+    )
+
+    requests.clear()
+    stream = service.iter_playlist_features("pl1")
+    await stream.__anext__()
+    await stream.aclose()
+    await asyncio.sleep(0.01)
+    # 先読みの範囲を超えてページを取得していない
+    assert len([r for r in requests if r.url.path == "/v1/playlists/pl1/tracks"]) <= 5
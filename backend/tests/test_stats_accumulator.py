@@ -0,0 +1,90 @@
+"""
+FeatureAccumulatorのテスト
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.data_analyzer import DataAnalyzer
+from services.stats_accumulator import STATS_FEATURES, FeatureAccumulator
+from tests.test_spotify_client import make_service, spotify_handler
+
+
+def make_rows(n: int, seed: int):
+    """ランダムなオーディオ特徴量の辞書のリスト（一部の値はNone）"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        row = {name: float(rng.normal(seed, 1 + seed)) for name in STATS_FEATURES}
+        if rng.random() < 0.1:
+            row["tempo"] = None
+        rows.append(row)
+    return rows
+
+
+def accumulate(rows) -> FeatureAccumulator:
+    accumulator = FeatureAccumulator()
+    accumulator.update(rows)
+    return accumulator
+
+
+def assert_matches_pandas(accumulator: FeatureAccumulator, rows):
+    expected = pd.DataFrame(rows)[STATS_FEATURES].astype(float)
+    for name in STATS_FEATURES:
+        assert accumulator.count[name] == expected[name].count()
+        assert accumulator.averages()[name] == pytest.approx(expected[name].mean())
+        assert accumulator.std_devs()[name] == pytest.approx(expected[name].std())
+
+
+def test_merge_subtract_and_combine_match_pandas_on_the_union():
+    """合成・差し引きした集計が、全曲から計算した統計量と一致すること"""
+    parts = [make_rows(n, seed) for seed, n in enumerate([50, 1, 300, 7])]
+    accumulators = [accumulate(rows) for rows in parts]
+
+    # DBに保存した形から戻しても合成できる
+    restored = [
+        FeatureAccumulator.from_dict(json.loads(json.dumps(a.to_dict()))) for a in accumulators
+    ]
+    combined = FeatureAccumulator.combine(restored)
+    assert_matches_pandas(combined, [row for rows in parts for row in rows])
+    # 元のアキュムレータは変更されない
+    assert restored[0].total == 50
+
+    combined.subtract(accumulators[2])
+    assert_matches_pandas(combined, parts[0] + parts[1] + parts[3])
+
+    merged = accumulate(parts[0]).merge(FeatureAccumulator(["tempo", "loudness"]))
+    merged.merge(accumulate(parts[1]))
+    assert "loudness" in merged.features and merged.count["loudness"] == 0
+    assert_matches_pandas(merged, parts[0] + parts[1])
+
+    stats = DataAnalyzer().calculate_statistics(accumulators)
+    expected = DataAnalyzer(pd.DataFrame([r for rows in parts for r in rows]).astype(float))
+    for key, value in expected.calculate_statistics().items():
+        if key.endswith(("_mean", "_std")):
+            assert stats[key] == pytest.approx(value)
+        else:
+            assert key not in stats
+
+
+@pytest.mark.asyncio
+async def test_combined_stats_of_analyzed_playlists_use_stored_accumulators():
+    """分析済みのプレイリストの統計情報を、Spotifyにアクセスせずに合成できること"""
+    requests = []
+    service = make_service(spotify_handler(requests=requests, track_numbers=list(range(30))))
+    first = await service.analyze_playlist("pl1")
+
+    requests.clear()
+    combined = await service.get_combined_stats(["pl1", "pl1"])
+    assert requests == []
+    assert combined == first.stats
+
+    with pytest.raises(ValueError):
+        await service.get_combined_stats(["pl1", "pl2"])